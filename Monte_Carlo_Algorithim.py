@@ -1,252 +1,247 @@
-import random as random
-import numpy as np
-import copy
-import board as b
-from copy import deepcopy
-
 """
-Monte Carlo Algorithim implementation for Watch your back game
-for COMP30024 AI This code in its current form will not work
-
-Base Functionality As follows:
-
-0. Intercept Input 
-1. Selection
-2. Simulation
-3. Expansion
-4. Back Propergation 
-
-The pipeline of the functions as follows:
-
-Read input->Selection
-Selection (calls) Expansion then returns to selection
-Selection (calls) Simulation right after
-Simulation calls Back Propergation and returns to Selection
-Selection does Selection/Repeat
-
-
-
-BLACK IS FIRST NODE, WHITE IS SECOND BTW
+Monte Carlo Tree Search agent for the Watch Your Back game
+for COMP30024 AI
+
+Each iteration of the search does:
+
+1. Selection: walk down the tree from the root, picking children by UCT
+    (Upper Confidence bounds applied to Trees), until reaching a node
+    that still has untried actions (or ends the game)
+2. Expansion: add a child node for one of those untried actions
+3. Simulation: play random actions from there until the game ends
+    (using the fast playout module)
+4. Back Propagation: walk back up to the root, adding the result to the
+    visits and wins of every node on the way (wins counted for the team
+    that made the action leading to each node)
+
+The search runs on the player's own board, applying actions on the way
+down and undoing them on the way back up. It stops after MAX_ITERATIONS
+or when this turn's time budget runs out, then plays the most visited
+action. The tree below the actions actually played is kept for next turn.
 """
-
-
-def Monte_Carlo_Input(agent):
-    """
-    Function which initializes the selection process
-
-    :param data: A dictionary payload containing the data and Monte-Carlo Specific Data
-    :param rootloc: The location of the starting location
-    :return:
-    """
-
-    data = {
-        0: {"data": {agent.board}, "child": [], "move": None, "leaf": True, "value": 0, "white": agent.team, "win": 0,
-            "play": 0,
-            "parent": None}}
-
-    data = Generate_node(data, 0, False)
-    data = Monte_Carlo_Simulation_Back_Propergate(data, 0)
-
-    return Monte_Carlo_Selection(data, 0, 0, [0])  # Begin monte_carlo
-
-
-def Monte_Carlo_Selection(data, move, e_depth, path):
-    e_depth += 1  # Max Depth of the search tree
-
-    """
-    TODO: Need to find a way to properly reccoemdn a move after a set amount of iterations
-    -
-    :param data: 
-    :param move: 
-    :return: 
-    """
-
-    goal = 49  # This is the placeholder checkvictory, we're hoping that monte carlo would reach this goal
-
-    if len(data[move]["child"]) == 0:
-        data = Monte_Carlo_Expansion(data, move, data[move]["white"])  # Exapnd the node if we're at the leaf
-        data = Monte_Carlo_Simulation_Back_Propergate(data,
-                                                      move)  # Simulate using DFS or something until we get a win.
-
-    if (data[move]["value"] == goal):
+import math
+import time
+from random import randrange
+import board as b
+import playout
+
+# stop searching after this many iterations, even if there is time left
+MAX_ITERATIONS = 5000
+# most CPU time (seconds) to spend searching on one turn, unless the referee
+# or tournament sets b.MOVE_TIME_ENV
+TURN_TIME_LIMIT = 0.5
+# CPU time (seconds) each player gets for the whole game, unless the referee
+# or tournament sets b.TIME_LIMIT_ENV
+# (the limit referee.py's _CountdownTimer enforces for `--time_limit`)
+TIME_LIMIT = 120.0
+# never spend more than this fraction of the time left on one turn
+TIME_LEFT_FRACTION = 0.05
+# exploration constant for UCT. Higher explores less-visited actions more
+EXPLORATION = math.sqrt(2)
+# playouts still going after this many turns are scored by piece counts
+PLAYOUT_TURN_LIMIT = 150
+
+
+class Node(object):
+    """ A node of the search tree: a board state reached by an action """
+    __slots__ = ('action', 'team', 'parent', 'children', 'untried',
+                 'wins', 'visits')
+
+    def __init__(self, action, team, parent, untried):
         """
-        This is where you would put check v  File "/home/harrison/PycharmProjects/untitled2/venv/Monte_Carlo_Algorithim.py", line 83, in Monte_Carlo_Selection
-ictory condition and break simulation
+        :param action: action leading to this node from its parent
+        :param team: team that made action (wins are counted for this team)
+        :param parent: parent Node, or None for the root
+        :param untried: list of actions from this node without a child yet
         """
-        print(data[move]["white"])
-        print("Simulation complete")
-        return True
-
-    next_move = move  # assign the next potential move
-    max_i = move
-
-    for i in data[move]["child"]:
-        print("value:")
-        print(data[i]["value"])
-
-        if len(data[i]["child"]) == 0:
-            # data = Monte_Carlo_Expansion(data, i, data[i]["white"])
-            data = Monte_Carlo_Simulation_Back_Propergate(data,
-                                                          i)  # Simulate using DFS or something until we get a win.
-
-        if abs(goal - data[move]["value"]) >= abs(
-                goal - data[i]["value"]):  # This line is where you compare the heurstic
-            print("Win1")
-
-            if (abs((data[move]["win"] / data[move]["play"])) <= abs(
-                    (data[i]["win"] / data[i]["play"]))):  # This line checks for wins/loss
-                print("Win2")
-
-                if abs(goal - data[i]["value"]) <= abs(
-                        goal - data[max_i]["value"]):
-                    max_i = i
-    next_move = max_i
-
-    if (e_depth == 50):
-        # print the group it belongs to
-        # reccoemend move here
-
-        return path[1]
-
-    path.append(next_move)
-    print()
-    print(goal - data[next_move]["value"])
-    return Monte_Carlo_Selection(data, next_move, e_depth, path)
-
-
-def Monte_Carlo_Expansion(data, move, colour):
-    return Generate_node(data, move, colour)
-
-
-def Monte_Carlo_Simulation_Back_Propergate(data, move):
-    Games = 5  # You can change the number of games simulated here
-    #
-    # print("back propergation/Simulation")
-    for i in range(Games):
-        data = Propergate(data, move, Simulate(data, move))
-
-    return data
-
-
-def Propergate(data, move, white):
+        self.action = action
+        self.team = team
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.wins = 0.0  # draws count as half a win
+        self.visits = 0
+
+    def best_uct_child(self):
+        """ :return: child with the highest UCT value """
+        log_visits = math.log(self.visits)
+        best_child = None
+        best_uct = -math.inf
+        for child in self.children:
+            uct = child.wins / child.visits \
+                + EXPLORATION * math.sqrt(log_visits / child.visits)
+            if uct > best_uct:
+                best_uct = uct
+                best_child = child
+        return best_child
+
+    def child_for_action(self, action):
+        """ :return: child reached by action, or None if not expanded """
+        for child in self.children:
+            if child.action == action:
+                return child
+        return None
+
+
+def game_over(board):
+    """ :return: whether or not the game has ended on board.
+    (Like the referee, only checks outside the placing phase) """
+    return board.phase != b.PLACING_PHASE and board.check_winner() is not None
+
+
+def playout_result(board, team):
     """
-    Propergate moves back to the parent node, adding 1 to the moves played
-    And victory if the victory is from the same piece
-    :param data:
-    :param move:
-    :param white:
-    :return:
-    """
-    # print("incrementing1")
-    # print(move)
-    # print(data[move])
-
-    while (data[move]["parent"] != None):
-        data = increment(data, white, move)
-        move = data[move]["parent"]  # Move up a level
-    data = increment(data, white, move)
-    return data
-
-
-def increment(data, colour, move):
-    #  print("incrementing2")
-    #  print(data[move])
-    if (data[move]["white"] == colour):
-
-        data[move]["win"] += 1
-        data[move]["play"] += 1
-
-    else:
-        data[move]["play"] += 1
-    return data
+    Plays random actions from board (which isn't changed) until the game
+    ends, or until PLAYOUT_TURN_LIMIT turns have been played.
 
-
-def Simulate(data, loc):
+    :param board: board to start from
+    :param team: team to move first
+    :return: winning team (WHITE or BLACK), or 'T' for a tie
     """
-    You can either put your greedy agent or some other simple agent here for the simulation part.
-    It is up to you on how to you want to implement this, Ideally we want to play the game till the end, but if that
-    is impossible just do heurstics again
-    True for a white win, false for a black win
-    :param data:
-    :param move:
-    :return:
+    winner = playout.playout_board(board, team, PLAYOUT_TURN_LIMIT)
+    if winner is not None:
+        return winner
+    # game took too long: team with more pieces left is winning
+    white_count = board.piece_counts[b.WHITE]
+    black_count = board.piece_counts[b.BLACK]
+    if white_count > black_count:
+        return b.WHITE
+    elif black_count > white_count:
+        return b.BLACK
+    return 'T'
+
+
+class Player(object):
+    """
+    An agent that can play Watch Your Back.
+    This agent picks actions by Monte Carlo Tree Search
     """
 
-    if (int(np.random.randint(2, size=1)) == 1):
-        return True
-    else:
-        return False
-
-
-def Generate_node(data, rootloc, colour):
-    # print(rootloc)
-
-    agent = data[rootloc]["data"]
-
-    num_children = agent.board.get_all_actions(
-        agent.team)  # You can change this to the get all actions move if you like
-
-    data[rootloc]["leaf"] = False  # This node is no longer a leaf node
-
-    # Flip the team around, cuz we are now predicting for the opposing team there should be a more pythonic way of doing this
-
-    if (colour):
-        colour = False
-    else:
-        colour = True
-
-
-
-    for i in range(len(num_children)):
-        loc = int(np.random.randint(1000, size=1))  # The unique identification of each node, in this case is an randint
-        board = deepcopy(agent.board)
-        board.do_action(num_children[i], not agent.team)
-
-        """ 
-        Practically you want to make it a unique Identification based upon a unique hash value.
-        You can also just check all the pieces to make sure that they are not the same Up to you
+    def __init__(self, colour):
         """
-        if loc in data:  # Check for duplicates here if generated node is duplicate skip it
-            continue
+        :param colour: either 'white' or 'black'
+        """
+        # set up a new board
+        self.board = b.Board()
+        # set up team allegiances
+        self.team = b.BLACK
+        if colour == 'white':
+            self.team = b.WHITE
+        elif colour == 'black':
+            self.team = b.BLACK
         else:
-            # Value is the heurstic of the next potential state
-            data[loc] = {"data": {board}, "child": [], "move": num_children[i], "leaf": True,
-                         "value": board.value_board(not agent.team), "white": colour, "win": 0, "play": 0,
-                         "parent": rootloc}  # Otherwise you create a new node
-
-            data[rootloc]["child"] = data[rootloc]["child"] + [loc]
-
-    return data
-
-
-def get_data():
-    """
-    Put your board state here :D
-    :return:
-    """
-
-    return 0
-
-
-def generate_value(loc, data):
-    """
-
-      Dummy Function, put Heurstic here
-      :param loc: Key to the node
-      :param data: The data
-      :return:
-
-      """
-    return np.random.randint(100, size=1)
-
+            raise ValueError("colour must be 'white' or 'black'")
+        self.enemy_team = b.Board.get_opponent_team(self.team)
+
+        # search tree for the current board (None until the first search).
+        # The root counts as having been reached by the enemy's last action
+        self.root = None
+        # CPU time used by this player so far (in action and update)
+        self.time_used = 0
+        # time (seconds) we get for the game and for each turn
+        self.time_limit = b.time_limit_from_env(b.TIME_LIMIT_ENV, TIME_LIMIT)
+        self.move_time = b.time_limit_from_env(b.MOVE_TIME_ENV,
+                                               TURN_TIME_LIMIT)
+
+    def action(self, turns):
+        """
+        called by the referee to request an action from the player
 
-def branching_factor(data, loc):
-    """
-    Implementation of the reccomended branching for Monte Carlo Functions
+        :param turns: number of turns that have taken place
+            since start of current game phase
+        :return: next action
+        """
+        start_time = time.process_time()
+        time_left = self.time_limit - self.time_used
+        budget = min(self.move_time, time_left * TIME_LEFT_FRACTION)
+        our_action = self.search(start_time + budget)
+
+        # Update the board with our action
+        self.board.do_action(our_action, self.team)
+        self.advance_root(our_action)
+        self.time_used += time.process_time() - start_time
+        return our_action
+
+    def update(self, action):
+        """
+        Inform player about opponent's most recent move
 
-    :param data:
-    :param loc:
-    :return:
-    """
+        :param action: opponent's action
+        :return: Nothing
+        """
+        start_time = time.process_time()
+        # Update our board with the opponent's action
+        self.board.do_action(action, self.enemy_team)
+        self.advance_root(action)
+        self.time_used += time.process_time() - start_time
+
+    def advance_root(self, action):
+        """ Moves the root of the search tree down to the child reached by
+        action (just played), keeping what was learnt about it """
+        if self.root is not None:
+            self.root = self.root.child_for_action(action)
+            if self.root is not None:
+                self.root.parent = None
+
+    def search(self, deadline):
+        """
+        Does Monte Carlo Tree Search from the current board
 
-    return 20
+        :param deadline: time.process_time() to stop searching at
+        :return: most visited action from the current board
+        """
+        if self.root is None:
+            self.root = Node(None, self.enemy_team, None,
+                             self.board.get_all_actions(self.team))
+        if len(self.root.untried) == 0 and len(self.root.children) == 0:
+            return None  # no possible actions. Forfeit turn
+
+        for iteration in range(MAX_ITERATIONS):
+            self.iterate()
+            if time.process_time() > deadline:
+                break
+
+        best_child = max(self.root.children, key=lambda child: child.visits)
+        return best_child.action
+
+    def iterate(self):
+        """ Does one iteration of selection, expansion, simulation
+        and back propagation. Leaves the board as it was """
+        node = self.root
+        records = []
+
+        # Selection
+        while len(node.untried) == 0 and len(node.children) > 0:
+            node = node.best_uct_child()
+            records.append(self.board.apply(node.action, node.team))
+
+        # Expansion
+        if len(node.untried) > 0 and not game_over(self.board):
+            action = node.untried.pop(randrange(0, len(node.untried)))
+            team = b.Board.get_opponent_team(node.team)
+            records.append(self.board.apply(action, team))
+            actions = []  # no actions if the game is over
+            if not game_over(self.board):
+                actions = self.board.get_all_actions(node.team)
+                if len(actions) == 0:
+                    actions = [None]  # the only option is to forfeit turn
+            child = Node(action, team, node, actions)
+            node.children.append(child)
+            node = child
+
+        # Simulation
+        winner = playout_result(self.board,
+                                b.Board.get_opponent_team(node.team))
+
+        # undo the actions applied on the way down
+        for record in reversed(records):
+            self.board.undo(record)
+
+        # Back Propagation
+        while node is not None:
+            node.visits += 1
+            if winner == node.team:
+                node.wins += 1
+            elif winner == 'T':
+                node.wins += 0.5
+            node = node.parent
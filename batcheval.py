@@ -0,0 +1,148 @@
+"""
+Values many positions at once with NumPy, e.g. all the children of a node.
+
+The greedy agents value each child of a node by applying its action and
+calling value_board, which loops over pieces in Python. Here the children
+are stacked into an N x 2 array of (white, black) bitboards and valued in
+one call:
+    - material and centrality: each bitboard is unpacked into 64 squares,
+      so piece counts and distances to the middle are sums over an axis
+    - Placing Phase threats: board.Board.placing_threats, with the shifts
+      done on the whole column of bitboards at once
+The values are exactly those of the agents' value_board.
+
+Agents call value_children, which values the children one at a time with
+the board's own value_board if NumPy isn't installed.
+"""
+try:
+    import numpy as np
+except ImportError:  # value_children falls back to value_board
+    np = None
+import board as bm
+
+# value of a piece, before subtracting its distance to the middle
+BASE_PIECE_VALUE = 30
+# an enemy piece that is threatened loses this fraction of its value
+# (they could still move it), and an own piece all of it
+ENEMY_THREAT_DIVISOR = 3
+
+_TEAM_INDEXES = {bm.WHITE: 0, bm.BLACK: 1}
+if np is not None:
+    _MID_DISTANCES = np.array(bm.MID_DISTANCES, dtype=np.int64)
+    _COLUMN_SHIFT = np.uint64(bm.BOARD_SIZE)  # moves a bit one column
+    _ROW_SHIFT = np.uint64(1)  # moves a bit one row
+    _NOT_TOP_ROW = np.uint64(bm.NOT_TOP_ROW_MASK)
+    _NOT_BOTTOM_ROW = np.uint64(bm.NOT_BOTTOM_ROW_MASK)
+
+
+def value_children(board, actions, team, **weights):
+    """
+    Values the board after each of team's actions, all at once if NumPy is
+    installed
+
+    :param board: board.Board subclass with a value_board(team) method
+    :param actions: list of team's actions
+    :param team: team doing the actions
+    :param weights: keyword arguments of value_boards (base_value,
+        distance_weight, threats) that make it value positions the way
+        board.value_board does
+    :return: list of board.value_board(team) of the board after each action
+    """
+    if np is not None:
+        children, phase = child_bitboards(board, actions, team)
+        return value_boards(children, phase, team, **weights).tolist()
+    values = []
+    for action in actions:
+        record = board.apply(action, team)
+        values.append(board.value_board(team))
+        board.undo(record)
+    return values
+
+
+def child_bitboards(board, actions, team):
+    """
+    Applies each action to board in turn (undoing it again) and stacks the
+    resulting positions
+
+    :param board: board.Board to apply the actions to
+    :param actions: list of team's actions
+    :param team: team doing the actions
+    :return: N x 2 array of (white, black) bitboards, one row per action,
+        and the phase after the actions (the same for all of them)
+    """
+    children = np.empty((len(actions), 2), dtype=np.uint64)
+    phase = board.phase
+    for i, action in enumerate(actions):
+        record = board.apply(action, team)
+        children[i] = board.bitboards[bm.WHITE], board.bitboards[bm.BLACK]
+        phase = board.phase
+        board.undo(record)
+    return children, phase
+
+
+def unpack(bitboards):
+    """
+    :param bitboards: array of bitboards, of any shape
+    :return: array of the same shape with an extra axis of 64 squares
+        (index c * BOARD_SIZE + r), 1 where there is a piece
+    """
+    as_bytes = bitboards.astype('<u8')[..., np.newaxis].view(np.uint8)
+    return np.unpackbits(as_bytes, axis=-1, bitorder='little')
+
+
+def placing_threats(white, black, phase):
+    """
+    board.Board.placing_threats for a column of positions
+
+    :param white: array of WHITE's bitboards
+    :param black: array of BLACK's bitboards
+    :param phase: phase of every position
+    :return: arrays of WHITE's and of BLACK's threatened pieces
+    """
+    corners = np.uint64(bm.CORNER_MASKS[phase])
+    empty = np.uint64(bm.FREE_MASKS[phase]) & ~(white | black)
+    threats = []
+    for own, enemy, enemy_team in ((white, black, bm.BLACK),
+                                   (black, white, bm.WHITE)):
+        sides = enemy | corners
+        places = np.uint64(bm.ZONE_MASKS[enemy_team]) & empty
+        threatened = (sides << _COLUMN_SHIFT) & (places >> _COLUMN_SHIFT)
+        threatened |= (sides >> _COLUMN_SHIFT) & (places << _COLUMN_SHIFT)
+        threatened |= (sides << _ROW_SHIFT & _NOT_TOP_ROW) \
+            & (places >> _ROW_SHIFT & _NOT_BOTTOM_ROW)
+        threatened |= (sides >> _ROW_SHIFT & _NOT_BOTTOM_ROW) \
+            & (places << _ROW_SHIFT & _NOT_TOP_ROW)
+        threats.append(own & threatened)
+    return threats[0], threats[1]
+
+
+def value_boards(bitboards, phase, team, base_value=BASE_PIECE_VALUE,
+                 distance_weight=1, threats=True):
+    """
+    Values every position at once, the way the greedy agents' value_board
+    values one: each piece is worth base_value, less distance_weight times
+    its distance to the middle. In Placing Phase, if threats is True,
+    pieces that the enemy could eliminate by placing lose their value
+    (a fraction of it for the enemy's pieces).
+
+    :param bitboards: N x 2 array of (white, black) bitboards
+    :param phase: phase of every position
+    :param team: the team who last moved
+    :param base_value: value of a piece before its distance to the middle
+    :param distance_weight: value lost per square away from the middle
+    :param threats: whether or not to count Placing Phase threats
+    :return: array of N integer values (higher is better for team)
+    """
+    team_index = _TEAM_INDEXES[team]
+    enemy_index = 1 - team_index
+    piece_values = base_value - distance_weight * _MID_DISTANCES
+    # N x 2 totals of each team's pieces' values
+    totals = unpack(bitboards).astype(np.int64) @ piece_values
+    if threats and phase == bm.PLACING_PHASE:
+        threatened = np.stack(placing_threats(
+                bitboards[:, 0], bitboards[:, 1], phase), axis=1)
+        threatened = unpack(threatened).astype(np.int64)
+        totals[:, team_index] -= threatened[:, team_index] @ piece_values
+        totals[:, enemy_index] -= \
+            threatened[:, enemy_index] @ (piece_values // ENEMY_THREAT_DIVISOR)
+    return totals[:, team_index] - totals[:, enemy_index]
@@ -0,0 +1,443 @@
+"""
+Benchmarks of the board's hot paths and the agents' searches, to catch
+regressions.
+
+Times each operation on a fixed corpus of positions from every phase (see
+CORPUS), separately for each phase:
+    get_all_actions         listing a team's actions (with no moves cached)
+    do_action               each legal action, on a copy of the position
+    update_pieces_removed   at every occupied square
+    advance_phase           to the next phase (not from SHRINK2)
+    copy, deepcopy          of greedy-agent-4's Board2 (Board.copy and
+                            copy.deepcopy)
+    value_board/AGENT       each agent's valuation of the position
+    search/AGENT            the agent's get_best_actions_from_state with
+                            depth SEARCH_DEPTH, on a new Board2 each time
+Each benchmark is run in --repeat passes of enough loops to take at least
+MIN_PASS_TIME, with the garbage collector off, and reported as the median
+time per operation, with the quartiles of the passes as its spread.
+
+The speed of a shared or throttled machine can also drift by tens of
+percent from minute to minute, which is more than the regressions worth
+catching. So each pass is preceded by a pass of fixed pure-Python work
+(reference_work), and each pass's time is also taken relative to the
+reference pass before it. Runs are compared by these relative times (by
+microseconds with --absolute).
+
+Results are written as JSON. If there are results of a previous run (by
+default, the output file before it is overwritten), each benchmark is
+compared with it. A benchmark has regressed if its median is slower by
+more than --threshold, and it is slower than the noise too: its lower
+quartile is slower than the previous run's upper quartile. Regressions
+are reported; with --fail, the tool also exits with status 1 if there
+are any, e.g. to fail a check before merging. Check that two runs of the
+same code pass on the machine before relying on that.
+
+usage: python benchmark.py [-h] [-o OUTPUT] [--baseline BASELINE]
+                           [-r REPEAT] [--threshold THRESHOLD] [-k SELECT]
+                           [--absolute] [--fail]
+"""
+import argparse
+import contextlib
+import copy
+import gc
+import importlib
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+
+import board as bm
+
+# positions (Board.get_state()) from games of greedy-agent-5 against
+# greedy-agent-4 (tournament.play_game with seeds 0 to 3), three per phase.
+# WHITE is to move when turn_count is even
+CORPUS = (
+    (0x0000000c0c000000, 0x0000003030000000, bm.PLACING_PHASE, 8),
+    (0x00080c0e0c040000, 0x0000303070300000, bm.PLACING_PHASE, 18),
+    (0x00000c0e0e080000, 0x0010303070200000, bm.PLACING_PHASE, 18),
+    (0x00080c0e0e0c0800, 0x0010307070301000, bm.MOVING_PHASE, 20),
+    (0x00080e0e0c081800, 0x0010307070700000, bm.MOVING_PHASE, 90),
+    (0x00000c0e0f0c0800, 0x0008307030303000, bm.MOVING_PHASE, 90),
+    (0x0008080e0a0c0c00, 0x0010707030301000, bm.SHRINK1_PHASE, 130),
+    (0x00080c0e0e060800, 0x0010303070601000, bm.SHRINK1_PHASE, 170),
+    (0x00080c0c0e080c00, 0x0010307050303000, bm.SHRINK1_PHASE, 170),
+    (0x000000040c080000, 0x0000102030000000, bm.SHRINK2_PHASE, 194),
+    (0x0000080c00000000, 0x0000003020100000, bm.SHRINK2_PHASE, 194),
+    (0x0000000c04000000, 0x0000002028000000, bm.SHRINK2_PHASE, 200),
+)
+PHASE_NAMES = ('placing', 'moving', 'shrink1', 'shrink2')
+
+# agents whose value_board and search are benchmarked
+AGENTS = ('greedy-agent-4', 'greedy-agent-5', 'mirror-agent')
+# Board2 whose copies are benchmarked (it has no search tables)
+COPIED_AGENT = 'greedy-agent-4'
+SEARCH_DEPTH = 2
+
+# a pass of a benchmark runs enough loops to take at least this long
+MIN_PASS_TIME = 0.2
+REPEAT_DEFAULT = 7
+# benchmarks this much slower than the baseline (and slower than the noise)
+# are regressions. Runs of the same code differ by up to about this much
+# on a busy machine
+THRESHOLD_DEFAULT = 0.25
+# iterations of reference_work (a few milliseconds' worth)
+REFERENCE_LOOPS = 100000
+
+
+def team_to_move(state):
+    """ :return: team to move in a position from CORPUS """
+    return bm.WHITE if state[3] % 2 == 0 else bm.BLACK
+
+
+def new_board(state, board_class=bm.Board):
+    """ :return: a new board_class in the given state """
+    board = board_class()
+    board.set_state(*state)
+    return board
+
+
+# Benchmarks. Each takes the positions of one phase and returns a pair of
+# functions: setup(loops) returns what a pass needs (e.g. boards to change),
+# untimed, and run(prepared) does the pass and returns how many operations
+# it timed
+
+def bench_get_all_actions(states):
+    # boards from set_state have no moves cached, and nor do their copies
+    boards = [(new_board(state), team_to_move(state)) for state in states]
+
+    def setup(loops):
+        return [(board.copy(), team) for _ in range(loops)
+                for board, team in boards]
+
+    def run(prepared):
+        for board, team in prepared:
+            board.get_all_actions(team)
+        return len(prepared)
+    return setup, run
+
+
+def bench_do_action(states):
+    boards = []
+    for state in states:
+        board = new_board(state)
+        team = team_to_move(state)
+        boards.extend((board, action, team)
+                      for action in board.get_all_actions(team))
+
+    def setup(loops):
+        return [(board.copy(), action, team) for _ in range(loops)
+                for board, action, team in boards]
+
+    def run(prepared):
+        for board, action, team in prepared:
+            board.do_action(action, team)
+        return len(prepared)
+    return setup, run
+
+
+def bench_update_pieces_removed(states):
+    boards = []
+    for state in states:
+        board = new_board(state)
+        boards.append((board, [bm.bit_to_pos(bit)
+                               for bit in bm.iter_bits(board.occupied())]))
+
+    def setup(loops):
+        return [(board.copy(), positions) for _ in range(loops)
+                for board, positions in boards]
+
+    def run(prepared):
+        ops = 0
+        for board, positions in prepared:
+            for pos in positions:
+                board.update_pieces_removed(pos)
+            ops += len(positions)
+        return ops
+    return setup, run
+
+
+def bench_advance_phase(states):
+    boards = [new_board(state) for state in states
+              if state[2] != bm.SHRINK2_PHASE]
+    if not boards:
+        return None  # there is no phase after SHRINK2
+
+    def setup(loops):
+        return [board.copy() for _ in range(loops) for board in boards]
+
+    def run(prepared):
+        for board in prepared:
+            board.advance_phase()
+        return len(prepared)
+    return setup, run
+
+
+def bench_copy(states, deep=False):
+    board_class = importlib.import_module(COPIED_AGENT).Board2
+    boards = [new_board(state, board_class) for state in states]
+
+    def setup(loops):
+        return boards * loops
+
+    def run(prepared):
+        for board in prepared:
+            copy.deepcopy(board) if deep else board.copy()
+        return len(prepared)
+    return setup, run
+
+
+def bench_value_board(states, agent):
+    board_class = importlib.import_module(agent).Board2
+    # value_board takes the team who last moved
+    boards = [(new_board(state, board_class),
+               bm.Board.get_opponent_team(team_to_move(state)))
+              for state in states]
+
+    def setup(loops):
+        return boards * loops
+
+    def run(prepared):
+        for board, team in prepared:
+            board.value_board(team)
+        return len(prepared)
+    return setup, run
+
+
+def bench_search(states, agent):
+    board_class = importlib.import_module(agent).Board2
+
+    def setup(loops):
+        # new boards, so that no search tables are kept between passes
+        return [(new_board(state, board_class), team_to_move(state))
+                for _ in range(loops) for state in states]
+
+    def run(prepared):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for board, team in prepared:
+                board.get_best_actions_from_state(
+                        team, bm.Board.get_opponent_team(team), SEARCH_DEPTH)
+        return len(prepared)
+    return setup, run
+
+
+def benchmarks():
+    """ :return: list of (name, function of positions returning a
+    benchmark's setup and run functions, or None to skip it) """
+    result = [('get_all_actions', bench_get_all_actions),
+              ('do_action', bench_do_action),
+              ('update_pieces_removed', bench_update_pieces_removed),
+              ('advance_phase', bench_advance_phase),
+              ('copy', bench_copy),
+              ('deepcopy', lambda states: bench_copy(states, deep=True))]
+    for agent in AGENTS:
+        result.append(('value_board/' + agent,
+                       lambda states, agent=agent:
+                       bench_value_board(states, agent)))
+    for agent in AGENTS:
+        result.append(('search/' + agent,
+                       lambda states, agent=agent: bench_search(states, agent)))
+    return result
+
+
+def reference_work(prepared):
+    """ fixed pure-Python work to measure the speed of the machine by """
+    total = 0
+    for i in range(REFERENCE_LOOPS):
+        total += i * i & 0xff
+    return 1
+
+
+def time_pass(setup, run, loops):
+    """ :return: seconds a pass of loops took, and its operations """
+    prepared = setup(loops)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start_time = time.perf_counter()
+        ops = run(prepared)
+        return time.perf_counter() - start_time, ops
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def time_benchmark(setup, run, repeat):
+    """
+    :return: time (seconds) per operation of each of repeat passes, the
+        number of operations in a pass, and the time of each pass relative
+        to the reference pass before it
+    """
+    loops = 1
+    while True:  # find how many loops a pass needs
+        elapsed, _ = time_pass(setup, run, loops)
+        if elapsed >= MIN_PASS_TIME:
+            break
+        loops = min(loops * 10, max(loops + 1, math.ceil(
+                loops * MIN_PASS_TIME / max(elapsed, 1e-9) * 1.2)))
+    times = []
+    relative_times = []
+    for _ in range(repeat):
+        reference, _ = time_pass(lambda loops: None, reference_work, 1)
+        elapsed, ops = time_pass(setup, run, loops)
+        times.append(elapsed / ops)
+        relative_times.append(elapsed / ops / reference)
+    return times, ops, relative_times
+
+
+def summarise_times(times):
+    """ :return: median of times, and their lower and upper quartiles """
+    if len(times) < 2:
+        return times[0], [times[0], times[0]]
+    lower, _, upper = statistics.quantiles(times, n=4, method='inclusive')
+    return statistics.median(times), [lower, upper]
+
+
+def run_benchmarks(repeat=REPEAT_DEFAULT, select=None, on_result=None):
+    """
+    :param repeat: passes of each benchmark
+    :param select: if given, only benchmarks whose name (e.g.
+        'search/mirror-agent/moving') contains this are run
+    :param on_result: if given, called with the name and result of each
+        benchmark as soon as it finishes
+    :return: {'NAME/PHASE': {'us_per_op', 'us_per_op_quartiles', 'ops',
+        'relative', 'relative_quartiles'}}: the median time per operation
+        (microseconds, and relative to the time of reference_work) and the
+        quartiles of the passes
+    """
+    results = {}
+    for name, benchmark in benchmarks():
+        for phase, phase_name in zip(bm.PHASES, PHASE_NAMES):
+            full_name = '{}/{}'.format(name, phase_name)
+            if select is not None and select not in full_name:
+                continue
+            functions = benchmark([state for state in CORPUS
+                                   if state[2] == phase])
+            if functions is None:
+                continue
+            times, ops, relative_times = time_benchmark(*functions, repeat)
+            us_per_op, us_per_op_quartiles = summarise_times(
+                    [seconds * 1e6 for seconds in times])
+            relative, relative_quartiles = summarise_times(relative_times)
+            results[full_name] = {
+                    'us_per_op': us_per_op,
+                    'us_per_op_quartiles': us_per_op_quartiles, 'ops': ops,
+                    'relative': relative,
+                    'relative_quartiles': relative_quartiles}
+            if on_result is not None:
+                on_result(full_name, results[full_name])
+    return results
+
+
+def spread(result, key):
+    """ :return: half the interquartile range of result[key] (from
+    run_benchmarks), as a fraction of its median """
+    lower, upper = result.get(key + '_quartiles', (result[key],) * 2)
+    return (upper - lower) / 2 / result[key]
+
+
+def compare(results, baseline, threshold=THRESHOLD_DEFAULT, absolute=False):
+    """
+    :param results: results of run_benchmarks
+    :param baseline: results of a previous run
+    :param threshold: fraction slower that counts as a regression, if it
+        is also slower than the noise of the two runs
+    :param absolute: whether to compare microseconds per operation rather
+        than times relative to reference_work
+    :return: lines comparing the benchmarks in both, and names of the
+        benchmarks that regressed
+    """
+    key = 'us_per_op' if absolute else 'relative'
+    quartiles_key = key + '_quartiles'
+    lines = ['{:<40} {:>15} {:>15} {:>8}'.format(
+             'benchmark', 'before us', 'now us', 'change')]
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        change = result[key] / before[key] - 1
+        # quartiles of both runs (baselines from before there were
+        # quartiles only have the fastest time)
+        before_upper = before.get(quartiles_key, (before[key],) * 2)[1]
+        now_lower = result.get(quartiles_key, (result[key],) * 2)[0]
+        note = ''
+        if change > threshold and now_lower > before_upper:
+            note = '  SLOWER'
+            regressions.append(name)
+        elif change < -threshold:
+            note = '  faster'
+        lines.append('{:<40} {:>8.3f} +-{:>3.0f}% {:>8.3f} +-{:>3.0f}% '
+                     '{:>+7.1f}%{}'.format(
+                name, before['us_per_op'], 100 * spread(before, 'us_per_op'),
+                result['us_per_op'], 100 * spread(result, 'us_per_op'),
+                100 * change, note))
+    return lines, regressions
+
+
+def main():
+    """ Runs the benchmarks from the command line """
+    parser = argparse.ArgumentParser(
+            description="Benchmarks the board's hot paths and the agents' "
+                        "searches on a fixed set of positions")
+    parser.add_argument('-o', '--output', default='benchmark.json',
+                        help="file to write the results (JSON) to")
+    parser.add_argument('--baseline',
+                        help="results of a previous run to compare with "
+                             "(by default, the output file if it exists)")
+    parser.add_argument('-r', '--repeat', type=int, default=REPEAT_DEFAULT,
+                        help="passes of each benchmark (the median counts)")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD_DEFAULT,
+                        help="fraction slower than the baseline that counts "
+                             "as a regression (if also slower than the noise)")
+    parser.add_argument('-k', '--select',
+                        help="only run benchmarks whose name contains this")
+    parser.add_argument('--absolute', action='store_true',
+                        help="compare microseconds rather than times "
+                             "relative to the reference work")
+    parser.add_argument('--fail', action='store_true',
+                        help="exit with status 1 if there are regressions")
+    args = parser.parse_args()
+
+    baseline_path = args.baseline
+    if baseline_path is None and os.path.exists(args.output):
+        baseline_path = args.output
+    baseline = None
+    if baseline_path is not None:
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        if not isinstance(baseline, dict) or 'results' not in baseline:
+            parser.error("{} isn't the output of benchmark.py".format(
+                    baseline_path))
+
+    results = run_benchmarks(
+            args.repeat, args.select,
+            lambda name, result: print('{:<40} {:>12.3f} us +-{:.1f}%'.format(
+                    name, result['us_per_op'],
+                    100 * spread(result, 'us_per_op')), flush=True))
+    with open(args.output, 'w') as output_file:
+        json.dump({'python': platform.python_version(),
+                   'machine': platform.machine(),
+                   'repeat': args.repeat, 'results': results},
+                  output_file, indent=2)
+
+    if baseline is not None:
+        lines, regressions = compare(results, baseline['results'],
+                                     args.threshold, args.absolute)
+        print()
+        print('compared with {} (Python {})'.format(baseline_path,
+                                                   baseline['python']))
+        print('\n'.join(lines))
+        if regressions:
+            print('{} regression(s): {}'.format(len(regressions),
+                                                ', '.join(regressions)))
+            if args.fail:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
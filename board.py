@@ -1,6 +1,11 @@
 """
 By Zufeng Wang
 """
+from collections import namedtuple
+import mmap
+import os
+import random
+import struct
 
 BOARD_SIZE = 8
 # board constants
@@ -15,20 +20,725 @@ PLACING_PHASE = 0
 MOVING_PHASE = 1
 SHRINK1_PHASE = 2
 SHRINK2_PHASE = 3
+PHASES = (PLACING_PHASE, MOVING_PHASE, SHRINK1_PHASE, SHRINK2_PHASE)
 
+# Bitboards: squares are numbered column-major, square = c * BOARD_SIZE + r,
+# and bit (1 << square) of an int represents the position (c, r).
+# Numbering column-major means ascending squares visit positions in the same
+# order as the nested `for c ... for r ...` loops used by the agents.
+NUM_SQUARES = BOARD_SIZE * BOARD_SIZE
+SQUARE_POS = tuple((sq // BOARD_SIZE, sq % BOARD_SIZE)
+                   for sq in range(NUM_SQUARES))
+# the four cardinal directions a piece can move in
+DIRECTIONS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
+
+def on_grid(position):
+    """:return: whether or not position lies on the full 8x8 grid"""
+    return 0 <= position[0] < BOARD_SIZE and 0 <= position[1] < BOARD_SIZE
+
+
+def pos_to_bit(position):
+    """:return: bitboard with only position set, or 0 if off the 8x8 grid"""
+    if on_grid(position):
+        return 1 << (position[0] * BOARD_SIZE + position[1])
+    return 0
+
+
+def bit_to_pos(bit):
+    """:return: position (c, r) of a bitboard with exactly one bit set"""
+    return SQUARE_POS[bit.bit_length() - 1]
+
+
+def iter_bits(bits):
+    """ yields each set bit of a bitboard, in ascending square order """
+    while bits:
+        low_bit = bits & -bits
+        yield low_bit
+        bits ^= low_bit
+
+
+def popcount(bits):
+    """:return: number of set bits (pieces) in a bitboard"""
+    return bin(bits).count('1')
+
+
+if hasattr(int, 'bit_count'):  # Python 3.10+ has a faster built-in
+    popcount = int.bit_count
+
+
+def _mask_of(positions):
+    """:return: bitboard with all of positions set"""
+    mask = 0
+    for position in positions:
+        mask |= pos_to_bit(position)
+    return mask
+
+
+def _ring_bounds(phase):
+    """:return: (low, high) inclusive index bounds of the board in phase"""
+    shrinks = max(0, phase - MOVING_PHASE)
+    return shrinks, BOARD_SIZE - 1 - shrinks
+
+
+def _corners_of_phase(phase):
+    """ corners in CCW order starting from top-left """
+    low, high = _ring_bounds(phase)
+    return (low, low), (low, high), (high, high), (high, low)
+
+
+# corner positions, and bitboards of in-bounds squares, corners, and squares
+# a piece may stand on (in bounds and not a corner), indexed by phase
+CORNERS = tuple(_corners_of_phase(phase) for phase in PHASES)
+BOUNDS_MASKS = tuple(
+        _mask_of((c, r) for c in range(_ring_bounds(phase)[0],
+                                       _ring_bounds(phase)[1] + 1)
+                 for r in range(_ring_bounds(phase)[0],
+                                _ring_bounds(phase)[1] + 1))
+        for phase in PHASES)
+CORNER_MASKS = tuple(_mask_of(CORNERS[phase]) for phase in PHASES)
+FREE_MASKS = tuple(BOUNDS_MASKS[phase] & ~CORNER_MASKS[phase]
+                   for phase in PHASES)
+# squares each team may place in during Placing Phase (their starting zone)
+ZONE_MASKS = {
+    WHITE: _mask_of((c, r) for c in range(BOARD_SIZE) for r in range(0, 6)),
+    BLACK: _mask_of((c, r) for c in range(BOARD_SIZE)
+                    for r in range(2, BOARD_SIZE)),
+}
+# for each square, one entry per direction in DIRECTIONS:
+#   (adjacent bit, adjacent position, beyond bit, beyond position)
+# where "beyond" is the square on the far side of the adjacent one.
+# Bits are 0 for squares off the 8x8 grid so they never match a bitboard.
+NEIGHBOURS = tuple(
+    tuple((pos_to_bit((c + c_off, r + r_off)), (c + c_off, r + r_off),
+           pos_to_bit((c + 2 * c_off, r + 2 * r_off)),
+           (c + 2 * c_off, r + 2 * r_off))
+          for c_off, r_off in DIRECTIONS)
+    for c, r in SQUARE_POS)
+# Per-phase versions of NEIGHBOURS, indexed [phase][square], keeping only
+# what can apply in that phase so that callers needn't check bounds:
+#   MOVES: (adjacent bit, adjacent position, beyond bit, beyond position)
+#       for each adjacent square a piece can step to (in bounds and not a
+#       corner). Beyond bit is 0 if a piece can't land there by jumping
+#   CAPTURES: (adjacent bit, adjacent position, beyond bit) where a piece
+#       arriving here surrounds a piece on the adjacent square against the
+#       square beyond it (an ally or a corner)
+#   SANDWICHES: bitboards of the two squares either side of this one (left
+#       and right, then up and down), if both are in bounds. A piece here is
+#       eliminated if both squares of a pair hold enemies or corners
+MOVES = tuple(
+    tuple(tuple((adj_bit, adj_pos, FREE_MASKS[phase] & opp_bit, opp_pos)
+                for adj_bit, adj_pos, opp_bit, opp_pos in NEIGHBOURS[square]
+                if FREE_MASKS[phase] & adj_bit)
+          for square in range(NUM_SQUARES))
+    for phase in PHASES)
+CAPTURES = tuple(
+    tuple(tuple((adj_bit, adj_pos, opp_bit)
+                for adj_bit, adj_pos, opp_bit, _ in NEIGHBOURS[square]
+                if FREE_MASKS[phase] & adj_bit
+                and BOUNDS_MASKS[phase] & opp_bit)
+          for square in range(NUM_SQUARES))
+    for phase in PHASES)
+SANDWICHES = tuple(
+    tuple(tuple(side_a[0] | side_b[0]
+                for side_a, side_b in ((right, left), (down, up))
+                if BOUNDS_MASKS[phase] & side_a[0]
+                and BOUNDS_MASKS[phase] & side_b[0])
+          for right, down, left, up in NEIGHBOURS)
+    for phase in PHASES)
+
+# for each square, the squares whose pieces' moves change when a piece
+# arrives or leaves there: itself, and up to two squares away in a line
+MOVE_DEPENDENTS = tuple(
+    1 << square | _mask_of(pos for _, adj_pos, _, opp_pos in NEIGHBOURS[square]
+                           for pos in (adj_pos, opp_pos))
+    for square in range(NUM_SQUARES))
+
+
+def _shrink_squares(phase):
+    """ :return: positions next to the corners of phase, in CCW order of
+    the corners, starting from top-left """
+    (c0, r0), (c1, r1), (c2, r2), (c3, r3) = CORNERS[phase]
+    return ((c0 + 1, r0), (c0, r0 + 1), (c1 + 1, r1), (c1, r1 - 1),
+            (c2 - 1, r2), (c2, r2 - 1), (c3 - 1, r3), (c3, r3 + 1))
+
+
+# squares whose pieces may be eliminated by the corners of each phase
+SHRINK_SQUARES = tuple(_shrink_squares(phase) for phase in PHASES)
+FULL_MASK = (1 << NUM_SQUARES) - 1
+# masks to drop bits that wrap into the next column when shifting a bitboard
+# by one row (down: << 1 lands them in row 0, up: >> 1 lands them in row 7)
+NOT_TOP_ROW_MASK = FULL_MASK & ~_mask_of((c, 0) for c in range(BOARD_SIZE))
+NOT_BOTTOM_ROW_MASK = FULL_MASK \
+    & ~_mask_of((c, BOARD_SIZE - 1) for c in range(BOARD_SIZE))
+
+
+def distance_of_pos_to_mid(pos):
+    """ :returns Manhattan distance of pos to middle four squares """
+    # middle indexes are: 3, 4
+    x_diff = min(abs(3 - pos[0]), abs(4 - pos[0]))
+    y_diff = min(abs(3 - pos[1]), abs(4 - pos[1]))
+    return x_diff + y_diff
+
+
+# distance of each square to the middle four squares, and the middle four
+MID_DISTANCES = tuple(distance_of_pos_to_mid(pos) for pos in SQUARE_POS)
+MID_MASK = _mask_of(pos for pos in SQUARE_POS
+                    if distance_of_pos_to_mid(pos) == 0)
+
+# Zobrist hashing: a board's hash is the XOR of one random key per
+# (team, square) piece and one key for the phase. Seeded so that hashes are
+# the same in every process and can be saved to disk.
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+_zobrist_random = random.Random(30024)
+ZOBRIST_PIECE_KEYS = {
+    team: tuple(_zobrist_random.getrandbits(HASH_BITS)
+                for _ in range(NUM_SQUARES))
+    for team in TEAMS
+}
+ZOBRIST_PHASE_KEYS = tuple(_zobrist_random.getrandbits(HASH_BITS)
+                           for _ in PHASES)
+# odd multiplier used to mix the turn count into search keys
+TURN_KEY_MULTIPLIER = 0x9E3779B97F4A7C15
+
+# Everything Board.undo needs to reverse one Board.apply.
+#   action, team: the action that was applied and who applied it
+#   phase, turn_count: values before the action
+#   captured: (white, black) bitboards of pieces removed by the action
+#   shrink_removed: (white, black) bitboards of pieces removed by the board
+#       shrinking (or the placing phase ending) straight after the action
+UndoRecord = namedtuple('UndoRecord', ('action', 'team', 'phase', 'turn_count',
+                                       'captured', 'shrink_removed'))
+# A piece on the board, as returned by Board.pieces and get_piece_at_pos.
+# Pieces are only stored in the bitboards; these are built on demand
+Piece = namedtuple('Piece', ('pos', 'team'))
+
+
+# Limits on agents' time, which the referee and tournament.py pass to agents
+# in environment variables (Player is only given its colour). Each is in
+# seconds, with 0 or unset for no limit:
+#   TIME_LIMIT_ENV: CPU time each player gets for the whole game (-t)
+#   MOVE_TIME_ENV: most time to spend choosing one action (-m)
+TIME_LIMIT_ENV = 'WYB_TIME_LIMIT'
+MOVE_TIME_ENV = 'WYB_MOVE_TIME'
+
+
+def time_limit_from_env(name, default):
+    """
+    :param name: TIME_LIMIT_ENV or MOVE_TIME_ENV
+    :param default: what to return if there is no limit
+    :return: the limit (seconds) set in the environment variable name,
+        or default
+    """
+    limit = float(os.environ.get(name) or 0)
+    return limit if limit > 0 else default
+
+# bound types of transposition table values
+EXACT = 0
+LOWER_BOUND = 1  # true value is at least the stored value
+UPPER_BOUND = 2  # true value is at most the stored value
+
+
+class TranspositionTable(object):
+    """
+    Fixed-size table of search results, indexed by Board.search_key.
+    Each slot holds one entry: (key, depth, value, bound, best_action, age).
+    When two keys want the same slot, the new entry replaces the old one if
+    the old one is from a previous search or was searched less deeply.
+    """
+
+    def __init__(self, size_log2=16):
+        """
+        :param size_log2: table holds 2 ** size_log2 entries
+        """
+        self.mask = (1 << size_log2) - 1
+        self.entries = [None] * (1 << size_log2)
+        # incremented for every new search so that old entries are replaced
+        self.age = 0
+
+    def new_search(self):
+        """ call once before each search from the root """
+        self.age += 1
+
+    def lookup(self, key):
+        """
+        :param key: Board.search_key of the position
+        :return: entry (key, depth, value, bound, best_action, age),
+            or None if this position isn't stored
+        """
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, value, bound, best_action):
+        """
+        Stores a search result, unless it would replace a more useful entry
+
+        :param key: Board.search_key of the position
+        :param depth: depth the position was searched to
+        :param value: value found
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param best_action: best action found from the position (or None)
+        :return:
+        """
+        index = key & self.mask
+        old = self.entries[index]
+        if old is None or old[0] == key or old[5] != self.age \
+                or depth >= old[1]:
+            self.entries[index] = (key, depth, value, bound, best_action,
+                                   self.age)
+
+    def clear(self):
+        """ removes all entries """
+        self.entries = [None] * len(self.entries)
+
+
+def position_key(white, black, phase, turn_count):
+    """ :return: Board.search_key of a board in the given state,
+    calculated from scratch (e.g. for a board that hasn't been built) """
+    key = ZOBRIST_PHASE_KEYS[phase] \
+        ^ (turn_count * TURN_KEY_MULTIPLIER & HASH_MASK)
+    for team, bits in ((WHITE, white), (BLACK, black)):
+        keys = ZOBRIST_PIECE_KEYS[team]
+        for bit in iter_bits(bits):
+            key ^= keys[bit.bit_length() - 1]
+    return key
+
+
+class SearchStats(object):
+    """
+    How much work a search did. Agents that search fill one in for each of
+    their actions, and keep it as Player.search_stats, so that the referee
+    and tournament runner can collect it without anything being printed.
+    Stats of several searches (or actions) add up with add.
+    Depths are remaining depths, so cut-offs at depth 1 are just above the
+    leaves.
+    """
 
-class Board(object):
     def __init__(self):
-        # initialise empty board
-        self.board = []
-        for i in range(BOARD_SIZE):
-            self.board.append([None] * BOARD_SIZE)
+        self.nodes = 0  # positions visited, including leaves
+        self.leaves = 0  # positions valued without searching deeper
+        self.evaluations = 0  # calls to value_board
+        self.cutoffs = {}  # depth -> number of alpha-beta cut-offs there
+        # transposition table lookups, how many found the position, and how
+        # many of those had a value that could be used without searching
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        # root searches that finished: how many, the deepest, and for each
+        # depth its nodes and time (seconds)
+        self.searches = 0
+        self.depth = 0
+        self.depth_nodes = {}
+        self.depth_times = {}
+        # total over the finished searches of nodes ** (1 / depth)
+        self.branching_total = 0.0
+
+    def cutoff(self, depth):
+        """ counts an alpha-beta cut-off at depth """
+        self.cutoffs[depth] = self.cutoffs.get(depth, 0) + 1
+
+    def finish_search(self, depth, nodes, seconds):
+        """
+        Records that a search from the root finished
+
+        :param depth: depth of the search
+        :param nodes: nodes it visited
+        :param seconds: time it took
+        :return:
+        """
+        self.searches += 1
+        self.depth = max(self.depth, depth)
+        self.depth_nodes[depth] = self.depth_nodes.get(depth, 0) + nodes
+        self.depth_times[depth] = self.depth_times.get(depth, 0) + seconds
+        self.branching_total += nodes ** (1 / depth)
+
+    def effective_branching_factor(self):
+        """ :return: b such that a search of depth d visits b ** d nodes,
+        averaged over the finished searches (0 if there are none) """
+        if self.searches == 0:
+            return 0.0
+        return self.branching_total / self.searches
+
+    def add(self, other):
+        """ adds the stats of other (a SearchStats) to these """
+        for name in ('nodes', 'leaves', 'evaluations', 'tt_probes',
+                     'tt_hits', 'tt_cutoffs', 'searches', 'branching_total'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.depth = max(self.depth, other.depth)
+        for name in ('cutoffs', 'depth_nodes', 'depth_times'):
+            totals = getattr(self, name)
+            for depth, value in getattr(other, name).items():
+                totals[depth] = totals.get(depth, 0) + value
+
+    @staticmethod
+    def from_dict(stats):
+        """ :return: SearchStats from a dict made by as_dict (possibly
+        after being written as JSON and read back) """
+        search_stats = SearchStats()
+        for name in ('nodes', 'leaves', 'evaluations', 'tt_probes',
+                     'tt_hits', 'tt_cutoffs', 'searches', 'depth'):
+            setattr(search_stats, name, stats[name])
+        search_stats.branching_total = \
+            stats['branching_factor'] * stats['searches']
+        for name, key in (('cutoffs', 'cutoffs_by_depth'),
+                          ('depth_nodes', 'depth_nodes'),
+                          ('depth_times', 'depth_times')):
+            setattr(search_stats, name, {int(depth): value for depth, value
+                                         in stats[key].items()})
+        return search_stats
+
+    def as_dict(self):
+        """ :return: the stats as a dict that can be written as JSON """
+        return {'nodes': self.nodes, 'leaves': self.leaves,
+                'evaluations': self.evaluations,
+                'cutoffs': sum(self.cutoffs.values()),
+                'cutoffs_by_depth': dict(sorted(self.cutoffs.items())),
+                'tt_probes': self.tt_probes, 'tt_hits': self.tt_hits,
+                'tt_cutoffs': self.tt_cutoffs, 'searches': self.searches,
+                'depth': self.depth,
+                'depth_nodes': dict(sorted(self.depth_nodes.items())),
+                'depth_times': dict(sorted(self.depth_times.items())),
+                'branching_factor': self.effective_branching_factor()}
+
+
+# Symmetries of the board: the 8 ways to rotate or reflect the square.
+# Each maps position (c, r) to another position. The corners, the shrinks
+# and the rules for moving and eliminating are the same under all of them
+_LAST = BOARD_SIZE - 1
+SYMMETRIES = (
+    lambda c, r: (c, r),  # identity
+    lambda c, r: (_LAST - c, r),  # reflect left to right
+    lambda c, r: (c, _LAST - r),  # reflect top to bottom
+    lambda c, r: (_LAST - c, _LAST - r),  # rotate 180 degrees
+    lambda c, r: (r, c),  # reflect in the main diagonal
+    lambda c, r: (_LAST - r, c),  # rotate 90 degrees clockwise
+    lambda c, r: (r, _LAST - c),  # rotate 90 degrees anticlockwise
+    lambda c, r: (_LAST - r, _LAST - c),  # reflect in the other diagonal
+)
+IDENTITY = 0
+MIRROR_COLUMNS = 1
+# symmetries that keep positions equivalent in each phase. The starting
+# zones are bands of rows, different for each team, so in Placing Phase
+# only reflecting left to right keeps them (and so the legal actions) the
+# same. Swapping the teams too never works: WHITE always moves on even turns
+PHASE_SYMMETRIES = tuple(
+    (IDENTITY, MIRROR_COLUMNS) if phase == PLACING_PHASE
+    else tuple(range(len(SYMMETRIES)))
+    for phase in PHASES)
+
+
+def _symmetry_tables(symmetry):
+    """ :return: for each column (byte) of a bitboard, the transformed
+    bitboard of each of the 256 values of its byte """
+    tables = []
+    for c in range(BOARD_SIZE):
+        table = []
+        for byte in range(256):
+            bits = 0
+            for r in range(BOARD_SIZE):
+                if byte & 1 << r:
+                    bits |= pos_to_bit(SYMMETRIES[symmetry](c, r))
+            table.append(bits)
+        tables.append(tuple(table))
+    return tuple(tables)
+
+
+_SYMMETRY_TABLES = tuple(_symmetry_tables(symmetry)
+                         for symmetry in range(len(SYMMETRIES)))
+# symmetry that undoes each symmetry
+SYMMETRY_INVERSES = tuple(
+    next(inverse for inverse in range(len(SYMMETRIES))
+         if all(SYMMETRIES[inverse](*SYMMETRIES[symmetry](*pos)) == pos
+                for pos in SQUARE_POS))
+    for symmetry in range(len(SYMMETRIES)))
+
+
+def transform_bits(bits, symmetry):
+    """ :return: bitboard with every square moved by symmetry """
+    if symmetry == IDENTITY:
+        return bits
+    result = 0
+    for table in _SYMMETRY_TABLES[symmetry]:
+        result |= table[bits & 255]
+        bits >>= BOARD_SIZE
+    return result
+
+
+def transform_action(action, symmetry):
+    """ :return: action (in the referee's format) moved by symmetry """
+    if action is None:
+        return None
+    elif isinstance(action[0], int):  # placing: (x, y)
+        return SYMMETRIES[symmetry](*action)
+    return tuple(SYMMETRIES[symmetry](*pos) for pos in action)
+
+
+def canonical_state(white, black, phase):
+    """
+    Picks one representative of the positions equivalent to the given one
+    under PHASE_SYMMETRIES: the one whose (white, black) is smallest
+
+    :param white: bitboard of WHITE's pieces
+    :param black: bitboard of BLACK's pieces
+    :param phase: phase of the game
+    :return: (white, black) of the representative, and the symmetry that
+        maps the given position onto it
+    """
+    best = (white, black)
+    best_symmetry = IDENTITY
+    for symmetry in PHASE_SYMMETRIES[phase][1:]:
+        candidate = (transform_bits(white, symmetry),
+                     transform_bits(black, symmetry))
+        if candidate < best:
+            best = candidate
+            best_symmetry = symmetry
+    return best, best_symmetry
+
+
+# Opening book file: a sorted table of fixed-size entries
+#   key: Board.canonical_key of the position
+#   actions: bitboard of the squares of the best placing actions
+#       (in the same orientation as the canonical position)
+#   value: value of the best actions, from the search that found them
+OPENING_BOOK_ENTRY = struct.Struct('<QQi')
+
+
+class OpeningBook(object):
+    """
+    Best Placing Phase actions for positions searched ahead of time
+    (by openingbook.py). The file isn't read until the first lookup.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: opening book file. If it doesn't exist, the book is empty
+        """
+        self.path = path
+        self.entries = None  # {key: (actions, value)} once loaded
+
+    def load(self):
+        """ reads the book file, if it hasn't been read yet """
+        if self.entries is not None:
+            return
+        self.entries = {}
+        try:
+            with open(self.path, 'rb') as book_file:
+                data = book_file.read()
+        except OSError:
+            return  # no book
+        for key, actions, value in OPENING_BOOK_ENTRY.iter_unpack(data):
+            self.entries[key] = (actions, value)
+
+    def lookup(self, board):
+        """
+        :param board: Board in Placing Phase
+        :return: list of best actions for the team to move and their value,
+            or None if the position isn't in the book
+        """
+        self.load()
+        if len(self.entries) == 0 or board.phase != PLACING_PHASE:
+            return None
+        key, symmetry = board.canonical_key()
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        actions, value = entry
+        actions = transform_bits(actions, SYMMETRY_INVERSES[symmetry])
+        return [bit_to_pos(bit) for bit in iter_bits(actions)], value
+
+    @staticmethod
+    def write(path, entries):
+        """
+        Writes an opening book file
+
+        :param path: file to write
+        :param entries: {key: (actions bitboard, value)}, keys from
+            Board.canonical_key
+        :return:
+        """
+        with open(path, 'wb') as book_file:
+            for key in sorted(entries):
+                actions, value = entries[key]
+                book_file.write(OPENING_BOOK_ENTRY.pack(key, actions, value))
 
-        self.pieces = [None] * 24
+
+# Endgame tablebase: the result of every position after the second shrink
+# (with few enough pieces), with perfect play. Each of the 12 squares a
+# piece can stand on is empty, WHITE or BLACK, so a position (and the team
+# to move) is one of 2 * 3 ** 12 indexes into a table of one-byte results:
+TABLEBASE_UNKNOWN = 0  # position isn't in the table (too many pieces)
+TABLEBASE_DRAW = 1  # nobody can force a win (including a tie)
+TABLEBASE_WIN = 2  # 2 + n: team to move wins after n more turns
+TABLEBASE_LOSS = 128  # 128 + n: team to move loses after n more turns
+TABLEBASE_SQUARES = tuple(bit_to_pos(bit)
+                          for bit in iter_bits(FREE_MASKS[SHRINK2_PHASE]))
+TABLEBASE_SIZE = 2 * 3 ** len(TABLEBASE_SQUARES)
+
+
+def _tablebase_column_indexes():
+    """
+    Each column of the shrunk board is 4 squares, so is a nibble of each
+    bitboard. For each column, makes the table of the part of the
+    tablebase index for each (white nibble, black nibble).
+    """
+    low, high = _ring_bounds(SHRINK2_PHASE)
+    columns = []
+    for c in range(low, high + 1):
+        column = [0] * 256
+        for white in range(16):
+            for black in range(16):
+                if white & black:
+                    continue
+                index = 0
+                for r in range(low, high + 1):
+                    if (c, r) not in TABLEBASE_SQUARES:
+                        continue
+                    digit = 3 ** TABLEBASE_SQUARES.index((c, r))
+                    if white & 1 << (r - low):
+                        index += digit
+                    elif black & 1 << (r - low):
+                        index += 2 * digit
+                column[white << 4 | black] = index
+        columns.append((c * BOARD_SIZE + low, column))
+    return tuple(columns)
+
+
+# (bit shift of the column's nibble, index parts) for each column
+_TABLEBASE_COLUMNS = _tablebase_column_indexes()
+
+
+def tablebase_index(white, black, team):
+    """
+    :param white: bitboard of WHITE's pieces (after the second shrink)
+    :param black: bitboard of BLACK's pieces
+    :param team: team to move
+    :return: index of the position in the tablebase
+    """
+    index = 0
+    for shift, column in _TABLEBASE_COLUMNS:
+        index += column[(white >> shift & 15) << 4 | black >> shift & 15]
+    return 2 * index + (team == BLACK)
+
+
+class EndgameTablebase(object):
+    """
+    Results of positions after the second shrink (made by tablebase.py),
+    read from a memory-mapped file. The file isn't opened until the first
+    lookup, and only the pages that are looked up are read from disk.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: tablebase file. If it doesn't exist, nothing is known
+        """
+        self.path = path
+        self.table = None  # mmap of the file once opened (b'' if none)
+
+    def load(self):
+        """ opens the tablebase file, if it hasn't been opened yet """
+        if self.table is not None:
+            return
+        self.table = b''
+        try:
+            with open(self.path, 'rb') as table_file:
+                self.table = mmap.mmap(table_file.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return  # no (or empty) tablebase
+
+    def lookup(self, board, team):
+        """
+        :param board: Board
+        :param team: team to move
+        :return: TABLEBASE_UNKNOWN, TABLEBASE_DRAW, TABLEBASE_WIN + n
+            or TABLEBASE_LOSS + n (for team)
+        """
+        if board.phase != SHRINK2_PHASE:
+            return TABLEBASE_UNKNOWN
+        if self.table is None:
+            self.load()
+        if len(self.table) != TABLEBASE_SIZE:
+            return TABLEBASE_UNKNOWN
+        return self.table[tablebase_index(board.bitboards[WHITE],
+                                          board.bitboards[BLACK], team)]
+
+
+class Board(object):
+    # no per-instance __dict__, so boards are smaller and quicker to copy.
+    # Subclasses keep that by declaring __slots__ too (() if they add no
+    # attributes), or else get a __dict__ as usual
+    __slots__ = ('bitboards', 'phase', 'turn_count', 'hash', 'piece_counts',
+                 'mid_distance_sums', 'moves', 'moves_valid')
+
+    def __init__(self):
+        # initialise empty board: one bitboard of piece positions per team
+        self.bitboards = {WHITE: 0, BLACK: 0}
         # start in placing phase
         self.phase = PLACING_PHASE
         # number of turns taken place since start of current game phase
         self.turn_count = 0
+        # Zobrist hash of the pieces and phase, kept up to date incrementally
+        self.hash = ZOBRIST_PHASE_KEYS[PLACING_PHASE]
+        # running totals for evaluation, kept up to date incrementally:
+        # number of pieces, and sum of their distances to the middle
+        self.piece_counts = {WHITE: 0, BLACK: 0}
+        self.mid_distance_sums = {WHITE: 0, BLACK: 0}
+        # moves of the piece on each square (see get_all_moves_for_piece_at_pos)
+        # kept between calls, and a bitboard of the squares whose moves are
+        # still up to date. Changes to the pieces only clear the squares
+        # near them (MOVE_DEPENDENTS); changes of phase clear all of them
+        self.moves = [()] * NUM_SQUARES
+        self.moves_valid = 0
+
+    @property
+    def pieces(self):
+        """
+        All pieces currently on the board, in ascending square order.
+        Built on demand from the bitboards.
+
+        :return: list of Piece(pos=(c, r), team=team)
+        """
+        pieces = []
+        for bit in iter_bits(self.bitboards[WHITE] | self.bitboards[BLACK]):
+            team = WHITE if self.bitboards[WHITE] & bit else BLACK
+            pieces.append(Piece(bit_to_pos(bit), team))
+        return pieces
+
+    def copy(self):
+        """
+        Returns a new board in the same state, much faster than deepcopy.
+        Attributes added by subclasses (e.g. search tables) are shared with
+        the copy rather than copied.
+
+        :return: board of the same class as this one
+        """
+        board = object.__new__(type(self))
+        board.bitboards = self.bitboards.copy()
+        board.phase = self.phase
+        board.turn_count = self.turn_count
+        board.hash = self.hash
+        board.piece_counts = self.piece_counts.copy()
+        board.mid_distance_sums = self.mid_distance_sums.copy()
+        board.moves = self.moves.copy()
+        board.moves_valid = self.moves_valid
+        if hasattr(self, '__dict__'):
+            board.__dict__.update(self.__dict__)
+        return board
+
+    def occupied(self):
+        """:return: bitboard of all squares containing a piece"""
+        return self.bitboards[WHITE] | self.bitboards[BLACK]
+
+    def team_at_bit(self, bit):
+        """:return: team of the piece on the square bit, or None if empty"""
+        if self.bitboards[WHITE] & bit:
+            return WHITE
+        elif self.bitboards[BLACK] & bit:
+            return BLACK
+        return None
 
     def do_action(self, action, team):
         """
@@ -49,7 +759,10 @@ class Board(object):
             start_pos, end_pos = action
             self.move_piece(start_pos, end_pos)
         self.turn_count += 1
-        # advance to next phase if enough moves have happened
+        self.advance_phase_if_due()
+
+    def advance_phase_if_due(self):
+        """ advance to next phase if enough moves have happened """
         if self.phase == PLACING_PHASE and self.turn_count == 24:
             self.advance_phase()
         elif self.phase == MOVING_PHASE and self.turn_count == 128:
@@ -57,6 +770,157 @@ class Board(object):
         elif self.phase == SHRINK1_PHASE and self.turn_count == 192:
             self.advance_phase()
 
+    def apply(self, action, team):
+        """
+        Like do_action, but also returns a record of what changed so that
+        the action can be reversed with undo. Lets a search mutate a single
+        board in place instead of copying it for every child node.
+
+        :param action: action to make (same format as for referee)
+        :param team: team doing the action
+        :return: UndoRecord to later pass to undo
+        """
+        phase = self.phase
+        turn_count = self.turn_count
+        white = self.bitboards[WHITE]
+        black = self.bitboards[BLACK]
+        if action is None:  # forfeit turn
+            moved = 0
+        elif phase == PLACING_PHASE:
+            moved = pos_to_bit(action)
+            self.place_piece(action, team)
+        else:
+            moved = pos_to_bit(action[0]) | pos_to_bit(action[1])
+            self.move_piece(action[0], action[1])
+        # the acting team's pieces would be (before ^ moved) if none were lost
+        if team == WHITE:
+            white ^= moved
+        else:
+            black ^= moved
+        captured = (white & ~self.bitboards[WHITE],
+                    black & ~self.bitboards[BLACK])
+
+        self.turn_count += 1
+        white = self.bitboards[WHITE]
+        black = self.bitboards[BLACK]
+        self.advance_phase_if_due()
+        shrink_removed = (white & ~self.bitboards[WHITE],
+                          black & ~self.bitboards[BLACK])
+        return UndoRecord(action, team, phase, turn_count,
+                          captured, shrink_removed)
+
+    def undo(self, record):
+        """
+        Reverses the action that produced record, restoring the board to
+        exactly how it was before apply. Records must be undone in the
+        reverse order they were applied.
+
+        :param record: UndoRecord returned by apply
+        :return:
+        """
+        action, team, phase, turn_count, captured, shrink_removed = record
+        if self.phase != phase:
+            self._set_phase(phase)
+        self.turn_count = turn_count
+        # put back the removed pieces (possibly including the acting piece)
+        white_removed = captured[0] | shrink_removed[0]
+        black_removed = captured[1] | shrink_removed[1]
+        if white_removed:
+            self._toggle_bits(WHITE, white_removed)
+        if black_removed:
+            self._toggle_bits(BLACK, black_removed)
+        # then take back the action itself
+        if action is None:
+            return
+        elif phase == PLACING_PHASE:
+            self._toggle_bits(team, pos_to_bit(action))
+        else:
+            self._toggle_bits(team,
+                              pos_to_bit(action[0]) | pos_to_bit(action[1]))
+
+    def _toggle_bits(self, team, bits):
+        """
+        Flips the given squares of team's bitboard. Every change to the
+        pieces on the board goes through here.
+
+        :param team: WHITE or BLACK
+        :param bits: bitboard of squares to add or remove pieces at
+        :return:
+        """
+        team_bits = self.bitboards[team] ^ bits
+        self.bitboards[team] = team_bits
+        keys = ZOBRIST_PIECE_KEYS[team]
+        stale = 0  # squares whose moves this changes
+        while bits:
+            low_bit = bits & -bits
+            square = low_bit.bit_length() - 1
+            self.hash ^= keys[square]
+            stale |= MOVE_DEPENDENTS[square]
+            if team_bits & low_bit:  # piece added
+                self.piece_counts[team] += 1
+                self.mid_distance_sums[team] += MID_DISTANCES[square]
+            else:  # piece removed
+                self.piece_counts[team] -= 1
+                self.mid_distance_sums[team] -= MID_DISTANCES[square]
+            bits ^= low_bit
+        self.moves_valid &= ~stale
+
+    def _set_phase(self, phase):
+        """ changes the phase, keeping the hash up to date """
+        self.hash ^= ZOBRIST_PHASE_KEYS[self.phase] ^ ZOBRIST_PHASE_KEYS[phase]
+        self.phase = phase
+        self.moves_valid = 0  # the free squares have changed
+
+    def set_state(self, white, black, phase, turn_count):
+        """
+        Sets up the board in the given state (e.g. one sent from another
+        process), keeping the hash and running totals up to date
+
+        :param white: bitboard of WHITE's pieces
+        :param black: bitboard of BLACK's pieces
+        :param phase: phase of the game
+        :param turn_count: turns taken since the start of the phase
+        :return:
+        """
+        self._toggle_bits(WHITE, self.bitboards[WHITE] ^ white)
+        self._toggle_bits(BLACK, self.bitboards[BLACK] ^ black)
+        self._set_phase(phase)
+        self.turn_count = turn_count
+
+    def get_state(self):
+        """ :return: (white, black, phase, turn_count), as for set_state """
+        return (self.bitboards[WHITE], self.bitboards[BLACK], self.phase,
+                self.turn_count)
+
+    def canonical_state(self):
+        """
+        The representative of the positions equivalent to this one under
+        the symmetries of the board (see canonical_state), e.g. so that
+        tables of positions only need to store one of each.
+
+        :return: (white, black, phase, turn_count) of the representative
+            (as for set_state), and the symmetry that maps this board onto it
+        """
+        (white, black), symmetry = canonical_state(
+                self.bitboards[WHITE], self.bitboards[BLACK], self.phase)
+        return (white, black, self.phase, self.turn_count), symmetry
+
+    def canonical_key(self):
+        """ :return: search_key of the canonical_state of this board,
+        and the symmetry that maps this board onto it """
+        state, symmetry = self.canonical_state()
+        return position_key(*state), symmetry
+
+    def search_key(self):
+        """
+        Key identifying this position for a search, i.e. the hash combined
+        with the turn count. The turn count decides the side to move and how
+        far away the next phase change is, so it matters to search results.
+
+        :return: 64-bit int
+        """
+        return self.hash ^ (self.turn_count * TURN_KEY_MULTIPLIER & HASH_MASK)
+
     def place_piece(self, position, team):
         """
         Suitable for placing phase.
@@ -67,19 +931,12 @@ class Board(object):
         :param team: WHITE or BLACK
         :return:
         """
-        c, r = position
         # TODO: consider adding/removing validation of this move e.g. in bounds
         assert self.in_bounds(position)
-        assert self.get_piece_at_pos(position) is None
-
-        new_piece = {
-            "pos": position,
-            "team": team
-        }
-        # find an empty position in the list to place the piece
-        new_piece_index = self.pieces.index(None)
-        self.pieces[new_piece_index] = new_piece
-        self.board[c][r] = new_piece_index  # store the index on the board
+        bit = pos_to_bit(position)
+        assert not self.occupied() & bit
+
+        self._toggle_bits(team, bit)
         # check if any pieces were taken
         self.update_pieces_removed(position)
 
@@ -95,18 +952,17 @@ class Board(object):
         # Some validation of move
         assert self.phase != PLACING_PHASE  # cannot move in placing phase
         assert self.in_bounds(start_pos) and self.in_bounds(end_pos)
-        assert self.get_piece_at_pos(end_pos) is None  # destination is empty
-        assert end_pos not in self.get_corners()
+        end_bit = pos_to_bit(end_pos)
+        assert not self.occupied() & end_bit  # destination is empty
+        assert not CORNER_MASKS[self.phase] & end_bit
 
-        piece = self.get_piece_at_pos(start_pos)
-        assert piece is not None  # make sure there is a piece to move
+        start_bit = pos_to_bit(start_pos)
+        team = self.team_at_bit(start_bit)
+        assert team is not None  # make sure there is a piece to move
         # TODO: consider adding validation of the move itself
-        piece['pos'] = end_pos  # update position in pieces list
-        # update positions on board
-        self.board[end_pos[0]][end_pos[1]] = self.board[start_pos[0]][start_pos[1]]
-        self.board[start_pos[0]][start_pos[1]] = None
+        self._toggle_bits(team, start_bit | end_bit)
         # update pieces removed due to this piece moving
-        self.update_pieces_removed(piece['pos'])
+        self.update_pieces_removed(end_pos)
 
     def get_all_actions(self, team):
         """
@@ -116,31 +972,54 @@ class Board(object):
         :param team: WHITE or BLACK
         :return: list of placing positions (c, r), or moves ((a, b), (c, d))
         """
-        possible_moves = []
         if self.phase == PLACING_PHASE:
             # the valid places are all empty squares within team zone
-            # if team == WHITE
-            rows_start = 0
-            rows_end = 6
-            if team == BLACK:
-                rows_start = 2
-                rows_end = BOARD_SIZE
-            corners = self.get_corners()
-            for c in range(BOARD_SIZE):
-                for r in range(rows_start, rows_end):
-                    if self.get_piece_at_pos((c, r)) is None \
-                            and (c, r) not in corners:
-                        possible_moves.append((c, r))
-            return possible_moves
-
-        # moving phase. Return all valid moves of the team's pieces
-        for piece in self.pieces:
-            if piece is not None and piece['team'] == team:
-                piece_moves = self.get_all_moves_for_piece_at_pos(piece['pos'])
-                # add this piece's moves to the list
-                possible_moves += piece_moves
+            available = ZONE_MASKS[team] & FREE_MASKS[self.phase] \
+                & ~self.occupied()
+            return [bit_to_pos(bit) for bit in iter_bits(available)]
+
+        # moving phase. Return all valid moves of the team's pieces,
+        # only generating them again for pieces near a change
+        possible_moves = []
+        moves = self.moves
+        valid = self.moves_valid
+        bits = self.bitboards[team]
+        while bits:
+            low_bit = bits & -bits
+            square = low_bit.bit_length() - 1
+            if not valid & low_bit:
+                moves[square] = self._generate_moves(square)
+                valid |= low_bit
+            possible_moves += moves[square]
+            bits ^= low_bit
+        self.moves_valid = valid
         return possible_moves
 
+    def action_captures(self, action, team):
+        """
+        Whether or not an action would eliminate at least one enemy piece.
+        Only considers the action itself, not the board shrinking after it.
+
+        :param action: placing position (c, r), or move ((a, b), (c, d))
+        :param team: team doing the action
+        :return: True if action surrounds an enemy piece
+        """
+        if action is None:
+            return False
+        allies = self.bitboards[team] | CORNER_MASKS[self.phase]
+        if self.phase == PLACING_PHASE:
+            end_pos = action
+        else:
+            # the piece leaves its start square, so can't surround from there
+            allies &= ~pos_to_bit(action[0])
+            end_pos = action[1]
+        enemies = self.bitboards[Board.get_opponent_team(team)]
+        for adj_bit, _, opp_bit in \
+                CAPTURES[self.phase][end_pos[0] * BOARD_SIZE + end_pos[1]]:
+            if enemies & adj_bit and allies & opp_bit:
+                return True
+        return False
+
     def get_all_moves_for_piece_at_pos(self, position):
         """
         Returns a list of all moves that can be made by the piece at position
@@ -148,56 +1027,48 @@ class Board(object):
         :param position: position of this piece
         :return: list of possible moves: ((a, b), (c, d))
         """
+        square = position[0] * BOARD_SIZE + position[1]
+        bit = 1 << square
+        if not self.moves_valid & bit:
+            self.moves[square] = self._generate_moves(square)
+            self.moves_valid |= bit
+        return list(self.moves[square])
+
+    def _generate_moves(self, square):
+        """
+        Works out the moves of the piece on a square from scratch
+
+        :param square: index of the square (c * BOARD_SIZE + r)
+        :return: tuple of possible moves: ((a, b), (c, d))
+        """
         possible_moves = []
-        # represents four cardinal directions that each piece can move in
-        offsets = ((1, 0), (0, 1), (-1, 0), (0, -1))
-        corners = self.get_corners()
-        for c_off, r_off in offsets:
-            adj_pos = (position[0] + c_off, position[1] + r_off)
-            if self.in_bounds(adj_pos):
-                piece_index = self.board[adj_pos[0]][adj_pos[1]]
-                if piece_index is None:
-                    if adj_pos not in corners:
-                        # position has no pieces or corners. Can move here
-                        possible_moves.append((position, adj_pos))
-                else:
-                    # there is a piece here. Can we jump over?
-                    opp_pos = (adj_pos[0] + c_off, adj_pos[1] + r_off)
-                    if self.pos_empty(opp_pos):
-                        possible_moves.append((position, opp_pos))
-        return possible_moves
+        occupied = self.occupied()
+        position = SQUARE_POS[square]
+        for adj_bit, adj_pos, opp_bit, opp_pos in MOVES[self.phase][square]:
+            if not occupied & adj_bit:
+                # position has no pieces or corners. Can move here
+                possible_moves.append((position, adj_pos))
+            elif opp_bit and not occupied & opp_bit:
+                # there is a piece here and we can jump over it
+                possible_moves.append((position, opp_pos))
+        return tuple(possible_moves)
 
     def advance_phase(self):
         """advance the phase of this board"""
         if self.phase == PLACING_PHASE:
             # turn count doesn't reset if board shrinks
             self.turn_count = 0
-        self.phase += 1
+        self._set_phase(self.phase + 1)
 
-        corners = self.get_corners()  # new corners
         # Remove pieces outside the new bounds or overlapping with new corners
-        for index, piece in enumerate(self.pieces):
-            if piece is not None:
-                if not self.in_bounds(piece['pos']) or piece['pos'] in corners:
-                    self.remove_piece_at_pos(piece['pos'])
-
-        # apply corners and remove more pieces if needed
-        # top-left corner
-        col, row = corners[0]
-        self.update_pieces_removed((col + 1, row), attack=False)
-        self.update_pieces_removed((col, row + 1), attack=False)
-        # bottom-left corner L
-        col, row = corners[1]
-        self.update_pieces_removed((col + 1, row), attack=False)
-        self.update_pieces_removed((col, row - 1), attack=False)
-        # bottom-right corner _|
-        col, row = corners[2]
-        self.update_pieces_removed((col - 1, row), attack=False)
-        self.update_pieces_removed((col, row - 1), attack=False)
-        # top-right corner -.
-        col, row = corners[3]
-        self.update_pieces_removed((col - 1, row), attack=False)
-        self.update_pieces_removed((col, row + 1), attack=False)
+        outside = ~FREE_MASKS[self.phase]
+        for team in TEAMS:
+            for bit in iter_bits(self.bitboards[team] & outside):
+                self.remove_piece_at_pos(bit_to_pos(bit))
+
+        # apply the new corners and remove more pieces if needed
+        for pos in SHRINK_SQUARES[self.phase]:
+            self.update_pieces_removed(pos, attack=False)
 
     def get_piece_at_pos(self, position):
         """
@@ -208,11 +1079,10 @@ class Board(object):
         :param position: tuple (column, row)
         :return: piece, or None if there isn't one or out of bounds
         """
-        # also check if position is in bounds
-        if self.in_bounds(position):
-            index = self.board[position[0]][position[1]]
-            if index is not None:
-                return self.pieces[index]
+        # pos_to_bit gives 0 (no piece) for positions off the grid
+        team = self.team_at_bit(pos_to_bit(position))
+        if team is not None:
+            return Piece(position, team)
         return None
 
     def has_piece_of_team(self, position, team):
@@ -220,10 +1090,7 @@ class Board(object):
         :return: whether or not the square contains a piece
             belonging to team
         """
-        piece = self.get_piece_at_pos(position)
-        if piece:
-            return piece['team'] == team
-        return False
+        return bool(self.bitboards[team] & pos_to_bit(position))
 
     def pos_empty(self, pos):
         """
@@ -234,30 +1101,21 @@ class Board(object):
         :return: whether or not position is in bounds
             and free of pieces and corners
         """
-        return self.in_bounds(pos) and self.board[pos[0]][pos[1]] is None \
-            and pos not in self.get_corners()
+        return bool(FREE_MASKS[self.phase] & ~self.occupied()
+                    & pos_to_bit(pos))
 
     def remove_piece_at_pos(self, position):
         """ removes a piece from the game """
-        index = self.board[position[0]][position[1]]
-        # delete the piece from the board and the piece list
-        self.board[position[0]][position[1]] = None
-        # results in an empty spot in the piece list
-        self.pieces[index] = None
+        bit = pos_to_bit(position)
+        team = self.team_at_bit(bit)
+        # delete the piece from whichever team's bitboard has it
+        if team is not None:
+            self._toggle_bits(team, bit)
 
     def in_bounds(self, position):
         """:return: whether or not a position is on the board. Depends on phase
         """
-        # but in-bounds also depends on the game state
-        if self.phase == PLACING_PHASE or self.phase == MOVING_PHASE:
-            return 0 <= position[0] < BOARD_SIZE \
-                    and 0 <= position[1] < BOARD_SIZE
-        elif self.phase == SHRINK1_PHASE:
-            return 1 <= position[0] < BOARD_SIZE - 1 \
-                    and 1 <= position[1] < BOARD_SIZE - 1
-        else:
-            return 2 <= position[0] < BOARD_SIZE - 2 \
-                   and 2 <= position[1] < BOARD_SIZE - 2
+        return bool(BOUNDS_MASKS[self.phase] & pos_to_bit(position))
 
     def update_pieces_removed(self, mid_pos, attack=True):
         """
@@ -273,41 +1131,56 @@ class Board(object):
             (if not, it's just defending against corners shrinking)
         :return:
         """
-        # TODO fix this
-        mid_piece = self.get_piece_at_pos(mid_pos)
-        if mid_piece is None:
+        mid_team = self.team_at_bit(pos_to_bit(mid_pos))
+        if mid_team is None:
             return  # no piece in the middle, so nothing to remove
-        mid_team = mid_piece['team']
         enemy_team = Board.get_opponent_team(mid_team)
-        c_mid, r_mid = mid_pos
+        square = mid_pos[0] * BOARD_SIZE + mid_pos[1]
+        corners = CORNER_MASKS[self.phase]
 
         # check if any 4 surrounding squares have an opponent to take
         if attack:
-            offsets = (-1, 0), (0, 1), (1, 0), (0, -1)
-            for c_off, r_off in offsets:
-                adj_pos = (c_mid + c_off, r_mid + r_off)
-                if self.has_piece_of_team(adj_pos, enemy_team):
-                    # enemy piece here, check other side
-                    opp_pos = (adj_pos[0] + c_off, adj_pos[1] + r_off)
-                    if self.has_piece_of_team(opp_pos, mid_team):
-                        # adj piece is surrounded. Remove it
-                        self.remove_piece_at_pos(adj_pos)
-                    elif opp_pos in self.get_corners():
-                        # also gets removed if corner...
-                        self.remove_piece_at_pos(adj_pos)
+            # squares that an enemy piece can be surrounded against
+            allies = self.bitboards[mid_team] | corners
+            for adj_bit, adj_pos, opp_bit in CAPTURES[self.phase][square]:
+                if self.bitboards[enemy_team] & adj_bit and allies & opp_bit:
+                    # adj piece is surrounded. Remove it
+                    self.remove_piece_at_pos(adj_pos)
 
         # Check if the mid piece is itself removed by opponents (and corners)
-        # either by up/down or L/R
-        u_pos = (c_mid, r_mid - 1)
-        d_pos = (c_mid, r_mid + 1)
-        l_pos = (c_mid - 1, r_mid)
-        r_pos = (c_mid + 1, r_mid)
-        corners = self.get_corners()
-        if ((self.has_piece_of_team(u_pos, enemy_team) or u_pos in corners) and
-            (self.has_piece_of_team(d_pos, enemy_team) or d_pos in corners)) or\
-            ((self.has_piece_of_team(l_pos, enemy_team) or l_pos in corners) and
-             (self.has_piece_of_team(r_pos, enemy_team) or r_pos in corners)):
-            self.remove_piece_at_pos(mid_pos)
+        # either by L/R or up/down
+        threats = self.bitboards[enemy_team] | corners
+        for pair in SANDWICHES[self.phase][square]:
+            if threats & pair == pair:
+                self.remove_piece_at_pos(mid_pos)
+                break
+
+    def placing_threats(self, team):
+        """
+        Finds team's pieces that are threatened during placing phase:
+        a piece is threatened if there is a square where, if an enemy piece
+        is placed there, the piece gets removed. Works on all squares at once
+        by shifting bitboards, rather than checking piece by piece.
+
+        :param team: team whose pieces to check
+        :return: bitboard of team's threatened pieces
+        """
+        enemy = Board.get_opponent_team(team)
+        # squares that can be one side of a surround, and squares the enemy
+        # can place in to complete it
+        sides = self.bitboards[enemy] | CORNER_MASKS[self.phase]
+        places = ZONE_MASKS[enemy] & FREE_MASKS[self.phase] & ~self.occupied()
+        # a piece is threatened if one neighbour is in sides and the opposite
+        # neighbour is in places. Shift both onto the piece to compare
+        threatened = (sides << BOARD_SIZE & FULL_MASK) \
+            & (places >> BOARD_SIZE)
+        threatened |= (sides >> BOARD_SIZE) \
+            & (places << BOARD_SIZE & FULL_MASK)
+        threatened |= (sides << 1 & NOT_TOP_ROW_MASK) \
+            & (places >> 1 & NOT_BOTTOM_ROW_MASK)
+        threatened |= (sides >> 1 & NOT_BOTTOM_ROW_MASK) \
+            & (places << 1 & NOT_TOP_ROW_MASK)
+        return self.bitboards[team] & threatened
 
     def distance_to_nearest_of_team(self, pos, team):
         """ returns distance to nearest piece belonging to team
@@ -317,11 +1190,10 @@ class Board(object):
         :return: Manhattan distance between pos and piece
         """
         best_dist = 999
-        for piece in self.pieces:
-            if piece is not None and piece['team'] == team:
-                dist = abs(pos[0] - piece['pos'][0]) \
-                        + abs(pos[1] - piece['pos'][1])
-                best_dist = min(dist, best_dist)
+        for bit in iter_bits(self.bitboards[team]):
+            piece_pos = bit_to_pos(bit)
+            dist = abs(pos[0] - piece_pos[0]) + abs(pos[1] - piece_pos[1])
+            best_dist = min(dist, best_dist)
         if best_dist == 999:
             return -1  # did not find any pieces
         return best_dist
@@ -335,13 +1207,12 @@ class Board(object):
         """
         best_dist = 999
         nearest_piece = None
-        for piece in self.pieces:
-            if piece is not None and piece['team'] == team:
-                dist = abs(pos[0] - piece['pos'][0]) \
-                        + abs(pos[1] - piece['pos'][1])
-                if dist < best_dist:
-                    best_dist = dist
-                    nearest_piece = piece
+        for bit in iter_bits(self.bitboards[team]):
+            piece_pos = bit_to_pos(bit)
+            dist = abs(pos[0] - piece_pos[0]) + abs(pos[1] - piece_pos[1])
+            if dist < best_dist:
+                best_dist = dist
+                nearest_piece = Piece(piece_pos, team)
         return nearest_piece
 
     def get_corners(self):
@@ -351,12 +1222,7 @@ class Board(object):
 
         :return: list of positions of corners
         """
-        if self.phase == PLACING_PHASE or self.phase == MOVING_PHASE:
-            return (0, 0), (0, 7), (7, 7), (7, 0)
-        elif self.phase == SHRINK1_PHASE:
-            return (1, 1), (1, 6), (6, 6), (6, 1)
-        else:  # self.phase == SHRINK2_PHASE:
-            return (2, 2), (2, 5), (5, 5), (5, 2)
+        return CORNERS[self.phase]
 
     def check_winner(self):
         """
@@ -365,16 +1231,8 @@ class Board(object):
 
         :return: BLACK or WHITE or 'T' or None
         """
-        black_count = 0
-        white_count = 0
-        for piece in self.pieces:
-            if piece is not None:
-                if piece['team'] == WHITE:
-                    white_count += 1
-                elif piece['team'] == BLACK:
-                    black_count += 1
-                else:
-                    raise ValueError("team should be BLACK or WHITE")
+        black_count = self.piece_counts[BLACK]
+        white_count = self.piece_counts[WHITE]
         if black_count < 2 and white_count < 2:
             # tie because both teams have fewer than 2 pieces on same turn
             return 'T'
@@ -395,17 +1253,18 @@ class Board(object):
 
     def print_board(self):
         """ prints the current layout of the board """
-        corners = self.get_corners()
+        corners = CORNER_MASKS[self.phase]
         print('=== BOARD: phase {}, turn {} ==='
               .format(self.phase, self.turn_count))
         print('0 1 2 3 4 5 6 7')
         for row in range(BOARD_SIZE):
             for col in range(BOARD_SIZE):
                 char_to_print = ' '
-                piece_index = self.board[col][row]
-                if piece_index is not None:
-                    char_to_print = self.pieces[piece_index]['team']
-                elif (col, row) in corners:
+                bit = pos_to_bit((col, row))
+                team = self.team_at_bit(bit)
+                if team is not None:
+                    char_to_print = team
+                elif corners & bit:
                     char_to_print = CORNER
                 print(char_to_print, end=' ')
             print("")
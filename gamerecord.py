@@ -0,0 +1,216 @@
+"""
+Game records for Watch Your Back!, and a tool for replaying them.
+
+A record is a small text file. A header of "key: value" lines (format
+version, modules playing each colour, seed, result) is followed by a blank
+line and then one line per turn: the action, then the CPU time (seconds)
+the player took to choose it. Actions are written with one digit per
+coordinate:
+    34      place a piece at (3, 4)
+    3444    move the piece at (3, 4) to (4, 4)
+    -       forfeit turn
+
+e.g.
+    format: 1
+    white: greedy-agent-5
+    black: mirror-agent
+    seed: 0
+    winner: W
+    reason: pieces
+
+    34 0.000042
+    36 0.004180
+    ...
+
+Replay rebuilds positions through board.Board.do_action. It keeps a
+snapshot of the board every SNAPSHOT_INTERVAL turns, so seeking to any
+turn only replays the turns since the snapshot before it.
+
+usage: python gamerecord.py [-h] [-t TURN] record
+    prints the record's header, then the board after TURN turns
+    (by default, at the end of the game)
+"""
+import argparse
+import board as bm
+
+FORMAT_VERSION = 1
+# Replay keeps a snapshot of the board every this many turns
+SNAPSHOT_INTERVAL = 16
+# header keys, in the order they are written
+HEADER_KEYS = ('format', 'white', 'black', 'seed', 'winner', 'reason')
+
+
+def encode_action(action):
+    """ :return: action (in the referee's format) as a string for a record """
+    if action is None:
+        return '-'
+    elif isinstance(action[0], int):  # placing: (x, y)
+        return '{}{}'.format(*action)
+    (xa, ya), (xb, yb) = action
+    return '{}{}{}{}'.format(xa, ya, xb, yb)
+
+
+def decode_action(text):
+    """ :return: action (in the referee's format) from encode_action's text """
+    if text == '-':
+        return None
+    digits = tuple(int(digit) for digit in text)
+    if len(digits) == 2:
+        return digits
+    elif len(digits) == 4:
+        return digits[:2], digits[2:]
+    raise ValueError("invalid action in game record: {!r}".format(text))
+
+
+class GameRecord(object):
+    """ The actions of one game, and what is known about who played it """
+
+    def __init__(self, white=None, black=None, seed=None):
+        """
+        :param white: name of the module playing White (or None)
+        :param black: name of the module playing Black (or None)
+        :param seed: seed the game was played with (or None)
+        """
+        self.header = {'format': FORMAT_VERSION, 'white': white,
+                       'black': black, 'seed': seed,
+                       'winner': None, 'reason': None}
+        self.actions = []
+        self.times = []  # CPU time (seconds) taken to choose each action
+
+    def add(self, action, time=0.0):
+        """
+        Adds the next action of the game
+
+        :param action: action (in the referee's format)
+        :param time: CPU time (seconds) the player took to choose it
+        :return:
+        """
+        self.actions.append(action)
+        self.times.append(time)
+
+    def finish(self, winner, reason=None):
+        """
+        Records the result of the game
+
+        :param winner: 'W', 'B', 'draw', or None if the game didn't finish
+        :param reason: how the game ended, e.g. 'pieces' or 'turn limit'
+        :return:
+        """
+        self.header['winner'] = winner
+        self.header['reason'] = reason
+
+    def __len__(self):
+        return len(self.actions)
+
+    def write(self, path):
+        """ Writes the record to the file at path """
+        with open(path, 'w') as record_file:
+            for key in HEADER_KEYS:
+                value = self.header[key]
+                if value is not None:
+                    record_file.write('{}: {}\n'.format(key, value))
+            record_file.write('\n')
+            record_file.writelines(
+                    '{} {:.6f}\n'.format(encode_action(action), time)
+                    for action, time in zip(self.actions, self.times))
+
+    @staticmethod
+    def read(path):
+        """ :return: GameRecord read from the file at path """
+        record = GameRecord()
+        with open(path) as record_file:
+            for line in record_file:  # header
+                line = line.strip()
+                if line == '':
+                    break
+                key, value = line.split(':', 1)
+                record.header[key] = value.strip()
+            for line in record_file:  # turns
+                fields = line.split()
+                if len(fields) == 0:
+                    continue
+                time = float(fields[1]) if len(fields) > 1 else 0.0
+                record.add(decode_action(fields[0]), time)
+        record.header['format'] = int(record.header['format'])
+        if record.header['format'] > FORMAT_VERSION:
+            raise ValueError("game record format {} is newer than {}".format(
+                    record.header['format'], FORMAT_VERSION))
+        if record.header['seed'] is not None:
+            record.header['seed'] = int(record.header['seed'])
+        return record
+
+
+class Replay(object):
+    """ Rebuilds the positions of a recorded game """
+
+    def __init__(self, record, snapshot_interval=SNAPSHOT_INTERVAL):
+        """
+        Replays the whole game once, keeping snapshots along the way
+
+        :param record: GameRecord to replay
+        :param snapshot_interval: turns between snapshots
+        """
+        self.record = record
+        self.snapshot_interval = snapshot_interval
+        # snapshots[i] is Board.get_state() after i * snapshot_interval turns
+        self.snapshots = []
+        replay_board = bm.Board()
+        for turn, action in enumerate(record.actions):
+            if turn % snapshot_interval == 0:
+                self.snapshots.append(replay_board.get_state())
+            replay_board.do_action(action, Replay.team_of_turn(turn))
+        if len(record.actions) % snapshot_interval == 0:
+            self.snapshots.append(replay_board.get_state())
+
+    @staticmethod
+    def team_of_turn(turn):
+        """ :return: team playing the turn-th action (0 is the first).
+        Teams alternate through the whole game, White first """
+        return bm.WHITE if turn % 2 == 0 else bm.BLACK
+
+    def board_at(self, turn):
+        """
+        :param turn: number of actions played (0 for the empty board,
+            len(record) for the end of the game)
+        :return: new board.Board in the position after turn actions
+        """
+        if not 0 <= turn <= len(self.record):
+            raise IndexError("turn {} is not in a game of {} turns".format(
+                    turn, len(self.record)))
+        snapshot = turn // self.snapshot_interval
+        board = bm.Board()
+        board.set_state(*self.snapshots[snapshot])
+        for i in range(snapshot * self.snapshot_interval, turn):
+            board.do_action(self.record.actions[i], Replay.team_of_turn(i))
+        return board
+
+    def positions(self):
+        """ Yields (turn, board) for every position of the game in order,
+        reusing a single board """
+        board = bm.Board()
+        yield 0, board
+        for turn, action in enumerate(self.record.actions):
+            board.do_action(action, Replay.team_of_turn(turn))
+            yield turn + 1, board
+
+
+def main():
+    """ Shows a position of a recorded game from the command line """
+    parser = argparse.ArgumentParser(
+            description="Replays a recorded game of Watch Your Back!")
+    parser.add_argument('record', help="game record file")
+    parser.add_argument('-t', '--turn', type=int,
+                        help="number of turns to replay (default: all)")
+    args = parser.parse_args()
+
+    record = GameRecord.read(args.record)
+    for key in HEADER_KEYS:
+        if record.header[key] is not None:
+            print('{}: {}'.format(key, record.header[key]))
+    print('turns: {}'.format(len(record)))
+    turn = len(record) if args.turn is None else args.turn
+    Replay(record).board_at(turn).print_board()
+
+
+if __name__ == '__main__':
+    main()
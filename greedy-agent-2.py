@@ -1,9 +1,11 @@
 import board as b
 from random import randrange
-from copy import deepcopy
+import batcheval
 
 
 class Board2(b.Board):
+    __slots__ = ()
+
     # additional methods
     def value_board(self, team):
         """ determines how favourable this board state is """
@@ -15,7 +17,7 @@ class Board2(b.Board):
         for piece in self.pieces:
             if piece is not None:
                 # also gives weight to distance of piece from middle
-                counts[piece['team']] += 20 - Board2.distance_of_pos_to_mid(piece['pos'])
+                counts[piece.team] += 20 - Board2.distance_of_pos_to_mid(piece.pos)
 
         return counts[ally] - counts[enemy]
 
@@ -64,16 +66,11 @@ class Player(object):
         actions = self.board.get_all_actions(self.team)
         our_action = None  # will forfeit turn if no actions
 
-        # TODO consider undoing or reusing instead of instantiating more boards
-        next_values = [0] * len(actions)
-        best_value = -999
-        for i in range(len(next_values)):
-            # calculate how favourable each next state is
-            board = deepcopy(self.board)
-            board.do_action(actions[i], self.team)
-            next_values[i] = board.value_board(self.team)
-            # and keep track of the best value
-            best_value = max(best_value, next_values[i])
+        # calculate how favourable the state is after applying each action
+        next_values = batcheval.value_children(
+                self.board, actions, self.team, base_value=20,
+                threats=False)
+        best_value = max(next_values, default=-999)
 
         # filter out actions with non-favourable states
         best_actions = []
@@ -1,9 +1,11 @@
 import board as b
 from random import randrange
-from copy import deepcopy
+import batcheval
 
 
 class Board2(b.Board):
+    __slots__ = ()
+
     # additional methods
     def value_board(self, team):
         """ determines how favourable this board state is
@@ -18,15 +20,15 @@ class Board2(b.Board):
             if piece is not None:
                 # live pieces are worth points
                 # also gives weight to distance of piece from middle
-                piece_value = 30 - Board2.distance_of_pos_to_mid(piece['pos'])
-                counts[piece['team']] += piece_value
+                piece_value = 30 - Board2.distance_of_pos_to_mid(piece.pos)
+                counts[piece.team] += piece_value
 
                 # During placing phase, consider if this piece is threatened
                 # to be removed on its enemy's next action
-                enemy_of_piece = Board2.get_opponent_team(piece['team'])
-                if self.phase == b.PLACING_PHASE and self.placing_pos_threatened(piece['pos'], enemy_of_piece):
+                enemy_of_piece = Board2.get_opponent_team(piece.team)
+                if self.phase == b.PLACING_PHASE and self.placing_pos_threatened(piece.pos, enemy_of_piece):
                     # is worse if your own piece is threatened after your action
-                    if piece['team'] == team:
+                    if piece.team == team:
                         # can subtract less here if want to play aggressive
                         counts[team] -= piece_value
                     else:  # enemy piece threatened. They could move it though
@@ -111,17 +113,10 @@ class Player(object):
         actions = self.board.get_all_actions(self.team)
         our_action = None  # will forfeit turn if no actions
 
-        # TODO consider undoing or reusing instead of instantiating more boards
-        next_values = [0] * len(actions)
-        best_value = -999
-        for i in range(len(next_values)):
-            # calculate the board state after applying each action
-            board = deepcopy(self.board)
-            board.do_action(actions[i], self.team)
-            # calculate how favourable each next state is
-            next_values[i] = board.value_board(self.team)
-            # and keep track of the best value
-            best_value = max(best_value, next_values[i])
+        # calculate how favourable the state is after applying each action
+        next_values = batcheval.value_children(self.board, actions,
+                                               self.team)
+        best_value = max(next_values, default=-999)
 
         # filter out less-favourable states
         best_actions = []
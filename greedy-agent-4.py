@@ -1,9 +1,24 @@
 import board as b
 from random import randrange
-from copy import deepcopy
+import time
+import batcheval
 
 
 class Board2(b.Board):
+    # how much work searches have done (see b.SearchStats), shared with
+    # copies. The player starts new stats for each of its actions
+    __slots__ = ('stats',)
+
+    def __init__(self):
+        super().__init__()
+        self.stats = b.SearchStats()
+
+    def copy(self):
+        """ :return: copy of this board (see Board.copy), sharing its stats """
+        board = super().copy()
+        board.stats = self.stats
+        return board
+
     # additional methods
     def value_board(self, team):
         """ determines how favourable this board state is
@@ -18,15 +33,15 @@ class Board2(b.Board):
             if piece is not None:
                 # live pieces are worth points
                 # also gives weight to distance of piece from middle
-                piece_value = 30 - Board2.distance_of_pos_to_mid(piece['pos'])
-                counts[piece['team']] += piece_value
+                piece_value = 30 - Board2.distance_of_pos_to_mid(piece.pos)
+                counts[piece.team] += piece_value
 
                 # During placing phase, consider if this piece is threatened
                 # to be removed on its enemy's next action
-                enemy_of_piece = Board2.get_opponent_team(piece['team'])
-                if self.phase == b.PLACING_PHASE and self.placing_pos_threatened(piece['pos'], enemy_of_piece):
+                enemy_of_piece = Board2.get_opponent_team(piece.team)
+                if self.phase == b.PLACING_PHASE and self.placing_pos_threatened(piece.pos, enemy_of_piece):
                     # is worse if your own piece is threatened after your action
-                    if piece['team'] == team:
+                    if piece.team == team:
                         # can subtract less here if want to play aggressive
                         counts[team] -= piece_value
                     else:  # enemy piece threatened. They could move it though
@@ -73,6 +88,19 @@ class Board2(b.Board):
                 return pos[1] > 1
         return False
 
+    def value_children(self, actions, team):
+        """ values the board after each of team's actions, all at once if
+        NumPy is available
+
+        :param actions: list of team's actions
+        :param team: team doing the actions
+        :return: list of value_board(team) of the board after each action
+        """
+        self.stats.nodes += len(actions)
+        self.stats.leaves += len(actions)
+        self.stats.evaluations += len(actions)
+        return batcheval.value_children(self, actions, team)
+
     def get_best_value_from_state(self, team, enemy, depth=1):
         """ If this board is current state and it's team's turn,
         return the best value they can get.
@@ -82,27 +110,30 @@ class Board2(b.Board):
         :param depth: depth of recursion
         :return: highest value for this team
         """
+        self.stats.nodes += 1
         # calculate all possible actions for team in this board state
         actions = self.get_all_actions(team)
         # Edge case: no possible actions. Need to pass turn
         if len(actions) == 0:
-            board = deepcopy(self)
+            board = self.copy()
             board.do_action(None, team)  # pass turn
             if depth > 1:
                 return board.get_best_value_from_state(enemy, team, depth - 1)
             else:
+                self.stats.leaves += 1
+                self.stats.evaluations += 1
                 return board.value_board(team)
 
-        next_values = [0] * len(actions)
-        for i in range(len(next_values)):
-            board = deepcopy(self)
-            board.do_action(actions[i], team)
-            # calculate how favourable the next state is
-            if depth > 1:
+        if depth == 1:  # base case: won't go any deeper. Just use heuristics
+            next_values = self.value_children(actions, team)
+        else:
+            next_values = [0] * len(actions)
+            for i in range(len(next_values)):
+                board = self.copy()
+                board.do_action(actions[i], team)
+                # calculate how favourable the next state is
                 next_values[i] = \
                     board.get_best_value_from_state(enemy, team, depth - 1)
-            else:  # base case: won't go any deeper. Just use heuristics
-                next_values[i] = board.value_board(team)
         if depth % 2 == 0:
             return min(next_values)
         else:
@@ -116,21 +147,24 @@ class Board2(b.Board):
         :param depth: depth of recursion
         :return: list of actions giving best value for team
         """
+        start_time = time.process_time()
+        nodes_before = self.stats.nodes
+        self.stats.nodes += 1
         actions = self.get_all_actions(team)
         # Edge case: no possible actions
         if len(actions) == 0:
             return []
 
         # calculate how favourable the state is after applying each action
-        next_values = [0] * len(actions)
-        for i in range(len(next_values)):
-            board = deepcopy(self)
-            board.do_action(actions[i], team)
-            if depth > 1:
+        if depth == 1:
+            next_values = self.value_children(actions, team)
+        else:
+            next_values = [0] * len(actions)
+            for i in range(len(next_values)):
+                board = self.copy()
+                board.do_action(actions[i], team)
                 next_values[i] = \
                     board.get_best_value_from_state(enemy, team, depth - 1)
-            else:
-                next_values[i] = board.value_board(team)
         if depth % 2 == 0:
             best_value = min(next_values)
         else:
@@ -141,6 +175,8 @@ class Board2(b.Board):
         for i in range(len(next_values)):
             if next_values[i] == best_value:
                 best_actions.append(actions[i])
+        self.stats.finish_search(depth, self.stats.nodes - nodes_before,
+                                 time.process_time() - start_time)
         return best_actions
 
 
@@ -166,6 +202,9 @@ class Player(object):
         else:
             raise ValueError("colour must be 'white' or 'black'")
         self.enemy_team = b.Board.get_opponent_team(self.team)
+        # how much the search for the latest action did (see
+        # b.SearchStats), or None if it didn't search
+        self.search_stats = None
 
     def action(self, turns):
         """
@@ -176,6 +215,7 @@ class Player(object):
         :return: next action
         """
         # TODO: alpha beta pruning
+        self.search_stats = None
         # Opening Book
         if self.board.phase == b.PLACING_PHASE and turns == 0:
             # These are good first moves for WHITE
@@ -183,6 +223,7 @@ class Player(object):
         else:
             # different Minimax search depth depending on game phase
             depth = 2 + max(0, self.board.phase - 1)
+            self.board.stats = self.search_stats = b.SearchStats()
             best_actions = self.board.get_best_actions_from_state(
                     self.team, self.enemy_team, depth)
             print("Minimax depth: ", depth)
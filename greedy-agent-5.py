@@ -1,38 +1,59 @@
 import board as bm
 from random import randrange
-from copy import deepcopy
 import math
+import os
+import time
+
+# value of a piece on each square: more valuable closer to the middle
+PIECE_VALUES = tuple(30 - distance for distance in bm.MID_DISTANCES)
+
+# best Placing Phase actions searched ahead of time by openingbook.py.
+# Read the first time it's needed
+OPENING_BOOK = bm.OpeningBook(os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'greedy-agent-5.book'))
 
 
 class Board2(bm.Board):
     # additional methods
+    def __init__(self):
+        super().__init__()
+        # results of previous searches. Kept between turns
+        self.transposition_table = bm.TranspositionTable()
+        # move ordering: up to two killer actions (actions that caused a
+        # cut-off) for each ply, and history heuristic scores for each team
+        self.killers = {}
+        self.history = {bm.WHITE: {}, bm.BLACK: {}}
+        # depth of the current search from the root, to work out the ply
+        self.root_depth = 0
+        # how much work searches have done (see bm.SearchStats). The
+        # player starts new stats for each of its actions
+        self.stats = bm.SearchStats()
+
     def value_board(self, team):
-        """ determines how favourable this board state is
+        """ determines how favourable this board state is.
+        Uses the board's running piece totals, so doesn't look at every piece
 
         :param team: the team who last moved
         :return: integer value
             (Higher is better for team. Lower is better for enemy)
         """
         enemy = Board2.get_opponent_team(team)  # enemy of team
-        counts = {team: 0, enemy: 0}
-        for piece in self.pieces:
-            if piece is not None:
-                # live pieces are worth points
-                # also gives weight to distance of piece from middle
-                piece_value = 30 - Board2.distance_of_pos_to_mid(piece['pos'])
-                counts[piece['team']] += piece_value
-
-                # During placing phase, consider if this piece is threatened
-                # to be removed on its enemy's next action
-                enemy_of_piece = Board2.get_opponent_team(piece['team'])
-                if self.phase == bm.PLACING_PHASE \
-                        and self.placing_pos_threatened(piece['pos'], enemy_of_piece):
-                    # is worse if your own piece is threatened after your action
-                    if piece['team'] == team:
-                        # can subtract less here if want to play aggressive
-                        counts[team] -= piece_value
-                    else:  # enemy piece threatened. They could move it though
-                        counts[enemy] -= piece_value // 3
+        # live pieces are worth points
+        # also gives weight to distance of piece from middle
+        counts = {}
+        for t in (team, enemy):
+            counts[t] = 30 * self.piece_counts[t] - self.mid_distance_sums[t]
+
+        # During placing phase, consider if pieces are threatened
+        # to be removed on their enemy's next action
+        if self.phase == bm.PLACING_PHASE:
+            # is worse if your own piece is threatened after your action
+            for bit in bm.iter_bits(self.placing_threats(team)):
+                # can subtract less here if want to play aggressive
+                counts[team] -= PIECE_VALUES[bit.bit_length() - 1]
+            # enemy piece threatened. They could move it though
+            for bit in bm.iter_bits(self.placing_threats(enemy)):
+                counts[enemy] -= PIECE_VALUES[bit.bit_length() - 1] // 3
 
         # symmetry in calculation
         return counts[team] - counts[enemy]
@@ -45,40 +66,12 @@ class Board2(bm.Board):
         y_diff = min(abs(3 - pos[1]), abs(4 - pos[1]))
         return x_diff + y_diff
 
-    def placing_pos_threatened(self, pos, enemy):
-        """ Checks whether or not a pos is threatened during placing phase
-        A piece is threatened by placing if there exists a square such that if
-        an enemy is placed there, it causes the piece to be removed.
-
-        :param pos: containing a piece
-        :param enemy: enemy team of piece
-        :return: whether or not piece is threatened
-        """
-        corners = self.get_corners()
-        for x_off, y_off in ((1, 0), (-1, 0), (0, 1), (0, -1)):
-            side = (pos[0] - x_off, pos[1] - y_off)
-            if self.has_piece_of_team(side, enemy) or side in corners:
-                # one side is threatened. What about other?
-                other_side = (pos[0] + x_off, pos[1] + y_off)
-                if self.__pos_can_be_placed_in(other_side, enemy):
-                    return True
-        return False
-        # TODO consider edge case of final place
-
-    def __pos_can_be_placed_in(self, pos, team):
-        """ :return whether or not pos is within team's placing boundary during
-        Placing Phase and is available to be placed in"""
-        if self.pos_empty(pos):  # is the position in bounds and empty?
-            if team == bm.WHITE:  # is the position within team's starting zone?
-                return pos[1] < 6
-            elif team == bm.BLACK:
-                return pos[1] > 1
-        return False
-
     def get_best_value_for_state(self, team, enemy, depth, a, b):
         """ If this board is current state and it's team's turn,
         return the best value they can get.
         Does Minimax with alpha beta pruning.
+        Remembers results in the transposition table to avoid searching
+        the same position twice.
 
         :param team: to move
         :param enemy: other team
@@ -87,42 +80,136 @@ class Board2(bm.Board):
         :param b: Beta
         :return: highest value for this team
         """
+        stats = self.stats
+        stats.nodes += 1
         if depth == 0:  # base case: Go no deeper. Return valuation of board
+            stats.leaves += 1
+            stats.evaluations += 1
             return self.value_board(enemy)
 
+        # has this position already been searched deeply enough?
+        key = self.search_key()
+        entry = self.transposition_table.lookup(key)
+        stats.tt_probes += 1
+        tt_action = None
+        if entry is not None:
+            stats.tt_hits += 1
+            _, tt_depth, tt_value, tt_bound, tt_action, _ = entry
+            # values are from the point of view of the team moving last in
+            # the search, so only reuse values from depths of same parity
+            if tt_depth >= depth and (tt_depth - depth) % 2 == 0:
+                if tt_bound == bm.EXACT \
+                        or (tt_bound == bm.LOWER_BOUND and tt_value > b) \
+                        or (tt_bound == bm.UPPER_BOUND and tt_value < a):
+                    stats.tt_cutoffs += 1
+                    return tt_value
+
         # calculate all possible actions for team in this board state
         actions = self.get_all_actions(team)
         # Edge case: no possible actions. Need to pass turn
         if len(actions) == 0:
-            board = deepcopy(self)
-            board.do_action(None, team)  # pass turn
+            record = self.apply(None, team)  # pass turn
             if depth > 1:
-                return board.get_best_value_for_state(enemy, team, depth - 1, a, b)
+                value = self.get_best_value_for_state(enemy, team, depth - 1, a, b)
             else:
-                return board.value_board(team)
+                stats.leaves += 1
+                stats.evaluations += 1
+                value = self.value_board(team)
+            self.undo(record)
+            return value
 
+        # search the actions most likely to be best first, to prune more
+        ply = self.root_depth - depth
+        self.order_actions(actions, team, ply, tt_action)
+
+        a_original, b_original = a, b
+        best_action = None
         if depth % 2 == 1:  # maximising
             best_value = -math.inf
             for action in actions:
-                board = deepcopy(self)
-                board.do_action(action, team)
-                best_value = max(best_value, board.get_best_value_for_state(enemy, team, depth - 1, a, b))
+                record = self.apply(action, team)
+                value = self.get_best_value_for_state(
+                        enemy, team, depth - 1, a, b)
+                self.undo(record)
+                if value > best_value:
+                    best_value = value
+                    best_action = action
                 a = max(a, best_value)
                 if b < a:
                     # print(b, "<", a, "D cut off: depth", depth)
+                    self.record_cutoff(action, team, depth, ply)
                     break  # beta cut-off
-            return best_value
         else:  # minimising
             best_value = math.inf
             for action in actions:
-                board = deepcopy(self)
-                board.do_action(action, team)
-                best_value = min(best_value, board.get_best_value_for_state(enemy, team, depth - 1, a, b))
+                record = self.apply(action, team)
+                value = self.get_best_value_for_state(
+                        enemy, team, depth - 1, a, b)
+                self.undo(record)
+                if value < best_value:
+                    best_value = value
+                    best_action = action
                 b = min(b, best_value)
                 if b < a:
                     # print(b, "<", a, "C cut off: depth", depth)
+                    self.record_cutoff(action, team, depth, ply)
                     break  # alpha cut-off
-            return best_value
+
+        # values outside the original window are only bounds
+        if best_value <= a_original:
+            bound = bm.UPPER_BOUND
+        elif best_value >= b_original:
+            bound = bm.LOWER_BOUND
+        else:
+            bound = bm.EXACT
+        self.transposition_table.store(key, depth, best_value, bound,
+                                       best_action)
+        return best_value
+
+    def order_actions(self, actions, team, ply, best_action=None):
+        """ Sorts actions in place so that those most likely to be good are
+        searched first: best_action (e.g. from the transposition table),
+        then captures, then killer actions for this ply, then the rest by
+        their history heuristic score.
+
+        :param actions: list of team's actions
+        :param team: team doing the actions
+        :param ply: how many actions deep from the root of the search
+        :param best_action: action to put first (or None)
+        :return:
+        """
+        killers = self.killers.get(ply, ())
+        history = self.history[team]
+
+        def priority(action):
+            if action == best_action:
+                return 0, 0
+            elif self.action_captures(action, team):
+                return 1, -history.get(action, 0)
+            elif action in killers:
+                return 2, 0
+            return 3, -history.get(action, 0)
+        actions.sort(key=priority)
+
+    def record_cutoff(self, action, team, depth, ply):
+        """ Updates move ordering tables after action caused a cut-off
+
+        :param action: action that caused the cut-off
+        :param team: team doing the action
+        :param depth: remaining search depth at the cut-off
+        :param ply: how many actions deep from the root of the search
+        :return:
+        """
+        self.stats.cutoff(depth)
+        # cut-offs near the root save more work, so count for more
+        self.history[team][action] = \
+            self.history[team].get(action, 0) + depth * depth
+        # captures are already searched early, so aren't killers
+        if not self.action_captures(action, team):
+            killers = self.killers.setdefault(ply, [])
+            if action not in killers:
+                killers.insert(0, action)
+                del killers[2:]
 
     def get_best_actions_from_state(self, team, enemy, depth=1, a=-math.inf, b=math.inf):
         """ Does minimax to get list of good actions for team
@@ -135,20 +222,26 @@ class Board2(bm.Board):
         :return: list of actions giving best value for team
         """
         assert depth > 0  # only the other function should deal with base case
+        self.transposition_table.new_search()
+        self.root_depth = depth
+        start_time = time.process_time()
+        nodes_before = self.stats.nodes
+        self.stats.nodes += 1
         actions = self.get_all_actions(team)
         # Edge case: no possible actions
         if len(actions) == 0:
             return []
 
         # calculate how favourable the state is after applying each action
+        a_original, b_original = a, b
         next_values = [0] * len(actions)
         if depth % 2 == 1:  # maximising
             best_value = -math.inf
             for i in range(len(next_values)):
-                board = deepcopy(self)
-                board.do_action(actions[i], team)
+                record = self.apply(actions[i], team)
                 next_values[i] = \
-                    board.get_best_value_for_state(enemy, team, depth - 1, a, b)
+                    self.get_best_value_for_state(enemy, team, depth - 1, a, b)
+                self.undo(record)
                 best_value = max(best_value, next_values[i])
                 a = max(a, best_value)
                 if b < a:
@@ -156,10 +249,10 @@ class Board2(bm.Board):
         else:  # minimising
             best_value = math.inf
             for i in range(len(next_values)):
-                board = deepcopy(self)
-                board.do_action(actions[i], team)
+                record = self.apply(actions[i], team)
                 next_values[i] = \
-                    board.get_best_value_for_state(enemy, team, depth - 1, a, b)
+                    self.get_best_value_for_state(enemy, team, depth - 1, a, b)
+                self.undo(record)
                 best_value = min(best_value, next_values[i])
                 b = min(b, best_value)
                 if b < a:
@@ -170,6 +263,18 @@ class Board2(bm.Board):
         for i in range(len(next_values)):
             if next_values[i] == best_value:
                 best_actions.append(actions[i])
+
+        # remember the result so that later searches can try it first
+        if best_value <= a_original:
+            bound = bm.UPPER_BOUND
+        elif best_value >= b_original:
+            bound = bm.LOWER_BOUND
+        else:
+            bound = bm.EXACT
+        self.transposition_table.store(self.search_key(), depth, best_value,
+                                       bound, best_actions[0])
+        self.stats.finish_search(depth, self.stats.nodes - nodes_before,
+                                 time.process_time() - start_time)
         # TODO remove test printing
         print("    {} best_value {}, best_actions {}".format(team,
                                                              best_value,
@@ -199,6 +304,9 @@ class Player(object):
         else:
             raise ValueError("colour must be 'white' or 'black'")
         self.enemy_team = bm.Board.get_opponent_team(self.team)
+        # how much the search for the latest action did (see
+        # bm.SearchStats), or None if it didn't search
+        self.search_stats = None
 
     def action(self, turns):
         """
@@ -209,12 +317,19 @@ class Player(object):
         :return: next action
         """
         # Opening Book
-        if self.board.phase == bm.PLACING_PHASE and turns == 0:
+        book_entry = None
+        if self.board.phase == bm.PLACING_PHASE:
+            book_entry = OPENING_BOOK.lookup(self.board)
+        self.search_stats = None
+        if book_entry is not None:
+            best_actions = book_entry[0]
+        elif self.board.phase == bm.PLACING_PHASE and turns == 0:
             # These are good first moves for WHITE
             best_actions = [(3, 4), (4, 4)]
         else:
             # different Minimax search depth depending on game phase
             depth = 2 + max(0, self.board.phase - 1)
+            self.board.stats = self.search_stats = bm.SearchStats()
             best_actions = self.board.get_best_actions_from_state(
                     self.team, self.enemy_team, depth)
             print("    {} Minimax depth: {}".format(self.team, depth))
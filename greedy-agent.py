@@ -1,9 +1,11 @@
 import board as b
 from random import randrange
-from copy import deepcopy
+import batcheval
 
 
 class Board2(b.Board):
+    __slots__ = ()
+
     # additional methods
     def value_board(self, team):
         """ determines how favourable this board state is for team.
@@ -20,7 +22,7 @@ class Board2(b.Board):
         counts = {ally: 0, enemy: 0}
         for piece in self.pieces:
             if piece is not None:
-                counts[piece['team']] += 1
+                counts[piece.team] += 1
 
         return counts[ally] - counts[enemy]
 
@@ -61,15 +63,10 @@ class Player(object):
         our_action = None  # will forfeit turn if no actions
 
         # calculate how favourable the state is after applying each action
-        # TODO consider undoing or reusing instead of instantiating more boards
-        next_values = [0] * len(actions)
-        best_value = -999
-        for i in range(len(next_values)):
-            board = deepcopy(self.board)
-            board.do_action(actions[i], self.team)
-            next_values[i] = board.value_board(self.team)
-            # and keep track of the best value
-            best_value = max(best_value, next_values[i])
+        next_values = batcheval.value_children(
+                self.board, actions, self.team, base_value=1,
+                distance_weight=0, threats=False)
+        best_value = max(next_values, default=-999)
 
         # filter out less-favourable states
         best_actions = []
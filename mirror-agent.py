@@ -1,49 +1,120 @@
 import board as bm
 from random import randrange
-from copy import deepcopy
 import math
+import os
+import multiprocessing
+import time
+
+# CPU time (seconds) each player gets for the whole game, unless the referee
+# or tournament sets bm.TIME_LIMIT_ENV. Matches the limit referee.py's
+# _CountdownTimer enforces for `--time_limit` with no value
+TIME_LIMIT = 120.0
+# fraction of the time limit kept spare in case a turn overruns its budget
+TIME_SAFETY_MARGIN = 0.1
+# Placing Phase turns get this many times the time of other turns
+PLACING_TIME_WEIGHT = 3
+# number of our turns we expect to play after the second shrink
+TURNS_AFTER_SHRINK2 = 20
+# iterative deepening never searches deeper than this
+MAX_SEARCH_DEPTH = 20
+# number of worker processes to split the search of each turn's actions
+# between (see get_best_actions_in_parallel). 0 searches in this process.
+# Time budgets are then wall-clock time, since the referee's CPU time limit
+# only sees this process
+SEARCH_PROCESSES = 0
+# shallower searches than this aren't worth sending to other processes
+PARALLEL_MIN_DEPTH = 3
+
+# value of a piece on each square: more valuable closer to the middle,
+# with a bonus for the central four squares
+PIECE_VALUES = tuple(30 - distance + (3 if distance == 0 else 0)
+                     for distance in bm.MID_DISTANCES)
+
+# best Placing Phase actions searched ahead of time by openingbook.py.
+# Read the first time it's needed
+OPENING_BOOK = bm.OpeningBook(os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'mirror-agent.book'))
+# results of positions after the second shrink, made by tablebase.py.
+# Not built here: building takes about a minute, which would count against
+# our time, so without the file nothing is known
+ENDGAME_TABLEBASE = bm.EndgameTablebase(os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'shrink2.tb'))
+# value_board values are always strictly between -VALUE_BOARD_LIMIT and
+# VALUE_BOARD_LIMIT (12 pieces, each worth at most 33, and the 888 win bonus)
+VALUE_BOARD_LIMIT = 2000
+# value of a position the tablebase says is won, less one per turn it takes
+# to win. Results count turns in a byte, so won positions are always worth
+# more than VALUE_BOARD_LIMIT (and lost ones less than -VALUE_BOARD_LIMIT):
+# a proven result always beats a guess. Drawn positions are valued by
+# value_board, to choose between them
+TABLEBASE_WIN_VALUE = VALUE_BOARD_LIMIT + 256
+
+
+def tablebase_value(result):
+    """ :return: value of a tablebase win or loss (not TABLEBASE_UNKNOWN
+    or TABLEBASE_DRAW), for the team to move """
+    if result < bm.TABLEBASE_LOSS:  # quicker wins are better
+        return TABLEBASE_WIN_VALUE - (result - bm.TABLEBASE_WIN)
+    # slower losses are less bad
+    return -TABLEBASE_WIN_VALUE + (result - bm.TABLEBASE_LOSS)
 
 
 class Board2(bm.Board):
     # additional methods
+    def __init__(self):
+        super().__init__()
+        # results of previous searches. Kept between turns
+        self.transposition_table = bm.TranspositionTable()
+        # move ordering: up to two killer actions (actions that caused a
+        # cut-off) for each ply, and history heuristic scores for each team
+        self.killers = {}
+        self.history = {bm.WHITE: {}, bm.BLACK: {}}
+        # depth of the current search from the root, to work out the ply
+        self.root_depth = 0
+        # how much work searches have done (see bm.SearchStats). The
+        # player starts new stats for each of its actions
+        self.stats = bm.SearchStats()
+        # clock to measure the deadline with. CPU time of this process by
+        # default; wall-clock time when the search is split between processes
+        self.clock = time.process_time
+        # self.clock() time to abandon the current search at (or None)
+        self.deadline = None
+        self.out_of_time = False  # whether the search was abandoned
+
     def value_board(self, team):
-        """ determines how favourable this board state is
+        """ determines how favourable this board state is.
+        Uses the board's running piece totals, so doesn't look at every piece
 
         :param team: the team who last moved
         :return: integer value
             (Higher is better for team. Lower is better for enemy)
         """
         enemy = Board2.get_opponent_team(team)  # enemy of team
-        counts = {team: 0, enemy: 0}
-        num_pieces = {team: 0, enemy: 0}  # number of pieces
-        for piece in self.pieces:
-            if piece is not None:
-                num_pieces[piece['team']] += 1
-                # live pieces are worth points
-                # also gives weight to distance of piece from middle
-                dist_from_mid = Board2.distance_of_pos_to_mid(piece['pos'])
-                piece_value = 30 - dist_from_mid
-                if dist_from_mid == 0:  # central four squares
-                    piece_value += 3  # bonus because valuable in end-game
-                counts[piece['team']] += piece_value
-
-                # During placing phase, consider if this piece is threatened
-                # to be removed on its enemy's next action
-                enemy_of_piece = Board2.get_opponent_team(piece['team'])
-                if self.phase == bm.PLACING_PHASE \
-                        and self.placing_pos_threatened(piece['pos'], enemy_of_piece):
-                    # is worse if your own piece is threatened after your action
-                    if piece['team'] == team:
-                        # can subtract less here if want to play aggressive
-                        counts[team] -= piece_value
-                    else:  # enemy piece threatened. They could move it though
-                        counts[enemy] -= piece_value // 3
-                elif self.phase == bm.SHRINK2_PHASE:
-                    # during final phase, also check for win condition
-                    if num_pieces[team] > 1 and num_pieces[enemy] <= 1:
-                        counts[team] += 888  # team has won
-                    elif num_pieces[enemy] > 1 and num_pieces[team] <= 1:
-                        counts[enemy] += 888  # enemy has won
+        # live pieces are worth points
+        # also gives weight to distance of piece from middle,
+        # with a bonus for the central four squares (valuable in end-game)
+        counts = {}
+        for t in (team, enemy):
+            counts[t] = 30 * self.piece_counts[t] - self.mid_distance_sums[t] \
+                + 3 * bm.popcount(self.bitboards[t] & bm.MID_MASK)
+
+        # During placing phase, consider if pieces are threatened
+        # to be removed on their enemy's next action
+        if self.phase == bm.PLACING_PHASE:
+            # is worse if your own piece is threatened after your action
+            for bit in bm.iter_bits(self.placing_threats(team)):
+                # can subtract less here if want to play aggressive
+                counts[team] -= PIECE_VALUES[bit.bit_length() - 1]
+            # enemy piece threatened. They could move it though
+            for bit in bm.iter_bits(self.placing_threats(enemy)):
+                counts[enemy] -= PIECE_VALUES[bit.bit_length() - 1] // 3
+        elif self.phase == bm.SHRINK2_PHASE:
+            # during final phase, also check for win condition
+            num_pieces = self.piece_counts
+            if num_pieces[team] > 1 and num_pieces[enemy] <= 1:
+                counts[team] += 888  # team has won
+            elif num_pieces[enemy] > 1 and num_pieces[team] <= 1:
+                counts[enemy] += 888  # enemy has won
         # symmetry in calculation
         return counts[team] - counts[enemy]
 
@@ -55,26 +126,6 @@ class Board2(bm.Board):
         y_diff = min(abs(3 - pos[1]), abs(4 - pos[1]))
         return x_diff + y_diff
 
-    def placing_pos_threatened(self, pos, enemy):
-        """ Checks whether or not a pos is threatened during placing phase
-        A piece is threatened by placing if there exists a square such that if
-        an enemy is placed there, it causes the piece to be removed.
-
-        :param pos: containing a piece
-        :param enemy: enemy team of piece
-        :return: whether or not piece is threatened
-        """
-        corners = self.get_corners()
-        for x_off, y_off in ((1, 0), (-1, 0), (0, 1), (0, -1)):
-            side = (pos[0] - x_off, pos[1] - y_off)
-            if self.has_piece_of_team(side, enemy) or side in corners:
-                # one side is threatened. What about other?
-                other_side = (pos[0] + x_off, pos[1] + y_off)
-                if self.pos_can_be_placed_in(other_side, enemy):
-                    return True
-        return False
-        # TODO consider edge case of final place
-
     def pos_can_be_placed_in(self, pos, team):
         """ :return whether or not pos is within team's placing boundary during
         Placing Phase and is available to be placed in"""
@@ -89,6 +140,8 @@ class Board2(bm.Board):
         """ If this board is current state and it's team's turn,
         return the best value they can get.
         Does Minimax with alpha beta pruning.
+        Remembers results in the transposition table to avoid searching
+        the same position twice.
 
         :param team: to move
         :param enemy: other team
@@ -97,46 +150,159 @@ class Board2(bm.Board):
         :param b: Beta
         :return: highest value for this team
         """
+        stats = self.stats
+        stats.nodes += 1
+        if self.phase == bm.SHRINK2_PHASE:
+            # solved already? Values are from the point of view of the team
+            # moving last in the search, which is team iff depth is odd
+            result = ENDGAME_TABLEBASE.lookup(self, team)
+            if result == bm.TABLEBASE_DRAW:
+                stats.leaves += 1
+                stats.evaluations += 1
+                return self.value_board(team if depth % 2 == 1 else enemy)
+            elif result != bm.TABLEBASE_UNKNOWN:
+                stats.leaves += 1
+                value = tablebase_value(result)
+                return value if depth % 2 == 1 else -value
         if depth == 0:  # base case: Go no deeper. Return valuation of board
+            stats.leaves += 1
+            stats.evaluations += 1
             return self.value_board(enemy)
+        if self.deadline is not None and self.clock() > self.deadline:
+            self.out_of_time = True
+        if self.out_of_time:
+            return 0  # search is being abandoned. Value won't be used
+
+        # has this position already been searched deeply enough?
+        key = self.search_key()
+        entry = self.transposition_table.lookup(key)
+        stats.tt_probes += 1
+        tt_action = None
+        if entry is not None:
+            stats.tt_hits += 1
+            _, tt_depth, tt_value, tt_bound, tt_action, _ = entry
+            # values are from the point of view of the team moving last in
+            # the search, so only reuse values from depths of same parity
+            if tt_depth >= depth and (tt_depth - depth) % 2 == 0:
+                if tt_bound == bm.EXACT \
+                        or (tt_bound == bm.LOWER_BOUND and tt_value > b) \
+                        or (tt_bound == bm.UPPER_BOUND and tt_value < a):
+                    stats.tt_cutoffs += 1
+                    return tt_value
 
         # calculate all possible actions for team in this board state
         actions = self.get_all_actions(team)
         # Edge case: no possible actions. Need to pass turn
         if len(actions) == 0:
-            board = deepcopy(self)
-            board.do_action(None, team)  # pass turn
+            record = self.apply(None, team)  # pass turn
             if depth > 1:
-                return board.get_best_value_for_state(enemy, team, depth - 1, a, b)
+                value = self.get_best_value_for_state(enemy, team, depth - 1, a, b)
             else:
-                return board.value_board(team)
+                stats.leaves += 1
+                stats.evaluations += 1
+                value = self.value_board(team)
+            self.undo(record)
+            return value
+
+        # search the actions most likely to be best first, to prune more
+        ply = self.root_depth - depth
+        self.order_actions(actions, team, ply, tt_action)
 
+        a_original, b_original = a, b
+        best_action = None
         if depth % 2 == 1:  # maximising
             best_value = -math.inf
             for action in actions:
-                board = deepcopy(self)
-                board.do_action(action, team)
-                best_value = max(best_value, board.get_best_value_for_state(
-                        enemy, team, depth - 1, a, b))
+                record = self.apply(action, team)
+                value = self.get_best_value_for_state(
+                        enemy, team, depth - 1, a, b)
+                self.undo(record)
+                if self.out_of_time:
+                    return value  # don't store results of unfinished search
+                if value > best_value:
+                    best_value = value
+                    best_action = action
                 a = max(a, best_value)
                 if b < a:
                     # print(b, "<", a, "D cut off: depth", depth)
+                    self.record_cutoff(action, team, depth, ply)
                     break  # beta cut-off
-            return best_value
         else:  # minimising
             best_value = math.inf
             for action in actions:
-                board = deepcopy(self)
-                board.do_action(action, team)
-                best_value = min(best_value, board.get_best_value_for_state(
-                        enemy, team, depth - 1, a, b))
+                record = self.apply(action, team)
+                value = self.get_best_value_for_state(
+                        enemy, team, depth - 1, a, b)
+                self.undo(record)
+                if self.out_of_time:
+                    return value  # don't store results of unfinished search
+                if value < best_value:
+                    best_value = value
+                    best_action = action
                 b = min(b, best_value)
                 if b < a:
                     # print(b, "<", a, "C cut off: depth", depth)
+                    self.record_cutoff(action, team, depth, ply)
                     break  # alpha cut-off
-            return best_value
 
-    def get_best_actions_from_state(self, team, enemy, depth=1, a=-math.inf, b=math.inf):
+        # values outside the original window are only bounds
+        if best_value <= a_original:
+            bound = bm.UPPER_BOUND
+        elif best_value >= b_original:
+            bound = bm.LOWER_BOUND
+        else:
+            bound = bm.EXACT
+        self.transposition_table.store(key, depth, best_value, bound,
+                                       best_action)
+        return best_value
+
+    def order_actions(self, actions, team, ply, best_action=None):
+        """ Sorts actions in place so that those most likely to be good are
+        searched first: best_action (e.g. from the transposition table),
+        then captures, then killer actions for this ply, then the rest by
+        their history heuristic score.
+
+        :param actions: list of team's actions
+        :param team: team doing the actions
+        :param ply: how many actions deep from the root of the search
+        :param best_action: action to put first (or None)
+        :return:
+        """
+        killers = self.killers.get(ply, ())
+        history = self.history[team]
+
+        def priority(action):
+            if action == best_action:
+                return 0, 0
+            elif self.action_captures(action, team):
+                return 1, -history.get(action, 0)
+            elif action in killers:
+                return 2, 0
+            return 3, -history.get(action, 0)
+        actions.sort(key=priority)
+
+    def record_cutoff(self, action, team, depth, ply):
+        """ Updates move ordering tables after action caused a cut-off
+
+        :param action: action that caused the cut-off
+        :param team: team doing the action
+        :param depth: remaining search depth at the cut-off
+        :param ply: how many actions deep from the root of the search
+        :return:
+        """
+        self.stats.cutoff(depth)
+        # cut-offs near the root save more work, so count for more
+        self.history[team][action] = \
+            self.history[team].get(action, 0) + depth * depth
+        # captures are already searched early, so aren't killers
+        if not self.action_captures(action, team):
+            killers = self.killers.setdefault(ply, [])
+            if action not in killers:
+                killers.insert(0, action)
+                del killers[2:]
+
+    def get_best_actions_from_state(self, team, enemy, depth=1, a=-math.inf,
+                                    b=math.inf, first_action=None):
         """ Does minimax to get list of good actions for team
 
         :param team: to move
@@ -144,26 +310,34 @@ class Board2(bm.Board):
         :param depth: depth of recursion
         :param a: Alpha
         :param b: Beta
+        :param first_action: action to search first, if it is possible
         :return: list of actions giving best value for team, and the best value
+            (empty list if the search ran out of time)
         """
         assert depth > 0  # only the other function should deal with base case
-        actions = self.get_all_actions(team)
+        self.transposition_table.new_search()
+        self.root_depth = depth
+        start_time = self.clock()
+        nodes_before = self.stats.nodes
+        self.stats.nodes += 1
+        self.out_of_time = False
+        actions = self.get_root_actions(team, depth, first_action)
         # Edge case: no possible actions
         if len(actions) == 0:
             return [], self.value_board(team)
 
         # calculate how favourable the state is after applying each action
+        a_original, b_original = a, b
         next_values = [0] * len(actions)
         if depth % 2 == 1:  # maximising
-            # sort actions (order by best actions first) to optimise pruning
-            if self.phase == bm.PLACING_PHASE:
-                actions.sort(key=lambda x: Board2.distance_of_pos_to_mid(x))
             best_value = -math.inf
             for i in range(len(next_values)):
-                board = deepcopy(self)
-                board.do_action(actions[i], team)
+                record = self.apply(actions[i], team)
                 next_values[i] = \
-                    board.get_best_value_for_state(enemy, team, depth - 1, a, b)
+                    self.get_best_value_for_state(enemy, team, depth - 1, a, b)
+                self.undo(record)
+                if self.out_of_time:
+                    return [], best_value
                 best_value = max(best_value, next_values[i])
                 a = max(a, best_value)
                 if b < a:
@@ -171,10 +345,12 @@ class Board2(bm.Board):
         else:  # minimising
             best_value = math.inf
             for i in range(len(next_values)):
-                board = deepcopy(self)
-                board.do_action(actions[i], team)
+                record = self.apply(actions[i], team)
                 next_values[i] = \
-                    board.get_best_value_for_state(enemy, team, depth - 1, a, b)
+                    self.get_best_value_for_state(enemy, team, depth - 1, a, b)
+                self.undo(record)
+                if self.out_of_time:
+                    return [], best_value
                 best_value = min(best_value, next_values[i])
                 b = min(b, best_value)
                 if b < a:
@@ -185,10 +361,182 @@ class Board2(bm.Board):
         for i in range(len(next_values)):
             if next_values[i] == best_value:
                 best_actions.append(actions[i])
+
+        # remember the result so that later searches can try it first
+        if best_value <= a_original:
+            bound = bm.UPPER_BOUND
+        elif best_value >= b_original:
+            bound = bm.LOWER_BOUND
+        else:
+            bound = bm.EXACT
+        self.transposition_table.store(self.search_key(), depth, best_value,
+                                       bound, best_actions[0])
+        self.stats.finish_search(depth, self.stats.nodes - nodes_before,
+                                 self.clock() - start_time)
         # print("    {} best_value {}, best_actions {}".format(
         #         team, best_value, best_actions))
         return best_actions, best_value
 
+    def get_best_actions_from_tablebase(self, team):
+        """ Gets the best actions for team from the endgame tablebase,
+        if it has solved the positions after all of them
+
+        :param team: to move
+        :return: list of best actions for team and their value (like a
+            depth 1 search), or None if the tablebase can't tell. If the
+            best that team can get is a draw, the drawing actions are
+            ranked by value_board
+        """
+        if self.phase != bm.SHRINK2_PHASE \
+                or ENDGAME_TABLEBASE.lookup(self, team) == bm.TABLEBASE_UNKNOWN:
+            return None
+        enemy = Board2.get_opponent_team(team)
+        actions = self.get_all_actions(team)
+        if len(actions) == 0:
+            return None  # forfeit turn
+        best_actions = []
+        best_value = -math.inf
+        for action in actions:
+            record = self.apply(action, team)
+            result = ENDGAME_TABLEBASE.lookup(self, enemy)
+            if result == bm.TABLEBASE_DRAW:
+                value = self.value_board(team)
+            elif result != bm.TABLEBASE_UNKNOWN:
+                value = -tablebase_value(result)
+            self.undo(record)
+            if result == bm.TABLEBASE_UNKNOWN:
+                return None
+            if value > best_value:
+                best_value = value
+                best_actions = [action]
+            elif value == best_value:
+                best_actions.append(action)
+        return best_actions, best_value
+
+    def get_root_actions(self, team, depth, first_action=None):
+        """ :return: team's actions, in the order to search them at the root
+        of a search of depth (see get_best_actions_from_state) """
+        actions = self.get_all_actions(team)
+        # sort actions (order by best actions first) to optimise pruning
+        if depth % 2 == 1 and self.phase == bm.PLACING_PHASE:
+            actions.sort(key=lambda x: Board2.distance_of_pos_to_mid(x))
+        if first_action is not None and first_action in actions:
+            actions.remove(first_action)
+            actions.insert(0, first_action)
+        return actions
+
+    def get_best_actions_in_parallel(self, team, enemy, depth, pool,
+                                     first_action=None):
+        """ Like get_best_actions_from_state (with the full window), but
+        splits the root actions between the worker processes of pool.
+        Young Brothers Wait: the first action is searched here to get a good
+        bound, then the others are searched by the workers at the same time.
+        Workers share the best value found so far, so each new action is
+        searched with the tightest bound available.
+
+        Actions worse than the best value only get bounds on their values,
+        but actions as good as it always get their exact value, so the list
+        of best actions is the same as get_best_actions_from_state's
+        (when the transposition tables hold the same results).
+
+        :param team: to move
+        :param enemy: other team
+        :param depth: depth of recursion
+        :param pool: multiprocessing.Pool made by make_search_pool
+        :param first_action: action to search first, if it is possible
+        :return: list of actions giving best value for team, and the best value
+            (empty list if the search ran out of time)
+        """
+        assert depth > 0
+        self.transposition_table.new_search()
+        self.root_depth = depth
+        start_time = self.clock()
+        nodes_before = self.stats.nodes
+        self.stats.nodes += 1
+        self.out_of_time = False
+        actions = self.get_root_actions(team, depth, first_action)
+        # Edge case: no possible actions
+        if len(actions) == 0:
+            return [], self.value_board(team)
+
+        # the eldest brother, searched here
+        maximising = depth % 2 == 1
+        record = self.apply(actions[0], team)
+        values = {actions[0]: self.get_best_value_for_state(
+                enemy, team, depth - 1, -math.inf, math.inf)}
+        self.undo(record)
+        if self.out_of_time:
+            return [], values[actions[0]]
+        _shared_best.value = values[actions[0]]
+
+        # the younger brothers, in parallel
+        state = self.get_state()
+        tasks = [(state, team, depth, action, maximising, self.deadline)
+                 for action in actions[1:]]
+        for action, value, stats in pool.imap_unordered(
+                _search_root_action, tasks):
+            self.stats.add(stats)
+            if value is None:
+                self.out_of_time = True
+            values[action] = value
+        if self.out_of_time:
+            return [], values[actions[0]]
+
+        if maximising:
+            best_value = max(values.values())
+        else:
+            best_value = min(values.values())
+        best_actions = [action for action in actions
+                        if values[action] == best_value]
+        self.transposition_table.store(self.search_key(), depth, best_value,
+                                       bm.EXACT, best_actions[0])
+        self.stats.finish_search(depth, self.stats.nodes - nodes_before,
+                                 self.clock() - start_time)
+        return best_actions, best_value
+
+    def get_best_actions_by_deepening(self, team, enemy, deadline,
+                                      depth_step=1, pool=None):
+        """ Does iterative deepening: repeats the Minimax search with depth
+        1, then 1 + depth_step, ... until deadline. Each search tries the best
+        action of the previous one first.
+
+        :param team: to move
+        :param enemy: other team
+        :param deadline: self.clock() time to stop searching at.
+            The depth 1 search always finishes regardless
+        :param depth_step: how much deeper each search is than the last
+        :param pool: if given, searches of depth PARALLEL_MIN_DEPTH or more
+            are split between its worker processes
+        :return: list of best actions and their value, from the deepest
+            search that finished, and the depth of that search
+        """
+        start_time = self.clock()
+        depth = 1
+        best_actions, best_value = self.get_best_actions_from_state(
+                team, enemy, depth)
+        while len(best_actions) > 0 \
+                and depth + depth_step <= MAX_SEARCH_DEPTH:
+            # a deeper search takes longer than all shallower ones together,
+            # so don't start one that would probably not finish
+            time_now = self.clock()
+            if time_now - start_time > (deadline - start_time) / 2:
+                break
+            self.deadline = deadline
+            if pool is not None and depth + depth_step >= PARALLEL_MIN_DEPTH:
+                actions, value = self.get_best_actions_in_parallel(
+                        team, enemy, depth + depth_step, pool,
+                        first_action=best_actions[0])
+            else:
+                actions, value = self.get_best_actions_from_state(
+                        team, enemy, depth + depth_step,
+                        first_action=best_actions[0])
+            self.deadline = None
+            if self.out_of_time:
+                break
+            depth += depth_step
+            best_actions, best_value = actions, value
+        return best_actions, best_value, depth
+
     @staticmethod
     def mirror_pos(pos):
         """
@@ -205,6 +553,73 @@ class Board2(bm.Board):
         return result[0], result[1]
 
 
+# in each process: the best value for the root's team found so far by the
+# current parallel search (a multiprocessing.Value shared by all of them)
+_shared_best = None
+# in a worker process: the board it searches on, kept between tasks so
+# that its transposition table and move ordering tables build up
+_worker_board = None
+
+
+def make_search_pool(processes):
+    """
+    :param processes: number of worker processes
+    :return: multiprocessing.Pool for Board2.get_best_actions_in_parallel
+    """
+    global _shared_best
+    _shared_best = multiprocessing.Value('d', 0.0)
+    return multiprocessing.Pool(processes, _init_search_worker,
+                                (_shared_best,))
+
+
+def _init_search_worker(shared_best):
+    """ Sets up a worker process of a pool made by make_search_pool """
+    global _shared_best, _worker_board
+    _shared_best = shared_best
+    _worker_board = Board2()
+    _worker_board.clock = time.monotonic  # same clock in every process
+
+
+def _search_root_action(task):
+    """
+    In a worker process: searches one of the root actions of
+    Board2.get_best_actions_in_parallel, with the best value any process
+    has found so far as the bound, and then shares the value found.
+
+    :param task: tuple of (board state from Board2.get_state, team to move,
+        search depth, action to search, whether or not the root is
+        maximising, deadline (time.monotonic()) or None)
+    :return: tuple of (action, its value or None if the search ran out
+        of time, bm.SearchStats of the search)
+    """
+    state, team, depth, action, maximising, deadline = task
+    board = _worker_board
+    board.set_state(*state)
+    board.transposition_table.new_search()
+    board.root_depth = depth
+    board.deadline = deadline
+    board.out_of_time = False
+    board.stats = bm.SearchStats()
+    enemy = Board2.get_opponent_team(team)
+
+    a, b = -math.inf, math.inf
+    if maximising:
+        a = _shared_best.value
+    else:
+        b = _shared_best.value
+    record = board.apply(action, team)
+    value = board.get_best_value_for_state(enemy, team, depth - 1, a, b)
+    board.undo(record)
+    if board.out_of_time:
+        return action, None, board.stats
+
+    with _shared_best.get_lock():
+        if (maximising and value > _shared_best.value) \
+                or (not maximising and value < _shared_best.value):
+            _shared_best.value = value
+    return action, value, board.stats
+
+
 class Player(object):
     """
     An agent that can play Watch Your Back.
@@ -232,6 +647,47 @@ class Player(object):
         self.mirroring = True  # whether or not still mirroring
         self.enemy_action = None  # enemy team's last action
 
+        # worker processes to split searches between (see SEARCH_PROCESSES)
+        self.search_pool = None
+        if SEARCH_PROCESSES > 0:
+            self.search_pool = make_search_pool(SEARCH_PROCESSES)
+            self.board.clock = time.monotonic
+
+        # CPU time used by this player so far (in action and update),
+        # or wall-clock time if searching in several processes
+        self.time_used = 0
+        # time (seconds) we get for the game, and the most to spend
+        # searching on one turn (None for no limit), as the referee or
+        # tournament set them
+        self.time_limit = bm.time_limit_from_env(bm.TIME_LIMIT_ENV,
+                                                 TIME_LIMIT)
+        self.move_time = bm.time_limit_from_env(bm.MOVE_TIME_ENV, None)
+        # how much the search for the latest action did (see
+        # bm.SearchStats), or None if it didn't search
+        self.search_stats = None
+
+    def move_time_budget(self):
+        """ :return: time (seconds, measured like time_used) to spend
+        searching on this turn. Spreads the time left over the turns we expect to have left,
+        giving more to the (important) Placing Phase turns, and no more
+        than self.move_time.
+        """
+        time_left = self.time_limit * (1 - TIME_SAFETY_MARGIN) - self.time_used
+        if self.board.phase == bm.PLACING_PHASE:
+            placing_turns_left = (24 - self.board.turn_count + 1) // 2
+            moving_turns_left = 192 // 2 + TURNS_AFTER_SHRINK2
+        else:
+            placing_turns_left = 0
+            moving_turns_left = max(0, 192 - self.board.turn_count) // 2 \
+                + TURNS_AFTER_SHRINK2
+        turn_weight = PLACING_TIME_WEIGHT if placing_turns_left > 0 else 1
+        total_weight = placing_turns_left * PLACING_TIME_WEIGHT \
+            + moving_turns_left
+        budget = max(0, time_left) * turn_weight / total_weight
+        if self.move_time is not None:
+            budget = min(budget, self.move_time)
+        return budget
+
     def action(self, turns):
         """
         called by the referee to request an action from the player
@@ -240,20 +696,44 @@ class Player(object):
             since start of current game phase
         :return: next action
         """
+        start_time = self.board.clock()
+        our_action = self.choose_action(turns)
+        # Update the board with our action
+        self.board.do_action(our_action, self.team)
+        self.time_used += self.board.clock() - start_time
+        return our_action
+
+    def choose_action(self, turns):
+        """
+        :param turns: number of turns that have taken place
+            since start of current game phase
+        :return: action to play this turn
+        """
         best_value = 99
+        self.search_stats = None
         # Opening Book
-        if self.board.phase == bm.PLACING_PHASE and turns == 0:
+        book_entry = None
+        if self.board.phase == bm.PLACING_PHASE:
+            book_entry = OPENING_BOOK.lookup(self.board)
+        elif self.board.phase == bm.SHRINK2_PHASE:
+            # Endgame tablebase: the same idea for the end of the game
+            book_entry = self.board.get_best_actions_from_tablebase(self.team)
+        if book_entry is not None:
+            best_actions, best_value = book_entry
+        elif self.board.phase == bm.PLACING_PHASE and turns == 0:
             # These are good first moves for WHITE
             best_actions = [(3, 4), (4, 4)]
         else:
-            # different Minimax search depth depending on game phase
-            depth = 2 + max(0, self.board.phase - 1)
+            # search deeper and deeper until this turn's time runs out
+            deadline = self.board.clock() + self.move_time_budget()
+            depth_step = 1
             if self.board.phase == bm.PLACING_PHASE:
-                depth = 3  # otherwise mirror doesn't work properly
-            if self.board.phase == bm.SHRINK2_PHASE:
-                depth = 5  # high depth because low branching factor
-            best_actions, best_value = self.board.get_best_actions_from_state(
-                    self.team, self.enemy_team, depth)
+                depth_step = 2  # odd depths only, otherwise mirror doesn't work
+            self.board.stats = self.search_stats = bm.SearchStats()
+            best_actions, best_value, depth = \
+                self.board.get_best_actions_by_deepening(
+                        self.team, self.enemy_team, deadline, depth_step,
+                        self.search_pool)
             # print("    {} Minimax depth: {}".format(self.team, depth))
 
         # Mirror strategy during Placing Phase
@@ -264,8 +744,6 @@ class Player(object):
             # print("    {} Mirror. best_value {}, action {}".format(
             #         self.team, best_value, mirror_action))
             if self.board.pos_can_be_placed_in(mirror_action, self.team):
-                # Update the board with our action
-                self.board.do_action(mirror_action, self.team)
                 return mirror_action
             else:
                 # should not happen because there should always be space
@@ -280,9 +758,6 @@ class Player(object):
         if len(best_actions) > 0:
             # choose random action among our best actions
             our_action = best_actions[randrange(0, len(best_actions))]
-
-        # Update the board with our action
-        self.board.do_action(our_action, self.team)
         return our_action
 
     def update(self, action):
@@ -292,6 +767,8 @@ class Player(object):
         :param action: opponent's action
         :return: Nothing
         """
+        start_time = self.board.clock()
         # Update our board with the opponent's action
         self.board.do_action(action, self.enemy_team)
         self.enemy_action = action
+        self.time_used += self.board.clock() - start_time
@@ -0,0 +1,152 @@
+"""
+Builds an opening book (see board.OpeningBook) for an agent, offline.
+
+Searches the first few turns of Placing Phase with the agent's own
+Board2.get_best_actions_from_state, deeper than the agent could afford
+during a game. Positions are found by playing every action of the book's
+opponent and only the best actions of the book's team, for both teams.
+Positions that are equivalent under the symmetries of Placing Phase (see
+board.canonical_state) are only searched once.
+
+usage: python openingbook.py [-h] [-o OUTPUT] [--plies PLIES]
+                             [--depth DEPTH] [-j PROCESSES]
+                             module
+e.g.
+    python openingbook.py mirror-agent --plies 3 --depth 5
+writes mirror-agent.book, which mirror-agent loads when it first needs it.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import multiprocessing
+import time
+import board as bm
+
+PLIES_DEFAULT = 3
+DEPTH_DEFAULT = 5
+
+
+def canonical_state(state):
+    """
+    :param state: Board.get_state() of a Placing Phase position
+    :return: book key of the position, and its canonical state (so that
+        book actions match its squares)
+    """
+    white, black, phase, turn_count = state
+    (white, black), _ = bm.canonical_state(white, black, phase)
+    state = (white, black, phase, turn_count)
+    return bm.position_key(*state), state
+
+
+def search_position(task):
+    """
+    Searches a position with an agent's Board2 (with nothing printed)
+
+    :param task: tuple of (agent module name, Board.get_state() of the
+        position, search depth)
+    :return: bitboard of the squares of the best actions, and their value
+    """
+    module_name, state, depth = task
+    board = importlib.import_module(module_name).Board2()
+    board.set_state(*state)
+    team = bm.WHITE if board.turn_count % 2 == 0 else bm.BLACK
+    enemy = bm.Board.get_opponent_team(team)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = board.get_best_actions_from_state(team, enemy, depth)
+    # some agents return the best value too, but all of them store it
+    best_actions = result[0] if isinstance(result, tuple) else result
+    value = board.transposition_table.lookup(board.search_key())[2]
+    actions = 0
+    for action in best_actions:
+        actions |= bm.pos_to_bit(action)
+    return actions, value
+
+
+def build_book(module_name, plies=PLIES_DEFAULT, depth=DEPTH_DEFAULT,
+               processes=1, progress=None):
+    """
+    :param module_name: name of the agent module with a Board2 class
+    :param plies: positions after fewer than this many turns are searched
+    :param depth: search depth
+    :param processes: number of worker processes to search in
+    :param progress: if given, called with (ply, number of positions
+        searched at that ply) after each ply
+    :return: book entries {key: (actions bitboard, value)}
+    """
+    entries = {}
+    pool = None
+    if processes != 1:
+        pool = multiprocessing.Pool(processes)
+    try:
+        board = bm.Board()
+        for book_team in bm.TEAMS:
+            # positions after `ply` turns, by key
+            level = dict([canonical_state(bm.Board().get_state())])
+            for ply in range(min(plies, 24)):
+                team = bm.WHITE if ply % 2 == 0 else bm.BLACK
+                if team == book_team:
+                    keys = [key for key in level if key not in entries]
+                    tasks = [(module_name, level[key], depth) for key in keys]
+                    if pool is None:
+                        results = map(search_position, tasks)
+                    else:
+                        results = pool.map(search_position, tasks, 1)
+                    entries.update(zip(keys, results))
+                    if progress is not None:
+                        progress(ply, len(keys))
+                if ply + 1 == plies:
+                    break
+
+                next_level = {}
+                for key, state in level.items():
+                    board.set_state(*state)
+                    if team == book_team:
+                        actions = [bm.bit_to_pos(bit)
+                                   for bit in bm.iter_bits(entries[key][0])]
+                    else:
+                        actions = board.get_all_actions(team)
+                    for action in actions:
+                        record = board.apply(action, team)
+                        next_key, next_state = canonical_state(
+                                board.get_state())
+                        next_level[next_key] = next_state
+                        board.undo(record)
+                level = next_level
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return entries
+
+
+def main():
+    """ Builds an opening book from the command line """
+    parser = argparse.ArgumentParser(
+            description="Builds a Placing Phase opening book for an agent")
+    parser.add_argument('module',
+                        help="full name of the agent module (with a Board2)")
+    parser.add_argument('-o', '--output',
+                        help="book file to write (default: MODULE.book)")
+    parser.add_argument('--plies', type=int, default=PLIES_DEFAULT,
+                        help="search positions after fewer than this many "
+                             "turns")
+    parser.add_argument('--depth', type=int, default=DEPTH_DEFAULT,
+                        help="search depth")
+    parser.add_argument('-j', '--processes', type=int, default=1,
+                        help="number of worker processes (0 for one per CPU)")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    entries = build_book(
+            args.module, args.plies, args.depth, args.processes or None,
+            lambda ply, n: print("ply {}: searched {} positions ({:.0f}s)"
+                                 .format(ply, n, time.time() - start_time),
+                                 flush=True))
+    output = args.output or args.module + '.book'
+    bm.OpeningBook.write(output, entries)
+    print("wrote {} positions to {}".format(len(entries), output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""
+Perft: counts the positions reachable in exactly N turns, to check and
+time move generation (Board.get_all_actions, apply and undo).
+
+From a start position, every sequence of N actions is played out on one
+Board with apply and undo, and the positions at the end are counted
+(leaf nodes). The count crosses the end of the placing phase and the
+shrinks at turns 128 and 192 like a game does. A game that ends before
+turn N (a team has fewer than 2 pieces) isn't followed further, and a team
+with no moves forfeits its turn (the action None). Counts for depths 1 to
+N are printed with the nodes per second of each.
+
+With --divide, the count at depth N is split by the first action, and each
+part is also counted with the referee's own rules (referee._Game, or
+referee._FastGame with --fast). The referee doesn't list actions, so at
+each node it is given every candidate action (each square when placing;
+each move of one or two squares in a line, and a forfeit, when moving),
+and the ones it accepts are followed. Any difference (including actions
+only one of them allows) is printed with the position after the action,
+for running perft again from there, and the tool exits with status 1.
+
+The start position is the start of the game, a position from the
+benchmarks' corpus (-c INDEX), or any Board.get_state() (-s WHITE BLACK
+PHASE TURNS, ints or hex). E.g. to cross the first shrink:
+    python perft.py -s 0x00080c0e0e0c0800 0x0010307070301000 1 126 -d 3
+
+usage: python perft.py [-h] [-d DEPTH] [-s WHITE BLACK PHASE TURNS | -c INDEX]
+                       [--divide] [--fast]
+"""
+import argparse
+import copy
+import sys
+import time
+
+import benchmark
+import board as bm
+import referee
+
+DEPTH_DEFAULT = 3
+# the squares a piece can move to are at most this far away in a line
+MAX_MOVE_DISTANCE = 2
+
+
+def team_to_move(board):
+    """ :return: team whose turn it is on board """
+    return bm.WHITE if board.turn_count % 2 == 0 else bm.BLACK
+
+
+def game_over(board):
+    """ :return: whether the game has ended, as the referee decides it """
+    return board.phase != bm.PLACING_PHASE and board.check_winner() is not None
+
+
+def perft(board, depth):
+    """
+    Counts the positions reachable from board in depth turns. The board
+    is left as it was
+
+    :param board: Board to count from
+    :param depth: number of turns to play
+    :return: number of leaf nodes
+    """
+    if depth == 0:
+        return 1
+    if game_over(board):
+        return 0
+    team = team_to_move(board)
+    actions = board.get_all_actions(team) or [None]
+    if depth == 1:
+        return len(actions)
+    nodes = 0
+    for action in actions:
+        record = board.apply(action, team)
+        nodes += perft(board, depth - 1)
+        board.undo(record)
+    return nodes
+
+
+def game_from_state(state, fast=False):
+    """
+    :param state: (white, black, phase, turn_count), as Board.get_state
+    :param fast: whether to make a referee._FastGame rather than a _Game
+    :return: referee game in the same position
+    """
+    white, black, phase, turn_count = state
+    game = referee._FastGame()
+    game.bitboards = {'W': white, 'B': black}
+    game.board_phase = phase
+    game.turns = turn_count
+    game.phase = 'placing' if phase == bm.PLACING_PHASE else 'moving'
+    game.pieces = {'W': bm.popcount(white), 'B': bm.popcount(black)}
+    if game.phase == 'moving':
+        game._check_win()
+    if fast:
+        return game
+
+    slow_game = referee._Game()
+    slow_game.board = [list(row) for row in game.rows()]
+    slow_game.n_shrinks = max(0, phase - bm.MOVING_PHASE)
+    slow_game.turns = game.turns
+    slow_game.phase = game.phase
+    slow_game.pieces = dict(game.pieces)
+    slow_game.winner = game.winner
+    return slow_game
+
+
+def copy_game(game):
+    """ :return: copy of a referee._Game or _FastGame, to update """
+    new_game = copy.copy(game)
+    new_game.pieces = dict(game.pieces)
+    if isinstance(game, referee._FastGame):
+        new_game.bitboards = dict(game.bitboards)
+    else:
+        new_game.board = [list(row) for row in game.board]
+    return new_game
+
+
+def candidate_actions(game):
+    """
+    :param game: referee._Game or _FastGame in progress
+    :return: every action that might be legal, for the referee to judge
+    """
+    if game.phase == 'placing':
+        return [(x, y) for x in range(bm.BOARD_SIZE)
+                for y in range(bm.BOARD_SIZE)]
+    piece = game._piece()
+    rows = game.rows()
+    candidates = []
+    for x in range(bm.BOARD_SIZE):
+        for y in range(bm.BOARD_SIZE):
+            if rows[y][x] != piece:
+                continue
+            for dx, dy in bm.DIRECTIONS:
+                for distance in range(1, MAX_MOVE_DISTANCE + 1):
+                    candidates.append(((x, y), (x + dx * distance,
+                                                y + dy * distance)))
+    candidates.append(None)  # forfeit
+    return candidates
+
+
+def legal_children(game):
+    """
+    :param game: referee._Game or _FastGame in progress
+    :return: list of (action, game after it) for each action the referee
+        accepts
+    """
+    children = []
+    for action in candidate_actions(game):
+        child = copy_game(game)
+        try:
+            child.update(action)
+        except referee._InvalidActionException:
+            continue
+        children.append((action, child))
+    return children
+
+
+def referee_perft(game, depth):
+    """
+    Counts the positions reachable from game in depth turns, by the
+    referee's rules (like perft, but much slower)
+
+    :param game: referee._Game or _FastGame (isn't changed)
+    :param depth: number of turns to play
+    :return: number of leaf nodes
+    """
+    if depth == 0:
+        return 1
+    if not game.playing():
+        return 0
+    children = legal_children(game)
+    if depth == 1:
+        return len(children)
+    return sum(referee_perft(child, depth - 1) for _, child in children)
+
+
+def divide(board, depth, fast=False):
+    """
+    Counts the positions reachable from board in depth turns, by first
+    action, both with board and with the referee's rules
+
+    :param board: Board to count from (left as it was)
+    :param depth: number of turns to play (at least 1)
+    :param fast: whether to check against referee._FastGame rather than
+        _Game
+    :return: list of (action, board count or None, referee count or None,
+        Board.get_state() after the action or None), with None where only
+        the other allows the action
+    """
+    counts = {}
+    if not game_over(board):
+        team = team_to_move(board)
+        for action in board.get_all_actions(team) or [None]:
+            record = board.apply(action, team)
+            counts[action] = [perft(board, depth - 1), None,
+                              board.get_state()]
+            board.undo(record)
+
+    game = game_from_state(board.get_state(), fast)
+    if game.playing():
+        for action, child in legal_children(game):
+            count = referee_perft(child, depth - 1)
+            counts.setdefault(action, [None, None, None])[1] = count
+
+    def sort_key(action):
+        # forfeits (None) last
+        return (action is None, action or ())
+    return [(action, *counts[action]) for action in sorted(counts,
+                                                           key=sort_key)]
+
+
+def main():
+    """ Runs perft from the command line """
+    parser = argparse.ArgumentParser(
+            description="Counts the positions reachable in DEPTH turns, to "
+                        "check and time move generation")
+    parser.add_argument('-d', '--depth', type=int, default=DEPTH_DEFAULT,
+                        help="number of turns to play")
+    start = parser.add_mutually_exclusive_group()
+    start.add_argument('-s', '--state', nargs=4, type=lambda x: int(x, 0),
+                       metavar=('WHITE', 'BLACK', 'PHASE', 'TURNS'),
+                       help="position to start from, as Board.get_state() "
+                            "(default: the start of the game)")
+    start.add_argument('-c', '--corpus', type=int, metavar='INDEX',
+                       help="start from this position of benchmark.CORPUS")
+    parser.add_argument('--divide', action='store_true',
+                        help="split the count by first action and check it "
+                             "against the referee's rules")
+    parser.add_argument('--fast', action='store_true',
+                        help="with --divide, check against the referee's "
+                             "_FastGame rather than _Game")
+    args = parser.parse_args()
+    if args.depth < 1:
+        parser.error("depth must be at least 1")
+
+    board = bm.Board()
+    if args.state is not None:
+        if args.state[2] not in bm.PHASES:
+            parser.error("PHASE must be one of {}".format(bm.PHASES))
+        board.set_state(*args.state)
+    elif args.corpus is not None:
+        if not 0 <= args.corpus < len(benchmark.CORPUS):
+            parser.error("INDEX must be from 0 to {}".format(
+                    len(benchmark.CORPUS) - 1))
+        board.set_state(*benchmark.CORPUS[args.corpus])
+    print("start: {:#018x} {:#018x} {} {}".format(*board.get_state()))
+
+    if not args.divide:
+        for depth in range(1, args.depth + 1):
+            start_time = time.perf_counter()
+            nodes = perft(board, depth)
+            seconds = time.perf_counter() - start_time
+            print("depth {:>2} {:>14,} nodes {:>9.3f}s {:>12,.0f} nodes/s"
+                  .format(depth, nodes, seconds, nodes / (seconds or 1e-9)),
+                  flush=True)
+        return
+
+    rules = '_FastGame' if args.fast else '_Game'
+    print("{:<20} {:>14} {:>14}".format('action', 'board', rules))
+    totals = [0, 0]
+    differences = []
+    for action, count, referee_count, state in divide(board, args.depth,
+                                                      args.fast):
+        different = count != referee_count
+        print("{:<20} {:>14} {:>14}{}".format(
+                str(action), '-' if count is None else count,
+                '-' if referee_count is None else referee_count,
+                '  DIFFERENT' if different else ''))
+        totals[0] += count or 0
+        totals[1] += referee_count or 0
+        if different:
+            differences.append((action, state))
+    print("{:<20} {:>14} {:>14}".format('total', *totals))
+    if differences:
+        print("{} difference(s). Positions after them, for perft -s:".format(
+                len(differences)))
+        for action, state in differences:
+            if state is not None:
+                print("{:<20} -s {:#018x} {:#018x} {} {}".format(
+                        str(action), *state))
+            else:
+                print("{:<20} not allowed by the board".format(str(action)))
+        sys.exit(1)
+    print("no differences")
+
+
+if __name__ == '__main__':
+    main()
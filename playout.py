@@ -0,0 +1,293 @@
+"""
+Fast random playouts for Monte Carlo search.
+
+Plays whole games of uniformly random actions (like random-agent) on a bare
+state of two bitboards, phase and turn count, instead of on board.Board.
+The inner loop uses only int operations and precomputed tables: no action
+lists, position tuples or Board method calls. It follows the same rules as
+board.Board, including the shrinks at turns 128 and 192.
+
+Run this module to benchmark it against playing random-agent style games
+through board.Board:
+    python playout.py [-n PLAYOUTS] [--seed SEED]
+"""
+import argparse
+import random
+import time
+import board as b
+
+FULL = b.FULL_MASK
+NOT_TOP = b.NOT_TOP_ROW_MASK
+NOT_BOTTOM = b.NOT_BOTTOM_ROW_MASK
+COLUMN_SHIFT = b.BOARD_SIZE  # shifting by this moves a bit one column
+
+# bits of each square's neighbours in DIRECTIONS order (right, down, left, up)
+# with 0 for squares off the grid, and bits of the squares beyond those
+NEIGHBOUR_BITS = tuple(tuple(n[0] for n in neighbours)
+                       for neighbours in b.NEIGHBOURS)
+BEYOND_BITS = tuple(tuple(n[2] for n in neighbours)
+                    for neighbours in b.NEIGHBOURS)
+
+
+def _shrink_checks(phase):
+    """ :return: squares next to the corners of phase, in the order that
+    board.Board.advance_phase checks them, each with its neighbour bits """
+    return tuple((b.pos_to_bit(pos),) + NEIGHBOUR_BITS[b.pos_to_bit(pos)
+                                                       .bit_length() - 1]
+                 for pos in b.SHRINK_SQUARES[phase])
+
+
+# for each phase, the squares whose pieces may be eliminated by new corners
+SHRINK_CHECKS = tuple(_shrink_checks(phase) for phase in b.PHASES)
+
+
+def random_playout(white, black, phase, turn_count, team, turn_limit,
+                   rng=random, trace=None):
+    """
+    Plays random actions until the game ends or turn_limit turns have been
+    played. Like the referee, the game can only end outside placing phase.
+
+    :param white: bitboard of WHITE's pieces
+    :param black: bitboard of BLACK's pieces
+    :param phase: current phase
+    :param turn_count: turns taken since the start of the current phase
+    :param team: team to move first
+    :param turn_limit: most turns to play
+    :param rng: random number generator (anything with randrange)
+    :param trace: if a list, each action played is appended to it
+        (in the referee's format), e.g. to check the rules against Board
+    :return: winning team (WHITE or BLACK), 'T' for a tie, or None if the
+        game hadn't finished after turn_limit turns
+    """
+    randrange = rng.randrange
+    popcount = b.popcount
+    white_count = popcount(white)
+    black_count = popcount(black)
+    white_to_move = team == b.WHITE
+    free = b.FREE_MASKS[phase]
+    corners = b.CORNER_MASKS[phase]
+
+    for _ in range(turn_limit):
+        if phase != b.PLACING_PHASE \
+                and (white_count < 2 or black_count < 2):
+            break  # game over
+        if white_to_move:
+            own, enemy = white, black
+        else:
+            own, enemy = black, white
+        occupied = own | enemy
+        empty = free & ~occupied
+
+        # choose an action uniformly at random: its destination bit `to`
+        # and starting bit `start` (0 when placing)
+        to = start = 0
+        if phase == b.PLACING_PHASE:
+            available = empty & b.ZONE_MASKS[b.WHITE if white_to_move
+                                              else b.BLACK]
+            k = randrange(popcount(available))
+            for _ in range(k):
+                available &= available - 1
+            to = available & -available
+        else:
+            # destinations of steps and jumps in each direction
+            right = own << COLUMN_SHIFT & FULL
+            down = own << 1 & NOT_TOP
+            left = own >> COLUMN_SHIFT
+            up = own >> 1 & NOT_BOTTOM
+            step_right = right & empty
+            step_down = down & empty
+            step_left = left & empty
+            step_up = up & empty
+            jump_right = (right & occupied) << COLUMN_SHIFT & FULL & empty
+            jump_down = (down & occupied) << 1 & NOT_TOP & empty
+            jump_left = (left & occupied) >> COLUMN_SHIFT & empty
+            jump_up = (up & occupied) >> 1 & NOT_BOTTOM & empty
+            n_step_right = popcount(step_right)
+            n_step_down = popcount(step_down)
+            n_step_left = popcount(step_left)
+            n_step_up = popcount(step_up)
+            n_jump_right = popcount(jump_right)
+            n_jump_down = popcount(jump_down)
+            n_jump_left = popcount(jump_left)
+            total = n_step_right + n_step_down + n_step_left + n_step_up \
+                + n_jump_right + n_jump_down + n_jump_left \
+                + popcount(jump_up)
+            if total > 0:
+                k = randrange(total)
+                # find which set of destinations the k-th action is in
+                if k < n_step_right:
+                    moves, back = step_right, -COLUMN_SHIFT
+                elif k < n_step_right + n_step_down:
+                    k -= n_step_right
+                    moves, back = step_down, -1
+                else:
+                    k -= n_step_right + n_step_down
+                    if k < n_step_left:
+                        moves, back = step_left, COLUMN_SHIFT
+                    elif k < n_step_left + n_step_up:
+                        k -= n_step_left
+                        moves, back = step_up, 1
+                    else:
+                        k -= n_step_left + n_step_up
+                        if k < n_jump_right:
+                            moves, back = jump_right, -2 * COLUMN_SHIFT
+                        elif k < n_jump_right + n_jump_down:
+                            k -= n_jump_right
+                            moves, back = jump_down, -2
+                        elif k < n_jump_right + n_jump_down + n_jump_left:
+                            k -= n_jump_right + n_jump_down
+                            moves, back = jump_left, 2 * COLUMN_SHIFT
+                        else:
+                            k -= n_jump_right + n_jump_down + n_jump_left
+                            moves, back = jump_up, 2
+                for _ in range(k):
+                    moves &= moves - 1
+                to = moves & -moves
+                start = to << back if back > 0 else to >> -back
+
+        if to:
+            own ^= start | to
+            if trace is not None:
+                to_pos = b.bit_to_pos(to)
+                trace.append(to_pos if start == 0
+                             else (b.bit_to_pos(start), to_pos))
+            # eliminate enemy pieces surrounded by the piece
+            square = to.bit_length() - 1
+            allies = own | corners
+            adjacent = NEIGHBOUR_BITS[square]
+            beyond = BEYOND_BITS[square]
+            for i in range(4):
+                if enemy & adjacent[i] and allies & beyond[i]:
+                    enemy ^= adjacent[i]
+            # then maybe the piece itself
+            threats = enemy | corners
+            if (threats & adjacent[2] and threats & adjacent[0]) \
+                    or (threats & adjacent[3] and threats & adjacent[1]):
+                own ^= to
+            if white_to_move:
+                white, black = own, enemy
+            else:
+                black, white = own, enemy
+            white_count = popcount(white)
+            black_count = popcount(black)
+        elif trace is not None:
+            trace.append(None)  # forfeit
+
+        # end of turn. Maybe advance to the next phase
+        turn_count += 1
+        white_to_move = not white_to_move
+        if (phase == b.PLACING_PHASE and turn_count == 24) \
+                or (phase == b.MOVING_PHASE and turn_count == 128) \
+                or (phase == b.SHRINK1_PHASE and turn_count == 192):
+            if phase == b.PLACING_PHASE:
+                turn_count = 0
+            phase += 1
+            free = b.FREE_MASKS[phase]
+            corners = b.CORNER_MASKS[phase]
+            white &= free
+            black &= free
+            for bit, right_bit, down_bit, left_bit, up_bit \
+                    in SHRINK_CHECKS[phase]:
+                if white & bit:
+                    threats = black | corners
+                elif black & bit:
+                    threats = white | corners
+                else:
+                    continue
+                if (threats & left_bit and threats & right_bit) \
+                        or (threats & up_bit and threats & down_bit):
+                    white &= ~bit
+                    black &= ~bit
+            white_count = popcount(white)
+            black_count = popcount(black)
+
+    if phase == b.PLACING_PHASE or (white_count >= 2 and black_count >= 2):
+        return None  # game not finished
+    if white_count < 2 and black_count < 2:
+        return 'T'
+    elif black_count < 2:
+        return b.WHITE
+    return b.BLACK
+
+
+def playout_board(board, team, turn_limit, rng=random):
+    """
+    Plays random actions from the state of a board.Board (which isn't
+    changed) until the game ends or turn_limit turns have been played.
+
+    :param board: board.Board to start from
+    :param team: team to move first
+    :param turn_limit: most turns to play
+    :param rng: random number generator
+    :return: winning team (WHITE or BLACK), 'T' for a tie, or None if the
+        game hadn't finished after turn_limit turns
+    """
+    return random_playout(board.bitboards[b.WHITE], board.bitboards[b.BLACK],
+                          board.phase, board.turn_count, team, turn_limit,
+                          rng)
+
+
+def board_playout(board, team, turn_limit, rng=random):
+    """
+    Plays random actions like random-agent, through board.Board.
+    The slow way, for comparison.
+
+    :return: same as playout_board
+    """
+    for _ in range(turn_limit):
+        if board.phase != b.PLACING_PHASE and board.check_winner() is not None:
+            return board.check_winner()
+        actions = board.get_all_actions(team)
+        action = None  # forfeit turn if no actions
+        if len(actions) > 0:
+            action = actions[rng.randrange(0, len(actions))]
+        board.do_action(action, team)
+        team = b.Board.get_opponent_team(team)
+    if board.phase != b.PLACING_PHASE:
+        return board.check_winner()
+    return None
+
+
+def benchmark(playouts, seed, turn_limit=300):
+    """
+    Times complete random games from an empty board, played by
+    random_playout and by board.Board
+
+    :param playouts: number of games to play each way
+    :param seed: seed for the random number generator
+    :param turn_limit: most turns in each game
+    :return: playouts per second of (random_playout, board.Board)
+    """
+    rates = []
+    for play in (
+            lambda rng: random_playout(0, 0, b.PLACING_PHASE, 0, b.WHITE,
+                                       turn_limit, rng),
+            lambda rng: board_playout(b.Board(), b.WHITE, turn_limit, rng)):
+        rng = random.Random(seed)
+        start_time = time.process_time()
+        for _ in range(playouts):
+            play(rng)
+        elapsed = time.process_time() - start_time
+        rates.append(playouts / elapsed)
+    return tuple(rates)
+
+
+def main():
+    """ Runs the benchmark from the command line """
+    parser = argparse.ArgumentParser(
+            description="Benchmark random playouts: random_playout against "
+                        "random-agent style play through board.Board")
+    parser.add_argument('-n', '--playouts', type=int, default=200,
+                        help="number of games to play each way")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed for the random number generator")
+    args = parser.parse_args()
+
+    fast, slow = benchmark(args.playouts, args.seed)
+    print(f"random_playout: {fast:.1f} playouts/s")
+    print(f"board.Board:    {slow:.1f} playouts/s")
+    print(f"speed-up:       {fast / slow:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Profiles agents while they play, to find where their time goes.
+
+The referee and tournament runner profile each player's calls to
+__init__, action and update (and nothing else, e.g. not the referee's own
+validation) with one of:
+    - 'cprofile': cProfile. Counts every call exactly, but slows agents
+      down (more so for code making many small calls)
+    - 'sample': looks at the stack every SAMPLE_INTERVAL seconds (of
+      wall-clock time while a call is running) and counts the CPU time since
+      the previous sample against it. Much less overhead, but no call
+      counts, and functions that run for less than a sample may be missed.
+      Uses SIGALRM and signal.setitimer (so not on Windows)
+Either way the time is counted against the player's time limit, so don't
+profile games that are meant to test it.
+
+A Profile holds everything recorded for one agent, and profiles of the
+same agent add up across calls, games and worker processes. It is written
+as two files:
+    AGENT.collapsed   collapsed stacks ("a;b;c microseconds" per line),
+                      for flamegraph.pl or speedscope
+    AGENT.txt         the functions with the most own time
+cProfile only records which function called which, not whole stacks, so
+for 'cprofile' the stacks are estimated by sharing each function's time
+between its callers in proportion to the time spent in it from each.
+"""
+import cProfile
+import collections
+import os
+import pstats
+import signal
+import sys
+import time
+
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+KINDS = (CPROFILE, SAMPLE)
+
+# time (seconds) between samples. A real-time timer rather than a CPU-time
+# one, which many systems only check once per clock tick (several ms)
+SAMPLE_INTERVAL = 0.001
+# number of functions listed in a summary
+SUMMARY_LENGTH = 25
+# cProfile stacks estimated with less than this fraction of a root
+# function's time aren't followed any deeper
+MIN_STACK_FRACTION = 1e-4
+
+
+def label(filename, line, name):
+    """
+    :return: name of a function in a profile, like pstats writes it
+        (e.g. 'board.py:412(get_all_actions)'), without ';' so that it
+        can be part of a collapsed stack
+    """
+    if filename == '~':  # built-in
+        text = name
+    else:
+        text = '{}:{}({})'.format(os.path.basename(filename), line, name)
+    return text.replace(';', ',')
+
+
+class Profile:
+    """ Where an agent spent its time, added up over any number of calls """
+
+    def __init__(self):
+        # collapsed stack ('a;b;c', root first) -> seconds spent in c there
+        self.stacks = collections.Counter()
+        # function label -> [calls (None if not counted), own seconds,
+        #   total seconds (including functions it called)]
+        self.functions = {}
+
+    def add(self, other):
+        """ adds other (a Profile) to this profile """
+        self.stacks.update(other.stacks)
+        for function, (calls, own, total) in other.functions.items():
+            stats = self.functions.get(function)
+            if stats is None:
+                self.functions[function] = [calls, own, total]
+                continue
+            if stats[0] is not None and calls is not None:
+                stats[0] += calls
+            else:  # not counted in at least one of them
+                stats[0] = None
+            stats[1] += own
+            stats[2] += total
+
+    def total_time(self):
+        """ :return: seconds profiled """
+        return sum(self.stacks.values())
+
+    def summary(self, length=SUMMARY_LENGTH):
+        """ :return: table of the length functions with the most own time """
+        profiled = self.total_time() or 1.0
+        lines = ['{:>10} {:>10} {:>7} {:>10}  {}'.format(
+                 'calls', 'own s', 'own %', 'total s', 'function')]
+        hottest = sorted(self.functions.items(),
+                         key=lambda item: item[1][1], reverse=True)
+        for function, (calls, own, total) in hottest[:length]:
+            lines.append('{:>10} {:>10.3f} {:>6.1f}% {:>10.3f}  {}'.format(
+                    '-' if calls is None else calls, own,
+                    100 * own / profiled, total, function))
+        return '\n'.join(lines)
+
+    def write(self, directory, name):
+        """
+        Writes name.collapsed and name.txt to directory
+
+        :param directory: directory to write to (made if missing)
+        :param name: name of the agent, e.g. its module
+        :return: paths of the two files written
+        """
+        os.makedirs(directory, exist_ok=True)
+        collapsed_path = os.path.join(directory, name + '.collapsed')
+        with open(collapsed_path, 'w') as collapsed_file:
+            for stack, seconds in sorted(self.stacks.items()):
+                microseconds = round(seconds * 1e6)
+                if microseconds > 0:
+                    collapsed_file.write(
+                            '{} {}\n'.format(stack, microseconds))
+        summary_path = os.path.join(directory, name + '.txt')
+        with open(summary_path, 'w') as summary_file:
+            summary_file.write('{}: {:.3f}s profiled\n\n{}\n'.format(
+                    name, self.total_time(), self.summary()))
+        return collapsed_path, summary_path
+
+
+class Profiler:
+    """
+    Reusable context manager that profiles the code run inside it, adding
+    up over every use. Like the referee's _CountdownTimer
+    """
+
+    def __init__(self, kind, interval=SAMPLE_INTERVAL):
+        """
+        :param kind: one of KINDS, or None to profile nothing
+        :param interval: wall-clock time (seconds) between samples, for
+            SAMPLE. Each sample is weighted by the CPU time since the last
+        """
+        if kind not in KINDS + (None,):
+            raise ValueError('kind must be one of {}'.format(KINDS))
+        if kind == SAMPLE and not hasattr(signal, 'setitimer'):
+            raise ValueError("sampling needs signal.setitimer, which this "
+                             "platform doesn't have")
+        self.kind = kind
+        self.interval = interval
+        self.profiler = cProfile.Profile() if kind == CPROFILE else None
+        # for SAMPLE: tuple of labels (root first) -> seconds
+        self.samples = collections.Counter()
+        self.base = None  # frame that entered the context
+        self.last_sample = 0.0  # CPU time of the previous sample
+        # CPU time profiled since the previous sample, and time until the
+        # next one, while the context isn't entered. Calls can be shorter
+        # than the interval, so the countdown carries on from one to the next
+        self.unsampled = 0.0
+        self.countdown = interval
+        self.previous_handler = None
+
+    def __enter__(self):
+        if self.kind == CPROFILE:
+            self.profiler.enable()
+        elif self.kind == SAMPLE:
+            self.base = sys._getframe(1)
+            self.last_sample = time.process_time() - self.unsampled
+            self.previous_handler = signal.signal(signal.SIGALRM,
+                                                  self._sample)
+            signal.setitimer(signal.ITIMER_REAL, self.countdown,
+                             self.interval)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.kind == CPROFILE:
+            self.profiler.disable()
+        elif self.kind == SAMPLE:
+            self.countdown = signal.setitimer(signal.ITIMER_REAL, 0)[0] \
+                or self.interval
+            self.unsampled = time.process_time() - self.last_sample
+            signal.signal(signal.SIGALRM, self.previous_handler)
+            self.base = None
+
+    def _sample(self, signal_number, frame):
+        """ SIGALRM handler: counts the stack below the base frame """
+        now = time.process_time()
+        seconds = now - self.last_sample
+        self.last_sample = now
+        stack = []
+        while frame is not None and frame is not self.base:
+            code = frame.f_code
+            if code.co_filename != __file__:
+                stack.append(label(code.co_filename, code.co_firstlineno,
+                                   code.co_name))
+            frame = frame.f_back
+        if stack:
+            self.samples[tuple(reversed(stack))] += seconds
+
+    def profile(self):
+        """ :return: a Profile of everything profiled so far """
+        if self.kind == CPROFILE:
+            return _cprofile_profile(self.profiler)
+        profile = Profile()
+        for stack, seconds in self.samples.items():
+            profile.stacks[';'.join(stack)] += seconds
+            for depth, function in enumerate(stack):
+                stats = profile.functions.setdefault(function,
+                                                     [None, 0.0, 0.0])
+                if depth == len(stack) - 1:
+                    stats[1] += seconds
+                # recursive functions count once per stack
+                if function not in stack[:depth]:
+                    stats[2] += seconds
+        return profile
+
+
+def _cprofile_profile(profiler):
+    """ :return: a Profile of the statistics of profiler (cProfile.Profile) """
+    profile = Profile()
+    if not profiler.getstats():
+        return profile
+    # function -> (primitive calls, calls, own s, total s, {caller: edge})
+    stats = {function: function_stats for function, function_stats
+             in pstats.Stats(profiler).stats.items()
+             if '_lsprof.Profiler' not in function[2]}  # disable()
+    callees = collections.defaultdict(list)
+    for function, (_, calls, own, total, callers) in stats.items():
+        profile.functions[label(*function)] = [calls, own, total]
+        for caller, (_, _, _, edge_total) in callers.items():
+            callees[caller].append((function, edge_total))
+
+    def add_stacks(function, seconds, stack, cutoff):
+        """ shares out function's time, seconds of which were on stack """
+        _, _, own, total, _ = stats[function]
+        if total <= 0 or seconds < cutoff:
+            return
+        fraction = min(1.0, seconds / total)
+        stack = stack + (label(*function),)
+        profile.stacks[';'.join(stack)] += own * fraction
+        for callee, edge_total in callees[function]:
+            if label(*callee) not in stack:  # recursion is already counted
+                add_stacks(callee, edge_total * fraction, stack, cutoff)
+
+    for function, (_, _, _, total, callers) in stats.items():
+        if not any(caller in stats for caller in callers):
+            add_stacks(function, total, (), total * MIN_STACK_FRACTION)
+    return profile
@@ -0,0 +1,146 @@
+"""
+Differential check of the referee's fast validation backend.
+
+Plays random games through referee._Game and referee._FastGame side by
+side, giving both the same action every turn, and compares everything the
+referee and tournament runner look at after each one: whether the action
+was accepted (and the error message if not), the board, turns, phase,
+piece counts, winner and loser. Most actions are legal ones chosen at
+random, like random-agent. With probability --odd, an action is instead
+something unusual: random coordinates (sometimes written with lists), a
+legal action written with lists, a forfeit, or non-int coordinates.
+
+Also reports how long each backend spent validating and updating.
+tests/test_referee.py runs a fixed set of these games with pytest; this
+script is for checking many more.
+
+usage: python refcheck.py [-h] [-n GAMES] [--seed SEED] [--odd ODD]
+"""
+import argparse
+import random
+import sys
+import time
+
+import board as bm
+import referee
+
+# turns after which a game is abandoned (the same for both backends)
+MAX_TURNS = 400
+
+
+def odd_action(game, legal, rng):
+    """
+    :param game: the referee._FastGame (to see the phase and board)
+    :param legal: list of legal actions for the player to move
+    :param rng: random number generator
+    :return: an unusual action: possibly legal, most likely not
+    """
+    def coordinate():
+        return rng.randrange(-1, 9)
+
+    def with_lists(action):
+        if game.phase == 'placing':
+            return list(action)
+        return [list(action[0]), list(action[1])]
+
+    kind = rng.randrange(4)
+    if kind == 0:  # random coordinates
+        if game.phase == 'placing':
+            action = coordinate(), coordinate()
+        else:
+            start = rng.choice(legal)[0] if legal and rng.random() < 0.5 \
+                else (coordinate(), coordinate())
+            action = start, (coordinate(), coordinate())
+        return with_lists(action) if rng.random() < 0.25 else action
+    elif kind == 1 and legal:  # a legal action, but written with lists
+        return with_lists(rng.choice(legal))
+    elif kind == 2 and legal:  # non-int coordinates
+        action = rng.choice(legal)
+        if game.phase == 'placing':
+            return float(action[0]), action[1]
+        return (float(action[0][0]), action[0][1]), action[1]
+    return None  # forfeit
+
+
+def snapshot(game):
+    """ :return: everything compared between the two backends """
+    return (game.rows(), game.turns, game.phase, dict(game.pieces),
+            game.winner, game.loser)
+
+
+def check_games(games, seed=0, odd=0.01):
+    """
+    Plays games through both backends, stopping at the first difference
+
+    :param games: number of games to play
+    :param seed: seed for the random number generator
+    :param odd: probability of an unusual action on each turn
+    :return: (turns played, seconds spent in _Game.update, seconds spent in
+        _FastGame.update, description of the first difference or None)
+    """
+    rng = random.Random(seed)
+    turns_played = 0
+    times = [0.0, 0.0]
+    board = bm.Board()  # to list the legal actions
+    for game_number in range(games):
+        slow, fast = referee._Game(), referee._FastGame()
+        for _ in range(MAX_TURNS):
+            if not slow.playing():
+                break
+            team = bm.WHITE if fast.turns % 2 == 0 else bm.BLACK
+            board.set_state(fast.bitboards['W'], fast.bitboards['B'],
+                            fast.board_phase, fast.turns)
+            legal = board.get_all_actions(team)
+            if rng.random() < odd:
+                action = odd_action(fast, legal, rng)
+            else:
+                action = rng.choice(legal) if legal else None
+
+            errors = []
+            for i, game in enumerate((slow, fast)):
+                start_time = time.perf_counter()
+                try:
+                    game.update(action)
+                    errors.append(None)
+                except referee._InvalidActionException as e:
+                    errors.append(str(e))
+                times[i] += time.perf_counter() - start_time
+            turns_played += 1
+
+            if errors[0] != errors[1] or snapshot(slow) != snapshot(fast):
+                return turns_played, times[0], times[1], (
+                        f"game {game_number}, turn {turns_played}: "
+                        f"action {action!r}\n"
+                        f"_Game:     {errors[0]!r} {snapshot(slow)}\n"
+                        f"_FastGame: {errors[1]!r} {snapshot(fast)}")
+            if errors[0] is not None:
+                break  # the game is over
+    return turns_played, times[0], times[1], None
+
+
+def main():
+    """ Runs the check from the command line """
+    parser = argparse.ArgumentParser(
+            description="Checks the referee's _FastGame against _Game on "
+                        "random games")
+    parser.add_argument('-n', '--games', type=int, default=200,
+                        help="number of games to play")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed for the random number generator")
+    parser.add_argument('--odd', type=float, default=0.01,
+                        help="probability of an unusual action each turn")
+    args = parser.parse_args()
+
+    turns, slow_time, fast_time, difference = check_games(
+            args.games, args.seed, args.odd)
+    print(f"{turns} turns in {args.games} games")
+    print(f"_Game:     {slow_time:.3f}s")
+    print(f"_FastGame: {fast_time:.3f}s ({slow_time / fast_time:.1f}x faster)")
+    if difference is not None:
+        print("DIFFERENCE at " + difference)
+        sys.exit(1)
+    print("no differences")
+
+
+if __name__ == '__main__':
+    main()
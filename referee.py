@@ -5,10 +5,16 @@ version: v1.2
 """
 
 import gc
+import os
 import time
+import json
 import argparse
 import importlib
 
+import board as bm
+import gamerecord
+import profiling
+
 VERSION_INFO = """Referee version 1.2 (released May 07 2018)
 Plays a basic game of Watch Your Back! between two Player classes
 Allows for resource limiting to simulate performance constraints used in marking
@@ -20,31 +26,49 @@ def main():
 
     # load command-line options for the game and print welcome message
     options = _Options()
-    print(VERSION_INFO)
-
-    # initialise the game and players
-    game  = _Game()
+    out = _Output(options.verbosity, options.log, options.record,
+            options.white_module, options.black_module)
+    out.full(VERSION_INFO)
+
+    # initialise the game and players, telling them their time limits
+    game  = _FastGame() if options.fast else _Game()
+    os.environ[bm.TIME_LIMIT_ENV] = str(options.time)
+    os.environ[bm.MOVE_TIME_ENV] = str(options.move_time)
+    # one profiler per module, in case both players are the same agent
+    profilers = {module: profiling.Profiler(options.profile)
+            for module in (options.white_module, options.black_module)}
     try:
-        white = _Player(options.white_player,'white',options.time,options.space)
-        black = _Player(options.black_player,'black',options.time,options.space)
+        white = _Player(options.white_player, 'white', options.time,
+                options.space, out, profilers[options.white_module])
+        black = _Player(options.black_player, 'black', options.time,
+                options.space, out, profilers[options.black_module])
     except _ResourceLimitException as e:
-        print(f"resource limit exceeded during initialisation:", e)
+        out.summary(f"resource limit exceeded during initialisation: {e}")
+        out.result(game, 'resource limit')
+        out.close()
+        _write_profiles(profilers, options, out)
         return
 
     # now, play the game!
     player, opponent = white, black # white has first move
-    print(game)
+    out.full(game)
+    reason = 'pieces' # how the game ended
 
     while game.playing():
         if options.delay:
             time.sleep(options.delay)
         turns = game.turns
+        phase = game.phase
         try:
             action = player.action(turns)
         except _ResourceLimitException as e:
             # looks like one of the players exceeded their resource limits
             # during calculation of 'action'---that's the end of this game, then
-            print(f"resource limit exceeded during action():", e)
+            out.summary(f"resource limit exceeded during action(): {e}")
+            out.result(game, 'resource limit', white.timer, black.timer,
+                    white.search_totals, black.search_totals)
+            out.close()
+            _write_profiles(profilers, options, out)
             return
         
         try:
@@ -52,23 +76,48 @@ def main():
         except _InvalidActionException as e:
             # if one of the players makes an invalid action,
             # print the error message
-            print(f"invalid action ({game.loser}):", e)
+            out.summary(f"invalid action ({game.loser}): {e}")
+            reason = 'invalid action'
             break
         
-        print(game)
+        out.full(game)
+        out.turn(game, phase, turns, action, player.timer,
+                player.search_stats)
         
         try:
             opponent.update(action)
         except _ResourceLimitException as e:
             # looks like one of the players exceeded their resource limits
             # during calculation of 'update'
-            print(f"resource limit exceeded during update():", e)
+            out.summary(f"resource limit exceeded during update(): {e}")
+            out.result(game, 'resource limit', white.timer, black.timer,
+                    white.search_totals, black.search_totals)
+            out.close()
+            _write_profiles(profilers, options, out)
             return
         
         # other player's turn!
         player, opponent = opponent, player
 
-    print(f'winner: {game.winner}!')
+    out.summary(f'winner: {game.winner}!')
+    out.result(game, reason, white.timer, black.timer, white.search_totals,
+            black.search_totals)
+    out.close()
+    _write_profiles(profilers, options, out)
+
+def _write_profiles(profilers, options, out):
+    """
+    If the game was profiled, write each agent's profile to the profile
+    directory and print its hottest functions
+    """
+    if options.profile is None:
+        return
+    for module, profiler in profilers.items():
+        profile = profiler.profile()
+        paths = profile.write(options.profile_dir, module)
+        out.summary(f"profile of {module} ({profile.total_time():.3f}s) "
+                f"written to {' and '.join(paths)}")
+        out.summary(profile.summary(PROFILE_SUMMARY_LENGTH))
 
 # --------------------------------------------------------------------------- #
 
@@ -78,6 +127,10 @@ def main():
 DELAY_DEFAULT = 0
 SPACE_LIMIT_DEFAULT = 0
 TIME_LIMIT_DEFAULT  = 0
+MOVE_TIME_DEFAULT   = 0
+VERBOSITY_DEFAULT   = 2 # print everything, as before verbosity levels
+PROFILE_DIR_DEFAULT = 'profiles'
+PROFILE_SUMMARY_LENGTH = 10 # functions printed (more are in the file)
 
 # missing values (to use if flag is provided, but with no value)
 DELAY_NOVALUE = 1.0 # seconds
@@ -91,6 +144,8 @@ class _Options:
     
     --- help message: ---
     usage: referee.py [-h] [-d [DELAY]] [-s [SPACE_LIMIT]] [-t [TIME_LIMIT]]
+                      [-m MOVE_TIME] [-v {0,1,2}] [-l LOG] [-r RECORD] [-f]
+                      [-p {cprofile,sample}] [--profile_dir PROFILE_DIR]
                       white_module black_module
 
     Plays a game of Watch Your Back! between two Player classes
@@ -107,6 +162,25 @@ class _Options:
                             limit on memory space (float, MB) for each player
       -t [TIME_LIMIT], --time_limit [TIME_LIMIT]
                             limit on CPU time (float, seconds) for each player
+      -m MOVE_TIME, --move_time MOVE_TIME
+                            most time (float, seconds) agents should spend on
+                            each action (they are told it, not held to it)
+      -v {0,1,2}, --verbosity {0,1,2}
+                            how much to print: 0 for nothing, 1 for errors and
+                            the result, 2 for everything (boards, time and
+                            space usage)
+      -l LOG, --log LOG     file to write one JSON object per turn to (and one
+                            for the result)
+      -r RECORD, --record RECORD
+                            file to write a game record to (see gamerecord.py)
+      -f, --fast            validate actions with the faster _FastGame (see
+                            refcheck.py)
+      -p {cprofile,sample}, --profile {cprofile,sample}
+                            profile each agent's calls (see profiling.py):
+                            'sample' samples every millisecond of wall-clock
+                            time, 'cprofile' counts every call
+      --profile_dir PROFILE_DIR
+                            directory to write each agent's profile to
     ---------------------
     """
     def __init__(self):
@@ -126,14 +200,45 @@ class _Options:
         parser.add_argument('-t', '--time_limit',
                 type=float, default=TIME_LIMIT_DEFAULT,  nargs="?",
                 help="limit on CPU time (float, seconds) for each player")
+        parser.add_argument('-m', '--move_time',
+                type=float, default=MOVE_TIME_DEFAULT,
+                help="most time (float, seconds) agents should spend on each "
+                    "action (they are told it, not held to it)")
+        parser.add_argument('-v', '--verbosity',
+                type=int, default=VERBOSITY_DEFAULT, choices=[0, 1, 2],
+                help="how much to print: 0 for nothing, 1 for errors and the "
+                    "result, 2 for everything (boards, time and space usage)")
+        parser.add_argument('-l', '--log',
+                help="file to write one JSON object per turn to (and one "
+                    "for the result)")
+        parser.add_argument('-r', '--record',
+                help="file to write a game record to (see gamerecord.py)")
+        parser.add_argument('-f', '--fast', action='store_true',
+                help="validate actions with the faster _FastGame (see "
+                    "refcheck.py)")
+        parser.add_argument('-p', '--profile', choices=profiling.KINDS,
+                help="profile each agent's calls (see profiling.py): "
+                    "'sample' samples every millisecond of wall-clock time, "
+                    "'cprofile' counts every call")
+        parser.add_argument('--profile_dir', default=PROFILE_DIR_DEFAULT,
+                help="directory to write each agent's profile to")
 
         args = parser.parse_args()
 
+        self.white_module = args.white_module
+        self.black_module = args.black_module
         self.white_player = _load_player(args.white_module)
         self.black_player = _load_player(args.black_module)
         self.delay = _novalue_check(args.delay, DELAY_NOVALUE)
         self.space = _novalue_check(args.space_limit, SPACE_LIMIT_NOVALUE)
         self.time  = _novalue_check(args.time_limit, TIME_LIMIT_NOVALUE)
+        self.move_time = args.move_time
+        self.verbosity = args.verbosity
+        self.log = args.log
+        self.record = args.record
+        self.fast = args.fast
+        self.profile = args.profile
+        self.profile_dir = args.profile_dir
 
 # HELPER FUNCTIONS
 
@@ -162,28 +267,40 @@ def _load_player(modulename, package='.'):
 
 class _Player:
     """
-    Wrapper for a Player class to simplify initialization and resource limiting
+    Wrapper for a Player class to simplify initialization, resource limiting
+    and profiling
     """
-    def __init__(self, player_class, colour, time_limit, space_limit):
-        self.timer = _CountdownTimer(time_limit)
+    def __init__(self, player_class, colour, time_limit, space_limit,
+            out=None, profiler=None):
+        self.out = out if out is not None else _Output()
+        self.timer = _CountdownTimer(time_limit, self.out)
         self.space_limit = space_limit
+        self.profiler = profiler if profiler is not None \
+                else profiling.Profiler(None)
+        # the player's search stats for its latest action (if it keeps them
+        # as Player.search_stats, see board.SearchStats), and their totals
+        self.search_stats = None
+        self.search_totals = bm.SearchStats()
 
         gc.collect() # off the clock
-        with self.timer:
+        with self.timer, self.profiler:
             self.player = player_class(colour)
-        _space_check(self.space_limit)
+        _space_check(self.space_limit, self.out)
 
     def update(self, move):
         gc.collect()
-        with self.timer:
+        with self.timer, self.profiler:
             self.player.update(move)
-        _space_check(self.space_limit)
+        _space_check(self.space_limit, self.out)
 
     def action(self, turns):
         gc.collect()
-        with self.timer:
+        with self.timer, self.profiler:
             action = self.player.action(turns)
-        _space_check(self.space_limit)
+        self.search_stats = getattr(self.player, 'search_stats', None)
+        if self.search_stats is not None:
+            self.search_totals.add(self.search_stats)
+        _space_check(self.space_limit, self.out)
         return action
 
 # HELPER CLASSES AND FUNCTIONS
@@ -214,15 +331,20 @@ try:
 except:
     print("note: unable to measure memory usage on this platform (try dimefox)")
 
-def _space_check(limit):
+def _space_check(limit, out=None):
     """
     Check up on the current and peak space usage of the process, printing
-    stats and ensuring that peak usage is not exceeding limits
+    stats and ensuring that peak usage is not exceeding limits.
+    Skipped entirely if there is no limit and nothing would be printed.
     """
+    if out is None:
+        out = _Output()
+    if not limit and not out.verbose():
+        return
     try:
         curr_mem_usage, peak_mem_usage = _get_space_usage()
     except:
-        print("unable to measure memory usage on this platform")
+        out.full("unable to measure memory usage on this platform")
         return
     
     # adjust measurements to reflect usage of players and referee, not
@@ -230,7 +352,7 @@ def _space_check(limit):
     curr_mem_usage -= _DEFAULT_MEM_USAGE
     peak_mem_usage -= _DEFAULT_MEM_USAGE
 
-    print(f"space: {curr_mem_usage:.3f}MB (current usage) "
+    out.full(f"space: {curr_mem_usage:.3f}MB (current usage) "
         + f"{peak_mem_usage:.3f}MB (max usage) (both players)")
     
     # if we are limited, let's hope we are not out of space!
@@ -248,13 +370,15 @@ class _CountdownTimer:
     * if limit is not 0, throws an exception upon exiting the context after the 
       allocated time has passed
     """
-    def __init__(self, limit):
+    def __init__(self, limit, out=None):
         """
         Create a new countdown timer with time limit `limit`, in seconds
-        (0 for unlimited time)
+        (0 for unlimited time), printing timing through `out` (an _Output)
         """
         self.limit = limit
+        self.out = out if out is not None else _Output()
         self.clock = 0
+        self.elapsed = 0 # time of the most recent use
     def __enter__(self):
         # start timing
         self.start = time.process_time()
@@ -263,13 +387,123 @@ class _CountdownTimer:
         # accumulate elapsed time since __enter__
         elapsed = time.process_time() - self.start
         self.clock += elapsed
-        print(f"time: {elapsed:.3f}s (this turn), {self.clock:.3f}s (total)")
+        self.elapsed = elapsed
+        self.out.full(
+                f"time: {elapsed:.3f}s (this turn), {self.clock:.3f}s (total)")
 
         # if we are limited, let's hope we aren't out of time!
         if self.limit and self.clock > self.limit:
             raise _ResourceLimitException("Player exceeded available time")
 
 
+# OUTPUT
+
+# buffer size (bytes) for writing the per-turn log
+LOG_BUFFER_SIZE = 1 << 16
+
+class _Output:
+    """
+    Decides what to print, depending on the verbosity level, and writes the
+    optional per-turn log (one JSON object per line) through a buffer and
+    the optional game record
+    """
+    SILENT, SUMMARY, FULL = 0, 1, 2
+
+    def __init__(self, verbosity=VERBOSITY_DEFAULT, log_path=None,
+            record_path=None, white_module=None, black_module=None):
+        """
+        :param verbosity: SILENT (print nothing), SUMMARY (only errors and
+        the result) or FULL (also boards and resource usage every turn)
+        :param log_path: file to write the per-turn log to (or None for no log)
+        :param record_path: file to write the game record to (or None)
+        :param white_module, black_module: names of the players' modules
+        (for the game record)
+        """
+        self.verbosity = verbosity
+        self.log = None
+        if log_path is not None:
+            self.log = open(log_path, 'w', buffering=LOG_BUFFER_SIZE)
+        self.record_path = record_path
+        self.record = gamerecord.GameRecord(white_module, black_module)
+        self.n_turns = 0 # turns logged (across all phases)
+
+    def verbose(self):
+        """:return: True iff everything is being printed"""
+        return self.verbosity >= _Output.FULL
+
+    def full(self, message):
+        """Print message only at FULL verbosity"""
+        if self.verbosity >= _Output.FULL:
+            print(message)
+
+    def summary(self, message):
+        """Print message at SUMMARY verbosity or above"""
+        if self.verbosity >= _Output.SUMMARY:
+            print(message)
+
+    def turn(self, game, phase, turns, action, timer, search_stats=None):
+        """
+        Log a turn that has just been played
+
+        :param game: the _Game, after the action
+        :param phase: phase the action was played in
+        :param turns: turns into that phase before the action
+        :param action: the action played
+        :param timer: _CountdownTimer of the player who played it
+        :param search_stats: board.SearchStats of the player's search for
+        the action (or None if it didn't report one)
+        """
+        self.n_turns += 1
+        self.record.add(action, timer.elapsed)
+        if self.log is None:
+            return
+        record = {'turn': self.n_turns, 'phase': phase, 'turns': turns,
+            'player': 'W' if turns % 2 == 0 else 'B', 'action': action,
+            'time': timer.elapsed, 'total_time': timer.clock,
+            'pieces': dict(game.pieces), 'board': game.rows()}
+        if search_stats is not None:
+            record['search'] = search_stats.as_dict()
+        self._write(record)
+
+    def result(self, game, reason, white_timer=None, black_timer=None,
+            white_search=None, black_search=None):
+        """
+        Log the end of the game
+
+        :param game: the _Game
+        :param reason: how the game ended ('pieces', 'invalid action' or
+        'resource limit')
+        :param white_timer, black_timer: the players' _CountdownTimers (or
+        None if the players weren't set up)
+        :param white_search, black_search: totals of the players'
+        board.SearchStats (or None)
+        """
+        self.record.finish(game.winner, reason)
+        if self.log is None:
+            return
+        record = {'winner': game.winner, 'reason': reason,
+            'turns': self.n_turns,
+            'white_time': white_timer.clock if white_timer else 0,
+            'black_time': black_timer.clock if black_timer else 0}
+        for colour, search in (('white', white_search),
+                ('black', black_search)):
+            if search is not None and search.nodes:
+                record[colour + '_search'] = search.as_dict()
+        self._write(record)
+
+    def _write(self, record):
+        self.log.write(json.dumps(record))
+        self.log.write('\n')
+
+    def close(self):
+        """Flush and close the log, and write the game record (if any)"""
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+        if self.record_path is not None:
+            self.record.write(self.record_path)
+            self.record_path = None
+
 # --------------------------------------------------------------------------- #
 
 # REFEREE'S INTERNAL GAME STATE REPRESENTATION
@@ -320,6 +554,10 @@ class _Game:
             progress = 'game over!'
         return f'{board}\n{progress}'
 
+    def rows(self):
+        """:return: the board as a list of strings, one per row"""
+        return [''.join(row) for row in self.board]
+
     def playing(self):
         """:return: True iff the game is still in progress"""
         return self.phase == 'placing' or self.phase == 'moving'
@@ -389,7 +627,7 @@ class _Game:
     def _move(self, move):
 
         """
-        Validate a move a -> bm and update the board configuration accordingly.
+        Validate a move a -> b and update the board configuration accordingly.
 
         :param move: nested tuple ((xa, ya), (xb, yb)) representing move
         (xa, ya) -> (xb, yb)
@@ -405,17 +643,17 @@ class _Game:
         piece = self._piece()
         if not (self._within_board(xa, ya) and self._within_board(xb, yb)):
             self._invalidate(f"player's move contained invalid coordinates: "
-                f"({a}) -> ({bm})")
+                f"({a}) -> ({b})")
         if self.board[ya][xa] != piece:
             self._invalidate(f"player tried to move from a square it doesn't "
-                f"have a piece on: ({a}) -> ({bm})")
+                f"have a piece on: ({a}) -> ({b})")
         if self.board[yb][xb] != '-':
             self._invalidate(f"player tried to move to an occupied square or "
-                f"corner: ({a}) -> ({bm})")
+                f"corner: ({a}) -> ({b})")
         if not (self._is_jump(move) or self._is_move(move)):
             self._invalidate(f"player tried to move to a non-reachable square "
                 "(a square that is neither adjacent nor opposite an adjacent "
-                f"occupied square): ({a}) -> ({bm})")
+                f"occupied square): ({a}) -> ({b})")
 
         # if that was all okay... we can carry out the move!
         self.board[yb][xb] = piece
@@ -657,6 +895,351 @@ class _Game:
                 return True
         return False
 
+def _move_targets(moves):
+    """
+    :param moves: board.MOVES entry of a phase and square
+    :return: {destination: (destination bit, bit of the square jumped over,
+    or 0 for a simple move)} for every move a piece on the square could make
+    if the squares were empty
+    """
+    targets = {}
+    for adj_bit, adj_pos, opp_bit, opp_pos in moves:
+        targets[adj_pos] = (adj_bit, 0)
+        if opp_bit:
+            targets[opp_pos] = (opp_bit, adj_bit)
+    return targets
+
+# For _FastGame: _move_targets of each board.Board phase and square
+_MOVE_TARGETS = tuple(tuple(_move_targets(moves) for moves in bm.MOVES[phase])
+    for phase in bm.PHASES)
+# bit of each on-grid square
+_SQUARE_BITS = {pos: 1 << square for square, pos in enumerate(bm.SQUARE_POS)}
+# For _FastGame: the rows of the board in each board.Board phase, with no
+# pieces ('X' for corners, '-' for other squares in bounds, ' ' outside)
+_EMPTY_ROWS = tuple(tuple(
+    ''.join('X' if bm.CORNER_MASKS[phase] & _SQUARE_BITS[x, y]
+            else '-' if bm.BOUNDS_MASKS[phase] & _SQUARE_BITS[x, y] else ' '
+            for x in range(8))
+    for y in range(8)) for phase in bm.PHASES)
+
+class _FastGame:
+    """
+    Represent the state of a game of Watch Your Back! exactly like _Game,
+    but validate actions much more quickly, for playing many games.
+
+    The board is kept as a bitboard (int) of each player's pieces, and
+    actions are validated and played with board.py's tables of moves,
+    captures and corners for each phase. Forfeits and actions made of ints
+    (in tuples, or lists as _Game also allows) are judged here, with the
+    same messages as _Game. Anything else (e.g. non-int coordinates) is
+    passed to a _Game set up in the same state, so that it is judged and
+    explained exactly as _Game would.
+    """
+    def __init__(self):
+        # board configuration (initially empty): bitboards of each player's
+        # pieces, and the board.Board phase (which corners and bounds apply)
+        self.bitboards = {'W': 0, 'B': 0}
+        self.board_phase = bm.PLACING_PHASE
+
+        # tracking progress through game phases (as for _Game)
+        self.turns  = 0
+        self.phase  = 'placing'
+        self.pieces = {'W': 0, 'B': 0}
+        self.winner = None
+        self.loser  = None
+
+    def __str__(self):
+        """String representation of the current game state."""
+        displayboard = [[_Game._DISPLAY[p] for p in row] for row in self.rows()]
+        board = '\n'.join(' '.join(row) for row in displayboard)
+        if self.playing():
+            progress = f'{self.turns} turns into the {self.phase} phase'
+        else:
+            progress = 'game over!'
+        return f'{board}\n{progress}'
+
+    def rows(self):
+        """:return: the board as a list of strings, one per row (as _Game)"""
+        return [''.join(row) for row in self._board()]
+
+    def _board(self):
+        """:return: the board as a list of lists of characters, one per row
+        (as _Game.board)"""
+        board = [list(row) for row in _EMPTY_ROWS[self.board_phase]]
+        for piece in 'WB':
+            pieces = self.bitboards[piece]
+            while pieces:
+                bit = pieces & -pieces
+                pieces ^= bit
+                x, y = bm.SQUARE_POS[bit.bit_length() - 1]
+                board[y][x] = piece
+        return board
+
+    def playing(self):
+        """:return: True iff the game is still in progress"""
+        return self.phase == 'placing' or self.phase == 'moving'
+
+    def update(self, action):
+        """
+        Validate an action and update the current state accordingly.
+
+        :raises _InvalidActionException: for any action that is not legal
+        according to the rules of the game
+        """
+        # update the board
+        if not self._try_action(action):
+            action = self._update_slowly(action)
+            if action is not None:
+                self._try_action(action)
+
+        # progress the game (in the same order as _Game: the win is checked
+        # before the board shrinks)
+        self.turns += 1
+        if self.phase == 'placing':
+            if self.turns == 24:
+                # time to enter the moving phase!
+                self.board_phase = bm.MOVING_PHASE
+                self.phase = 'moving'
+                self.turns = 0
+        if self.phase == 'moving':
+            self._check_win()
+            if self.phase != 'completed' and self.turns in [128, 192]:
+                self._shrink_board()
+                self._check_win()
+
+    def _try_action(self, action):
+        """
+        Validate and play a forfeit, or a place or move made of ints (in
+        tuples or lists), for the player with the current turn.
+
+        :return: True iff the action was played, False if it is in some
+        other form (left for _update_slowly)
+        :raises _InvalidActionException: (as _Game) if the action is not
+        legal
+        """
+        piece = self._piece()
+        own = self.bitboards[piece]
+        occupied = own | self.bitboards[self._other()]
+        if self.phase == 'placing':
+            if not _FastGame._is_square(action):
+                return False
+            square = tuple(action) if type(action) is list else action
+            bit = _SQUARE_BITS.get(square, 0)
+            zone = bm.ZONE_MASKS[_FastGame._TEAMS[piece]]
+            if not zone & bm.FREE_MASKS[self.board_phase] & ~occupied & bit:
+                self._invalid_place(action, bit)
+        elif self.phase == 'moving':
+            if action is None:
+                self._forfeit(own, occupied)
+                return True
+            # both squares the same type: _Game rejects a tuple and a list
+            if not ((type(action) is tuple or type(action) is list)
+                    and len(action) == 2
+                    and _FastGame._is_square(action[0])
+                    and type(action[1]) is type(action[0])
+                    and _FastGame._is_square(action[1])):
+                return False
+            start, end = action
+            if type(start) is list:  # the tables need tuples
+                start, end = tuple(start), tuple(end)
+            start_bit = _SQUARE_BITS.get(start, 0)
+            if not own & start_bit:
+                self._invalid_move(action, occupied)
+            square = start_bit.bit_length() - 1
+            target = _MOVE_TARGETS[self.board_phase][square].get(end)
+            if target is None:
+                self._invalid_move(action, occupied)
+            bit, over_bit = target
+            if occupied & bit or (over_bit and not occupied & over_bit):
+                self._invalid_move(action, occupied)
+            own ^= start_bit  # the piece leaves its square
+        else:
+            return False
+
+        # if that was all okay... we can carry out the action!
+        self.bitboards[piece] = own | bit
+        self._eliminate_about(piece, bit)
+        return True
+
+    def _invalid_place(self, place, bit):
+        """
+        Explain why a place made of ints is not legal, as _Game would.
+
+        :param place: the place action, as given
+        :param bit: bitboard of its square (0 if it is off the board)
+        :raises _InvalidActionException: (every time)
+        """
+        if not bm.BOUNDS_MASKS[self.board_phase] & bit:
+            self._invalidate(f"player's place contained invalid coordinates: "
+                f"{place}")
+        if not bm.ZONE_MASKS[_FastGame._TEAMS[self._piece()]] & bit:
+            self._invalidate(f"player tried to place outside their starting "
+                f"zone: {place}")
+        self._invalidate(f"player tried to place on an occupied square or "
+            f"corner: {place}")
+
+    def _invalid_move(self, move, occupied):
+        """
+        Explain why a move made of ints is not legal, as _Game would.
+
+        :param move: the move action, as given
+        :param occupied: bitboard of all the pieces
+        :raises _InvalidActionException: (every time)
+        """
+        a, b = move
+        start_bit = _SQUARE_BITS.get(tuple(a), 0)
+        bit = _SQUARE_BITS.get(tuple(b), 0)
+        bounds = bm.BOUNDS_MASKS[self.board_phase]
+        if not (bounds & start_bit and bounds & bit):
+            self._invalidate(f"player's move contained invalid coordinates: "
+                f"({a}) -> ({b})")
+        if not self.bitboards[self._piece()] & start_bit:
+            self._invalidate(f"player tried to move from a square it doesn't "
+                f"have a piece on: ({a}) -> ({b})")
+        if not bm.FREE_MASKS[self.board_phase] & ~occupied & bit:
+            self._invalidate(f"player tried to move to an occupied square or "
+                f"corner: ({a}) -> ({b})")
+        self._invalidate(f"player tried to move to a non-reachable square "
+            "(a square that is neither adjacent nor opposite an adjacent "
+            f"occupied square): ({a}) -> ({b})")
+
+    def _forfeit(self, own, occupied):
+        """
+        Validate a forfeit, which must not be taken unless the player has
+        no legal moves available.
+
+        :param own: bitboard of the player's pieces
+        :param occupied: bitboard of all the pieces
+        :raises _InvalidActionException: (as _Game) if the player has a move
+        """
+        moves = bm.MOVES[self.board_phase]
+        while own:
+            bit = own & -own
+            own ^= bit
+            for adj_bit, _, opp_bit, _ in moves[bit.bit_length() - 1]:
+                if not occupied & adj_bit \
+                        or opp_bit and not occupied & opp_bit:
+                    self._invalidate('player tried to forfeit a move, but '
+                        'had available moves')
+
+    # invalidate the game state and raise, exactly as _Game does
+    _invalidate = _Game._invalidate
+
+    _TEAMS = {'W': bm.WHITE, 'B': bm.BLACK}
+
+    @staticmethod
+    def _is_square(square):
+        """:return: True iff square is an (x, y) tuple or list of ints (not
+        bools or other subclasses of int, which are left to _Game)"""
+        return (type(square) is tuple or type(square) is list) \
+            and len(square) == 2 \
+            and type(square[0]) is int and type(square[1]) is int
+
+    def _eliminate_about(self, piece, bit):
+        """
+        A piece has entered this square: eliminate adjacent (surrounded)
+        enemy pieces, then possibly this piece too (as _Game does).
+
+        :param piece: the type of piece that entered ('W' or 'B')
+        :param bit: bitboard of the square
+        """
+        other = 'B' if piece == 'W' else 'W'
+        square = bit.bit_length() - 1
+        corners = bm.CORNER_MASKS[self.board_phase]
+        allies = self.bitboards[piece] | corners
+        enemies = self.bitboards[other]
+        for adj_bit, _, opp_bit in bm.CAPTURES[self.board_phase][square]:
+            if enemies & adj_bit and allies & opp_bit:
+                enemies ^= adj_bit
+        self.bitboards[other] = enemies
+        threats = enemies | corners
+        for pair in bm.SANDWICHES[self.board_phase][square]:
+            if threats & pair == pair:
+                self.bitboards[piece] ^= bit
+                break
+        self.pieces['W'] = bm.popcount(self.bitboards['W'])
+        self.pieces['B'] = bm.popcount(self.bitboards['B'])
+
+    def _shrink_board(self):
+        """
+        Shrink the board, eliminating all pieces outside the new bounds or on
+        the new corners, then pieces surrounded against the new corners.
+        """
+        self.board_phase += 1
+        free = bm.FREE_MASKS[self.board_phase]
+        corners = bm.CORNER_MASKS[self.board_phase]
+        for piece in 'WB':
+            self.bitboards[piece] &= free
+        for pos in bm.SHRINK_SQUARES[self.board_phase]:
+            bit = _SQUARE_BITS[pos]
+            for piece, other in (('W', 'B'), ('B', 'W')):
+                if self.bitboards[piece] & bit:
+                    threats = self.bitboards[other] | corners
+                    square = bit.bit_length() - 1
+                    for pair in bm.SANDWICHES[self.board_phase][square]:
+                        if threats & pair == pair:
+                            self.bitboards[piece] ^= bit
+                            break
+        self.pieces['W'] = bm.popcount(self.bitboards['W'])
+        self.pieces['B'] = bm.popcount(self.bitboards['B'])
+
+    def _update_slowly(self, action):
+        """
+        Validate an action in a form that _try_action leaves alone (e.g.
+        non-int coordinates) with a _Game in the same state.
+
+        :return: the action in the usual form (tuples of ints), or None for
+        a forfeit
+        :raises _InvalidActionException: (copying the _Game's winner and
+        loser) if the action is not legal
+        """
+        game = _Game()
+        game.board = self._board()
+        game.n_shrinks = self.board_phase - bm.MOVING_PHASE \
+            if self.board_phase > bm.MOVING_PHASE else 0
+        game.turns = self.turns
+        game.phase = self.phase
+        game.pieces = dict(self.pieces)
+        try:
+            game.update(action)
+        except _InvalidActionException:
+            self.phase = game.phase
+            self.winner = game.winner
+            self.loser = game.loser
+            raise
+        if action is None:
+            return None
+        elif self.phase == 'placing':
+            return int(action[0]), int(action[1])
+        return (int(action[0][0]), int(action[0][1])), \
+            (int(action[1][0]), int(action[1][1]))
+
+    def _piece(self):
+        """:return: the piece of the player with the current turn"""
+        return 'W' if self.turns % 2 == 0  else 'B'
+
+    def _other(self):
+        """:return: the piece of the other player (not the current turn)"""
+        return 'W' if self._piece() == 'B' else 'B'
+
+    def _check_win(self):
+        """
+        Check the board to see if the game has concluded (as for _Game)
+        """
+        n_whites = self.pieces['W']
+        n_blacks = self.pieces['B']
+        if n_whites >= 2 and n_blacks >= 2:
+            pass # game continues...
+        elif n_whites < 2 and n_blacks >= 2:
+            self.winner = 'B'
+            self.phase = 'completed'
+        elif n_blacks < 2 and n_whites >= 2:
+            self.winner = 'W'
+            self.phase = 'completed'
+        elif n_whites < 2 and n_blacks < 2:
+            self.winner = 'draw'
+            self.phase = 'completed'
+
 # --------------------------------------------------------------------------- #
 
 if __name__ == '__main__':
@@ -0,0 +1,154 @@
+"""
+Builds the endgame tablebase (see board.EndgameTablebase) by retrograde
+analysis.
+
+After the second shrink the board never changes again, and only the 12
+squares inside the corners are left, so every position with up to
+MAX_PIECES pieces can be solved. Starting from the positions where the
+game is over, results are worked backwards through the actions leading
+to them:
+    - a position is won if some action leads to a position lost for the
+      other team (the quickest such win is kept)
+    - a position is lost if every action leads to a position won for the
+      other team (the slowest such loss is kept)
+    - anything left over is a draw: neither team can force a win
+Actions are generated and played with board.Board, so the tablebase
+follows exactly the same rules as the agents.
+
+usage: python tablebase.py [-h] [-o OUTPUT] [--max_pieces MAX_PIECES]
+"""
+import argparse
+import collections
+import itertools
+import time
+import board as bm
+
+# positions with at most this many pieces (of both teams) are solved
+MAX_PIECES = 8
+# tablebase file, where the agents look for it
+TABLEBASE_FILE = 'shrink2.tb'
+# the turn count doesn't matter after the second shrink, except that WHITE
+# moves on even turns
+_TURN_COUNTS = {bm.WHITE: 192, bm.BLACK: 193}
+
+
+def positions(max_pieces):
+    """ yields (white, black) bitboards of every arrangement of at most
+    max_pieces pieces on the squares left after the second shrink """
+    bits = [bm.pos_to_bit(pos) for pos in bm.TABLEBASE_SQUARES]
+    for digits in itertools.product(range(3), repeat=len(bits)):
+        if len(digits) - digits.count(0) > max_pieces:
+            continue
+        white = black = 0
+        for bit, digit in zip(bits, digits):
+            if digit == 1:
+                white |= bit
+            elif digit == 2:
+                black |= bit
+        yield white, black
+
+
+def build_tablebase(max_pieces=MAX_PIECES):
+    """
+    :param max_pieces: solve positions with at most this many pieces
+    :return: bytearray of TABLEBASE_SIZE results, indexed by
+        board.tablebase_index
+    """
+    table = bytearray(bm.TABLEBASE_SIZE)  # all TABLEBASE_UNKNOWN
+    # for each unsolved position: positions reached by its actions, and how
+    # many of those haven't been found to be won (for the other team) yet
+    predecessors = collections.defaultdict(list)
+    unresolved = {}
+    solved = collections.deque()  # solved positions, in order of turns left
+    board = bm.Board()
+    for white, black in positions(max_pieces):
+        for team in bm.TEAMS:
+            index = bm.tablebase_index(white, black, team)
+            board.set_state(white, black, bm.SHRINK2_PHASE, _TURN_COUNTS[team])
+            winner = board.check_winner()
+            if winner is not None:  # game over
+                if winner == 'T':
+                    table[index] = bm.TABLEBASE_DRAW  # tie
+                    continue
+                table[index] = bm.TABLEBASE_WIN if winner == team \
+                    else bm.TABLEBASE_LOSS
+                solved.append(index)
+                continue
+
+            enemy = bm.Board.get_opponent_team(team)
+            actions = board.get_all_actions(team)
+            if len(actions) == 0:
+                actions = [None]  # forfeit turn
+            next_indexes = set()
+            for action in actions:
+                record = board.apply(action, team)
+                next_indexes.add(bm.tablebase_index(
+                        board.bitboards[bm.WHITE], board.bitboards[bm.BLACK],
+                        enemy))
+                board.undo(record)
+            unresolved[index] = len(next_indexes)
+            for next_index in next_indexes:
+                predecessors[next_index].append(index)
+
+    # work backwards from the solved positions, fewest turns left first
+    while solved:
+        index = solved.popleft()
+        result = table[index]
+        for previous in predecessors.pop(index, ()):
+            if table[previous] != bm.TABLEBASE_UNKNOWN:
+                continue  # already solved (more quickly)
+            if result >= bm.TABLEBASE_LOSS:
+                # an action to here wins for the team to move there
+                turns = result - bm.TABLEBASE_LOSS + 1
+                if bm.TABLEBASE_WIN + turns >= bm.TABLEBASE_LOSS:
+                    raise ValueError("win too long for the tablebase")
+                table[previous] = bm.TABLEBASE_WIN + turns
+                solved.append(previous)
+            else:
+                unresolved[previous] -= 1
+                if unresolved[previous] == 0:
+                    # every action loses. This was the slowest loss
+                    turns = result - bm.TABLEBASE_WIN + 1
+                    if turns > 255 - bm.TABLEBASE_LOSS:
+                        raise ValueError("loss too long for the tablebase")
+                    table[previous] = bm.TABLEBASE_LOSS + turns
+                    solved.append(previous)
+
+    # neither team can force a win from the rest
+    for index in unresolved:
+        if table[index] == bm.TABLEBASE_UNKNOWN:
+            table[index] = bm.TABLEBASE_DRAW
+    return table
+
+
+def main():
+    """ Builds the tablebase from the command line """
+    parser = argparse.ArgumentParser(
+            description="Builds the endgame tablebase for positions after "
+                        "the second shrink")
+    parser.add_argument('-o', '--output', default=TABLEBASE_FILE,
+                        help="tablebase file to write")
+    parser.add_argument('--max_pieces', type=int, default=MAX_PIECES,
+                        help="solve positions with at most this many pieces")
+    args = parser.parse_args()
+
+    start_time = time.process_time()
+    table = build_tablebase(args.max_pieces)
+    with open(args.output, 'wb') as table_file:
+        table_file.write(table)
+    counts = collections.Counter(
+            'unknown' if result == bm.TABLEBASE_UNKNOWN
+            else 'draw' if result == bm.TABLEBASE_DRAW
+            else 'win' if result < bm.TABLEBASE_LOSS else 'loss'
+            for result in table)
+    print("solved {} positions in {:.1f}s: {} wins, {} losses, {} draws"
+          .format(len(table) - counts['unknown'],
+                  time.process_time() - start_time,
+                  counts['win'], counts['loss'], counts['draw']))
+    print("longest win: {} turns".format(
+            max(result - bm.TABLEBASE_WIN for result in table
+                if bm.TABLEBASE_WIN <= result < bm.TABLEBASE_LOSS)))
+
+
+if __name__ == '__main__':
+    main()
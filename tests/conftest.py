@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules (and agent modules) live in the repository's root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
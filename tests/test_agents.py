@@ -0,0 +1,55 @@
+import contextlib
+import importlib
+import io
+import random
+
+import pytest
+
+import batcheval
+import benchmark
+import board as bm
+
+
+def test_mirror_agent_time_limits(monkeypatch):
+    mirror_agent = importlib.import_module('mirror-agent')
+    default_budget = mirror_agent.Player('white').move_time_budget()
+    monkeypatch.setenv(bm.TIME_LIMIT_ENV, '12')
+    monkeypatch.setenv(bm.MOVE_TIME_ENV, '0')
+    player = mirror_agent.Player('white')
+    assert player.time_limit == 12
+    assert player.move_time is None
+    assert player.move_time_budget() * 10 == pytest.approx(default_budget)
+
+    monkeypatch.setenv(bm.MOVE_TIME_ENV, '0.001')
+    assert mirror_agent.Player('black').move_time_budget() == 0.001
+
+
+@pytest.mark.parametrize('agent', ['greedy-agent', 'greedy-agent-2',
+                                   'greedy-agent-3', 'greedy-agent-4'])
+def test_batch_valuation_matches_value_board(monkeypatch, agent):
+    # with NumPy, batcheval values children with the weights each agent
+    # passes; without it, with the agent's own value_board
+    player_class = importlib.import_module(agent).Player
+    value_children = batcheval.value_children
+    values = []
+
+    def recording_value_children(*args, **weights):
+        values.append(value_children(*args, **weights))
+        return values[-1]
+    monkeypatch.setattr(batcheval, 'value_children', recording_value_children)
+
+    def corpus_values():
+        values.clear()
+        for state in benchmark.CORPUS:
+            player = player_class(
+                    'white' if benchmark.team_to_move(state) == bm.WHITE
+                    else 'black')
+            player.board.set_state(*state)
+            random.seed(0)
+            with contextlib.redirect_stdout(io.StringIO()):
+                player.action(state[3])
+        return list(values)
+    batch_values = corpus_values()
+    assert batch_values
+    monkeypatch.setattr(batcheval, 'np', None)
+    assert corpus_values() == batch_values
@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+import benchmark
+import board as bm
+import perft
+import referee
+
+
+# random games with these seeds last until after the second shrink
+SEEDS = (45, 50, 52)
+# after the second shrink, random games can go on forever
+MAX_TURN_COUNT = 240
+
+
+def team_to_move(board):
+    return bm.WHITE if board.turn_count % 2 == 0 else bm.BLACK
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_random_games_match_referee(seed):
+    # the board must allow exactly the actions the referee's _Game accepts,
+    # and end up in the same position after each, through every phase
+    rng = random.Random(seed)
+    board = bm.Board()
+    game = referee._Game()
+    phases = set()
+    while game.playing() and board.turn_count < MAX_TURN_COUNT:
+        phases.add(board.phase)
+        actions = board.get_all_actions(team_to_move(board)) or [None]
+        children = dict(perft.legal_children(game))
+        assert sorted(actions, key=str) == sorted(children, key=str)
+
+        action = rng.choice(actions)
+        board.do_action(action, team_to_move(board))
+        game = children[action]
+        assert perft.game_from_state(board.get_state()).rows() == game.rows()
+        assert perft.game_over(board) == (not game.playing())
+    assert phases == set(bm.PHASES)
+
+
+@pytest.mark.parametrize('state', benchmark.CORPUS)
+def test_perft_matches_referee(state):
+    board = bm.Board()
+    board.set_state(*state)
+    for action, count, referee_count, _ in perft.divide(board, 2):
+        assert count == referee_count, action
+
+
+def snapshot(board):
+    """ :return: everything about board that undo must restore """
+    return (dict(board.bitboards), board.phase, board.turn_count, board.hash,
+            dict(board.piece_counts), dict(board.mid_distance_sums),
+            board.get_all_actions(bm.WHITE), board.get_all_actions(bm.BLACK))
+
+
+def check_move_cache(board):
+    """ checks that the moves cached as valid are still right """
+    for bit in bm.iter_bits(board.moves_valid):
+        square = bit.bit_length() - 1
+        assert board.moves[square] == board._generate_moves(square)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_undo_restores_board(seed):
+    # every action of every position of a game, including the ones that
+    # end the placing phase and shrink the board
+    rng = random.Random(seed)
+    board = bm.Board()
+    phases_entered = set()
+    while not perft.game_over(board) and board.turn_count < MAX_TURN_COUNT:
+        team = team_to_move(board)
+        before = snapshot(board)
+        actions = board.get_all_actions(team) or [None]
+        for action in actions:
+            record = board.apply(action, team)
+            check_move_cache(board)
+            if board.phase != before[1]:
+                phases_entered.add(board.phase)
+            board.undo(record)
+            check_move_cache(board)
+            assert snapshot(board) == before, action
+        board.apply(rng.choice(actions), team)
+    assert phases_entered == {bm.MOVING_PHASE, bm.SHRINK1_PHASE,
+                              bm.SHRINK2_PHASE}
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_hash_matches_position_key(seed):
+    # the hash is updated incrementally; it must always equal the key
+    # calculated from scratch, including after undo
+    rng = random.Random(seed)
+    board = bm.Board()
+    while not perft.game_over(board) and board.turn_count < MAX_TURN_COUNT:
+        assert board.search_key() == bm.position_key(*board.get_state())
+        team = team_to_move(board)
+        actions = board.get_all_actions(team) or [None]
+        for action in actions:
+            record = board.apply(action, team)
+            assert board.search_key() == bm.position_key(*board.get_state())
+            board.undo(record)
+        board.apply(rng.choice(actions), team)
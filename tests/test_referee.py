@@ -0,0 +1,35 @@
+import re
+
+import pytest
+
+import refcheck
+import referee
+
+
+def moving_game():
+    """ :return: _Game in the moving phase with a White piece on (3, 3) """
+    game = referee._Game()
+    game.phase = 'moving'
+    game.board[3][3] = 'W'
+    game.pieces = {'W': 1, 'B': 0}
+    return game
+
+
+@pytest.mark.parametrize('move, message', [
+    (((3, 3), (9, 3)), "invalid coordinates: ((3, 3)) -> ((9, 3))"),
+    (((4, 4), (4, 5)), "doesn't have a piece on: ((4, 4)) -> ((4, 5))"),
+    (((3, 3), (0, 0)), "occupied square or corner: ((3, 3)) -> ((0, 0))"),
+    (((3, 3), (5, 5)), "occupied square): ((3, 3)) -> ((5, 5))"),
+])
+def test_invalid_move_messages(move, message):
+    with pytest.raises(referee._InvalidActionException, match=re.escape(message)):
+        moving_game().update(move)
+
+
+@pytest.mark.parametrize('seed, odd', [(0, 0.0), (1, 0.01), (2, 0.05)])
+def test_fast_game_matches_game(seed, odd):
+    # random games through both rule sets: _FastGame must accept and reject
+    # exactly the same actions as _Game, with the same results
+    turns, _, _, difference = refcheck.check_games(50, seed, odd)
+    assert difference is None
+    assert turns > 1000
@@ -0,0 +1,48 @@
+import contextlib
+import importlib
+import io
+
+import pytest
+
+import benchmark
+import board as bm
+
+
+class NoTable:
+    """ transposition table that never remembers anything """
+    def new_search(self):
+        pass
+
+    def lookup(self, key):
+        return None
+
+    def store(self, key, depth, value, bound, best_action):
+        pass
+
+
+def best_actions_by_depth(board, state, max_depth):
+    """ :return: sorted best actions of searches of depth 1 to max_depth
+    one after the other (so later ones use the table's earlier entries) """
+    team = benchmark.team_to_move(state)
+    enemy = bm.Board.get_opponent_team(team)
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):  # agents' test prints
+        for depth in range(1, max_depth + 1):
+            result = board.get_best_actions_from_state(team, enemy, depth)
+            if isinstance(result, tuple):  # mirror-agent: (actions, value)
+                result = result[0]
+            results.append(sorted(result))
+    return results
+
+
+@pytest.mark.parametrize('agent', ['greedy-agent-5', 'mirror-agent'])
+@pytest.mark.parametrize('state', benchmark.CORPUS)
+def test_transposition_table_keeps_best_actions(agent, state):
+    # a search using the transposition table must find the same best
+    # actions as plain alpha-beta
+    board_class = importlib.import_module(agent).Board2
+    with_table = benchmark.new_board(state, board_class)
+    without_table = benchmark.new_board(state, board_class)
+    without_table.transposition_table = NoTable()
+    assert best_actions_by_depth(with_table, state, 4) \
+        == best_actions_by_depth(without_table, state, 4)
@@ -0,0 +1,58 @@
+import importlib
+
+import board as bm
+
+mirror_agent = importlib.import_module('mirror-agent')
+
+
+def test_missing_tablebase_is_unknown(tmp_path):
+    # building it takes about a minute, too long to do during a game
+    path = tmp_path / 'shrink2.tb'
+    board = bm.Board()
+    board.set_state(0, 0, bm.SHRINK2_PHASE, 192)
+    assert bm.EndgameTablebase(str(path)).lookup(board, bm.WHITE) \
+        == bm.TABLEBASE_UNKNOWN
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_tablebase_is_read(tmp_path):
+    table = bytearray(bm.TABLEBASE_SIZE)
+    table[bm.tablebase_index(0, 0, bm.WHITE)] = bm.TABLEBASE_DRAW
+    path = tmp_path / 'shrink2.tb'
+    path.write_bytes(table)
+    board = bm.Board()
+    board.set_state(0, 0, bm.SHRINK2_PHASE, 192)
+    tablebase = bm.EndgameTablebase(str(path))
+    assert tablebase.lookup(board, bm.WHITE) == bm.TABLEBASE_DRAW
+    assert tablebase.lookup(board, bm.BLACK) == bm.TABLEBASE_UNKNOWN
+
+
+def test_tablebase_values_are_outside_value_board():
+    for result in range(bm.TABLEBASE_WIN, 256):
+        value = mirror_agent.tablebase_value(result)
+        assert abs(value) > mirror_agent.VALUE_BOARD_LIMIT
+        assert (value > 0) == (result < bm.TABLEBASE_LOSS)
+
+
+class DrawnTablebase:
+    """ tablebase where every position is drawn """
+    def lookup(self, board, team):
+        return bm.TABLEBASE_DRAW
+
+
+def test_drawn_actions_are_ranked_by_value_board(monkeypatch):
+    monkeypatch.setattr(mirror_agent, 'ENDGAME_TABLEBASE', DrawnTablebase())
+    board = mirror_agent.Board2()
+    board.set_state(0x000000040c080000, 0x0000102030000000,
+                    bm.SHRINK2_PHASE, 194)
+    values = {}
+    for action in board.get_all_actions(bm.WHITE):
+        record = board.apply(action, bm.WHITE)
+        values[action] = board.value_board(bm.WHITE)
+        board.undo(record)
+    assert len(set(values.values())) > 1
+
+    best_actions, best_value = board.get_best_actions_from_tablebase(bm.WHITE)
+    assert best_value == max(values.values())
+    assert sorted(best_actions) == sorted(
+            action for action, value in values.items() if value == best_value)
@@ -0,0 +1,83 @@
+import sys
+import time
+import types
+
+import pytest
+
+import board as bm
+import gamerecord
+import referee
+import tournament
+
+
+def bad_agent(actions):
+    """ :return: agent module whose Player plays actions in order """
+    class Player:
+        def __init__(self, colour):
+            self.actions = iter(actions)
+
+        def action(self, turns):
+            return next(self.actions)
+
+        def update(self, action):
+            pass
+    module = types.ModuleType('bad_agent')
+    module.Player = Player
+    return module
+
+
+@pytest.mark.parametrize('actions', [
+    [(3, 3), 'oops'],  # malformed
+    [(3, 3), (3, 3)],  # placing on an occupied square
+])
+@pytest.mark.parametrize('fast', [False, True])
+def test_invalid_action_is_not_recorded(tmp_path, monkeypatch, actions, fast):
+    monkeypatch.setitem(sys.modules, 'bad_agent', bad_agent(actions))
+    path = str(tmp_path / 'game.wyb')
+    result = tournament.play_game('bad_agent', 'random-agent', seed=0,
+                                  record_path=path, fast=fast)
+    assert result['winner'] == 'black'
+    assert result['reason'].startswith('invalid action')
+
+    record = gamerecord.GameRecord.read(path)
+    # White's first action and Black's reply, but not the invalid action
+    assert len(record) == result['turns'] == 2
+    assert record.actions[0] == (3, 3)
+    board = gamerecord.Replay(record).board_at(len(record))
+    assert board.piece_counts == {bm.WHITE: 1, bm.BLACK: 1}
+
+
+def slow_start_agent():
+    """ :return: agent module whose Player plays random actions at once, but
+    spends CPU time in __init__ and update """
+    def spend_time(seconds):
+        end_time = time.process_time() + seconds
+        while time.process_time() < end_time:
+            pass
+
+    random_player = referee._load_player('random-agent')
+
+    class Player(random_player):
+        def __init__(self, colour):
+            super().__init__(colour)
+            spend_time(0.2)
+
+        def update(self, action):
+            super().update(action)
+            spend_time(0.01)
+    module = types.ModuleType('slow_start_agent')
+    module.Player = Player
+    return module
+
+
+def test_time_per_move_is_only_action_time(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'slow_start_agent', slow_start_agent())
+    result = tournament.play_game('slow_start_agent', 'random-agent', seed=0,
+                                  max_turns=20)
+    assert result['reason'] == 'turn limit'
+    assert result['white_time'] >= 0.2
+    assert result['white_action_time'] < 0.1
+    stats = tournament.summarise([result])['agents']['slow_start_agent']
+    assert stats['time'] == result['white_time']
+    assert stats['time_per_move'] \
+        == result['white_action_time'] / result['white_moves']
@@ -0,0 +1,482 @@
+"""
+Headless tournament runner for Watch Your Back!
+
+Plays many games between any number of agent modules without printing the
+board, then reports win/draw/loss tables and average CPU time per move.
+Each pair of agents plays the given number of games, alternating colours.
+
+usage: python tournament.py [-h] [-n GAMES] [-o OUTPUT] [--seed SEED]
+                            [--max_turns MAX_TURNS] [-t TIME_LIMIT]
+                            [-m MOVE_TIME] [-j PROCESSES] [-r RECORDS] [-f]
+                            [-p {cprofile,sample}] [--profile_dir DIR]
+                            module module [module ...]
+
+Games are independent, so with -j they are played by a pool of worker
+processes (one game at a time per worker). Each game seeds the random
+module with its own seed, so results don't depend on which worker played
+it or in what order. Results are printed as games finish, and every
+game's result can be written to a .json or .csv file (the .json also has
+the search stats of agents that report them, see board.SearchStats). With -r, a game
+record (see gamerecord.py) of each game is written to a directory.
+With -f, actions are validated by the referee's _FastGame instead of _Game
+(see refcheck.py). With -p, every agent's calls are profiled (see
+profiling.py), and its profiles from all the games are added up and
+written to a directory. Agents are told the time limits (-t, and -m for
+each action) in environment variables (see board.TIME_LIMIT_ENV).
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import board as bm
+import gamerecord
+import profiling
+import referee
+
+# games still going after this many turns (in total) are declared a draw
+MAX_TURNS_DEFAULT = 1000
+
+# fields recorded for every game, in CSV column order
+RESULT_FIELDS = ('game', 'seed', 'white', 'black', 'winner', 'reason',
+                 'turns', 'white_moves', 'white_time', 'white_action_time',
+                 'black_moves', 'black_time', 'black_action_time')
+
+
+def play_game(white_module, black_module, seed=None,
+              max_turns=MAX_TURNS_DEFAULT, time_limit=0, record_path=None,
+              fast=False, profile=None, move_time=0):
+    """
+    Plays one game without printing anything (including agents' prints).
+
+    :param white_module: name of module with White's Player class
+    :param black_module: name of module with Black's Player class
+    :param seed: seed for the random module before the game (or None)
+    :param max_turns: game is a draw if it lasts this many turns
+    :param time_limit: CPU time (seconds) each player gets, 0 for unlimited
+    :param record_path: file to write a game record to (or None)
+    :param fast: whether or not to validate actions with the referee's
+        _FastGame (instead of _Game)
+    :param profile: kind of profiler (see profiling.KINDS) to profile the
+        players' calls with, or None
+    :param move_time: most time (seconds) players should spend on each
+        action, 0 for no limit. Unlike time_limit, players are only told it
+    :return: dict of the result, with keys RESULT_FIELDS (except 'game').
+        'white_time' is all the CPU time of White's player (which the time
+        limit applies to), 'white_action_time' only that of its actions
+        (and the same for Black).
+        For each colour whose player reports bm.SearchStats (as
+        Player.search_stats), also 'white_search' or 'black_search': their
+        totals over the game, from SearchStats.as_dict.
+        If profiled, also 'profiles': {module: profiling.Profile}
+    """
+    record = gamerecord.GameRecord(white_module, black_module, seed)
+    profilers = {module: profiling.Profiler(profile)
+                 for module in (white_module, black_module)}
+    searches = {'white': bm.SearchStats(), 'black': bm.SearchStats()}
+    with _agent_time_limits(time_limit, move_time):
+        result = _play_game(white_module, black_module, seed, max_turns,
+                            time_limit, record, fast, profilers, searches)
+    for colour, search in searches.items():
+        if search.nodes:
+            result[colour + '_search'] = search.as_dict()
+    if profile is not None:
+        result['profiles'] = {module: profiler.profile()
+                              for module, profiler in profilers.items()}
+    if record_path is not None:
+        winner = {'white': 'W', 'black': 'B'}.get(result['winner'], 'draw')
+        record.finish(winner, result['reason'])
+        record.write(record_path)
+    return result
+
+
+@contextlib.contextmanager
+def _agent_time_limits(time_limit, move_time):
+    """ tells players made inside the context their time limits, in the
+    environment variables bm.TIME_LIMIT_ENV and bm.MOVE_TIME_ENV """
+    names = (bm.TIME_LIMIT_ENV, bm.MOVE_TIME_ENV)
+    previous = {name: os.environ.get(name) for name in names}
+    os.environ.update(zip(names, (str(time_limit), str(move_time))))
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+
+
+def _play_game(white_module, black_module, seed, max_turns, time_limit,
+               record, fast, profilers, searches):
+    """
+    Plays a game for play_game, adding its actions to record, profiling
+    each player with profilers[its module], and adding up the search stats
+    each player reports in searches[its colour]
+    """
+    if seed is not None:
+        random.seed(seed)
+    result = {'seed': seed, 'white': white_module, 'black': black_module,
+              'winner': None, 'reason': None, 'turns': 0,
+              'white_moves': 0, 'white_time': 0.0, 'white_action_time': 0.0,
+              'black_moves': 0, 'black_time': 0.0, 'black_action_time': 0.0}
+    game = referee._FastGame() if fast else referee._Game()
+    profilers = {'white': profilers[white_module],
+                 'black': profilers[black_module]}
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            players = {}
+            for colour, module in (('white', white_module),
+                                   ('black', black_module)):
+                player_class = referee._load_player(module)
+                start_time = time.process_time()
+                with profilers[colour]:
+                    players[colour] = player_class(colour)
+                result[colour + '_time'] += time.process_time() - start_time
+        except Exception as e:
+            result['winner'] = 'draw'
+            result['reason'] = 'error in __init__: {!r}'.format(e)
+            return result
+
+        colour, other = 'white', 'black'  # white has first move
+        while game.playing():
+            if result['turns'] >= max_turns:
+                result['winner'] = 'draw'
+                result['reason'] = 'turn limit'
+                return result
+
+            start_time = time.process_time()
+            try:
+                with profilers[colour]:
+                    action = players[colour].action(game.turns)
+            except Exception as e:
+                return _loss(result, colour, 'error in action: {!r}'.format(e))
+            action_time = time.process_time() - start_time
+            search = getattr(players[colour], 'search_stats', None)
+            if search is not None:
+                searches[colour].add(search)
+            result[colour + '_time'] += action_time
+            result[colour + '_action_time'] += action_time
+            result[colour + '_moves'] += 1
+            if time_limit and result[colour + '_time'] > time_limit:
+                return _loss(result, colour, 'time limit')
+
+            try:
+                game.update(action)
+            except referee._InvalidActionException as e:
+                return _loss(result, colour, 'invalid action: {}'.format(e))
+            # only actions the referee accepted, so records always replay
+            record.add(action, action_time)
+            result['turns'] += 1
+
+            start_time = time.process_time()
+            try:
+                with profilers[other]:
+                    players[other].update(action)
+            except Exception as e:
+                return _loss(result, other, 'error in update: {!r}'.format(e))
+            result[other + '_time'] += time.process_time() - start_time
+            if time_limit and result[other + '_time'] > time_limit:
+                return _loss(result, other, 'time limit')
+
+            colour, other = other, colour
+
+    result['winner'] = {'W': 'white', 'B': 'black'}.get(game.winner, 'draw')
+    result['reason'] = 'pieces'
+    return result
+
+
+def _loss(result, colour, reason):
+    """ records that colour lost the game in result, and returns result """
+    result['winner'] = 'black' if colour == 'white' else 'white'
+    result['reason'] = reason
+    return result
+
+
+def tournament_games(modules, games, seed=0):
+    """
+    Lists the games of a tournament: for each pair of modules, `games`
+    games with alternating colours, each with its own seed.
+
+    :param modules: names of agent modules
+    :param games: number of games per pair of modules
+    :param seed: seed of the first game. Game i has seed + i
+    :return: list of (game number, white module, black module, seed)
+    """
+    schedule = []
+    for first, second in itertools.combinations(modules, 2):
+        for i in range(games):
+            white, black = (first, second) if i % 2 == 0 else (second, first)
+            game_number = len(schedule)
+            schedule.append((game_number, white, black, seed + game_number))
+    return schedule
+
+
+def _play_scheduled_game(scheduled):
+    """
+    Plays a game from the tournament schedule (in a worker process)
+
+    :param scheduled: tuple of (game number, white module, black module,
+        seed, max_turns, time_limit, directory for game records or None,
+        fast, profile, move_time)
+    :return: result of the game (see play_game), including its number
+    """
+    game_number, white, black, seed, max_turns, time_limit, records_dir, \
+        fast, profile, move_time = scheduled
+    record_path = None
+    if records_dir is not None:
+        record_path = os.path.join(records_dir,
+                                   'game-{}.wyb'.format(game_number))
+    result = play_game(white, black, seed, max_turns, time_limit, record_path,
+                       fast, profile, move_time)
+    result['game'] = game_number
+    return result
+
+
+def play_tournament(modules, games, seed=0, max_turns=MAX_TURNS_DEFAULT,
+                    time_limit=0, processes=1, on_result=None,
+                    records_dir=None, fast=False, profile=None,
+                    profiles=None, move_time=0):
+    """
+    Plays every game of a tournament
+
+    :param modules: names of agent modules
+    :param games: number of games per pair of modules
+    :param seed: seed of the first game
+    :param max_turns: games lasting this many turns are a draw
+    :param time_limit: CPU time (seconds) each player gets per game
+    :param processes: number of worker processes to play games in.
+        1 plays them one after the other in this process.
+        None uses one per CPU
+    :param on_result: if given, called with each game's result as soon as
+        the game finishes (not necessarily in order)
+    :param records_dir: if given, a record of game i is written to
+        game-i.wyb in this directory
+    :param fast: whether or not to validate actions with the referee's
+        _FastGame (instead of _Game)
+    :param profile: kind of profiler (see profiling.KINDS) to profile the
+        players' calls with, or None
+    :param profiles: dict to add up each agent's profiles from every game
+        in, as {module: profiling.Profile}
+    :param move_time: most time (seconds) players should spend on each
+        action, 0 for no limit (see play_game)
+    :return: list of game results (see play_game), in order of game number
+    """
+    if records_dir is not None:
+        os.makedirs(records_dir, exist_ok=True)
+    schedule = [(game_number, white, black, game_seed, max_turns, time_limit,
+                 records_dir, fast, profile, move_time)
+                for game_number, white, black, game_seed
+                in tournament_games(modules, games, seed)]
+    results = []
+    if processes == 1:
+        finished = map(_play_scheduled_game, schedule)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        # chunksize 1: games take very different times, so hand them out
+        # one by one to keep every worker busy
+        finished = pool.imap_unordered(_play_scheduled_game, schedule, 1)
+    try:
+        for result in finished:
+            for module, game_profile in result.pop('profiles', {}).items():
+                if profiles is not None:
+                    profiles.setdefault(module,
+                                        profiling.Profile()).add(game_profile)
+            if on_result is not None:
+                on_result(result)
+            results.append(result)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    results.sort(key=lambda result: result['game'])
+    return results
+
+
+def format_result(result):
+    """ :return: one line describing the result of a game """
+    return 'game {}: {} vs {}: {} ({}, {} turns)'.format(
+            result['game'], result['white'], result['black'],
+            result['winner'], result['reason'], result['turns'])
+
+
+def summarise(results):
+    """
+    Totals up the results of a tournament
+
+    :param results: list of game results
+    :return: dict with
+        'agents': {module: {'wins', 'draws', 'losses', 'games', 'moves',
+            'time', 'action_time', 'time_per_move', and 'search' if the
+            agent reports search stats: their totals from
+            bm.SearchStats.as_dict}}
+            ('time' includes __init__ and update, but 'time_per_move' is
+            only the time spent in action)
+        'pairs': {'white_module vs black_module': {'white', 'black', 'draw'}}
+            (wins for each colour and draws, with the order of the modules)
+    """
+    agents = {}
+    pairs = {}
+    searches = {}  # module -> bm.SearchStats totals
+    for result in results:
+        for colour in ('white', 'black'):
+            if colour + '_search' in result:
+                searches.setdefault(result[colour], bm.SearchStats()).add(
+                        bm.SearchStats.from_dict(result[colour + '_search']))
+            stats = agents.setdefault(result[colour], {
+                'wins': 0, 'draws': 0, 'losses': 0, 'games': 0,
+                'moves': 0, 'time': 0.0, 'action_time': 0.0})
+            stats['games'] += 1
+            stats['moves'] += result[colour + '_moves']
+            stats['time'] += result[colour + '_time']
+            stats['action_time'] += result[colour + '_action_time']
+            if result['winner'] == 'draw':
+                stats['draws'] += 1
+            elif result['winner'] == colour:
+                stats['wins'] += 1
+            else:
+                stats['losses'] += 1
+        pair = '{} vs {}'.format(result['white'], result['black'])
+        pair_stats = pairs.setdefault(pair,
+                                      {'white': 0, 'black': 0, 'draw': 0})
+        pair_stats[result['winner']] += 1
+
+    for module, stats in agents.items():
+        stats['time_per_move'] = (stats['action_time']
+                                  / max(1, stats['moves']))
+        if module in searches:
+            stats['search'] = searches[module].as_dict()
+    return {'agents': agents, 'pairs': pairs}
+
+
+def format_summary(summary):
+    """ :return: summary (from summarise) as printable tables """
+    lines = ['{:<28} {:>6} {:>6} {:>6} {:>6} {:>12}'.format(
+             'agent', 'games', 'wins', 'draws', 'losses', 'CPU s/move')]
+    for module, stats in sorted(summary['agents'].items()):
+        lines.append('{:<28} {:>6} {:>6} {:>6} {:>6} {:>12.4f}'.format(
+                module, stats['games'], stats['wins'], stats['draws'],
+                stats['losses'], stats['time_per_move']))
+    lines.append('')
+    lines.append('{:<50} {:>6} {:>6} {:>6}'.format(
+                 'white vs black', 'white', 'black', 'draw'))
+    for pair, stats in sorted(summary['pairs'].items()):
+        lines.append('{:<50} {:>6} {:>6} {:>6}'.format(
+                pair, stats['white'], stats['black'], stats['draw']))
+
+    searching = sorted((module, stats['search']) for module, stats
+                       in summary['agents'].items() if 'search' in stats)
+    if searching:
+        lines.append('')
+        lines.append('{:<28} {:>8} {:>12} {:>6} {:>6} {:>8} {:>9}'.format(
+                     'agent', 'searches', 'nodes/search', 'depth', 'EBF',
+                     'TT hit %', 'cut-offs'))
+    for module, search in searching:
+        lines.append(
+                '{:<28} {:>8} {:>12.0f} {:>6} {:>6.2f} {:>8.1f} {:>9}'.format(
+                    module, search['searches'],
+                    search['nodes'] / max(1, search['searches']),
+                    search['depth'], search['branching_factor'],
+                    100 * search['tt_hits'] / max(1, search['tt_probes']),
+                    search['cutoffs']))
+    return '\n'.join(lines)
+
+
+def write_results(path, results, summary):
+    """
+    Writes tournament results to a file. The format depends on the
+    extension: .csv has one row per game, .json has every game's result
+    and the summary.
+
+    :param path: file to write
+    :param results: list of game results
+    :param summary: summary from summarise
+    :return:
+    """
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as csv_file:
+            # search stats are only in the .json
+            writer = csv.DictWriter(csv_file, fieldnames=RESULT_FIELDS,
+                                    extrasaction='ignore')
+            writer.writeheader()
+            for result in results:
+                writer.writerow(result)
+    else:
+        with open(path, 'w') as json_file:
+            json.dump({'games': results, 'summary': summary}, json_file,
+                      indent=2)
+
+
+def main():
+    """ Runs a tournament from the command line """
+    parser = argparse.ArgumentParser(
+            description="Plays a tournament of Watch Your Back! between "
+                        "Player classes, without printing the games")
+    parser.add_argument('modules', nargs='+',
+                        help="full names of modules containing Player classes")
+    parser.add_argument('-n', '--games', type=int, default=10,
+                        help="number of games for each pair of modules")
+    parser.add_argument('-o', '--output',
+                        help="file (.json or .csv) to write results to")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed for the random module in the first game "
+                             "(game i uses seed + i)")
+    parser.add_argument('--max_turns', type=int, default=MAX_TURNS_DEFAULT,
+                        help="games lasting this many turns are a draw")
+    parser.add_argument('-t', '--time_limit', type=float, default=0,
+                        help="limit on CPU time (float, seconds) for each "
+                             "player in each game")
+    parser.add_argument('-m', '--move_time', type=float, default=0,
+                        help="most time (float, seconds) players should "
+                             "spend on each action (they are told it, not "
+                             "held to it)")
+    parser.add_argument('-j', '--processes', type=int, default=1,
+                        help="number of games to play at once in worker "
+                             "processes (0 for one per CPU)")
+    parser.add_argument('-r', '--records',
+                        help="directory to write a record of each game to")
+    parser.add_argument('-f', '--fast', action='store_true',
+                        help="validate actions with the referee's faster "
+                             "_FastGame")
+    parser.add_argument('-p', '--profile', choices=profiling.KINDS,
+                        help="profile each agent's calls (see "
+                             "profiling.py): 'sample' samples every "
+                             "millisecond of wall-clock time, 'cprofile' "
+                             "counts every call")
+    parser.add_argument('--profile_dir', default='profiles',
+                        help="directory to write each agent's profile to")
+    args = parser.parse_args()
+    if len(args.modules) < 2:
+        parser.error("need at least two modules")
+
+    profiles = {}  # each agent's profile from all of its games
+    results = play_tournament(args.modules, args.games, args.seed,
+                              args.max_turns, args.time_limit,
+                              args.processes or None,
+                              lambda result: print(format_result(result),
+                                                   flush=True),
+                              args.records, args.fast, args.profile, profiles,
+                              args.move_time)
+    summary = summarise(results)
+    print()
+    print(format_summary(summary))
+    for module, profile in sorted(profiles.items()):
+        paths = profile.write(args.profile_dir, module)
+        print()
+        print('profile of {} ({:.3f}s) written to {}'.format(
+                module, profile.total_time(), ' and '.join(paths)))
+        print(profile.summary(10))
+    if args.output:
+        write_results(args.output, results, summary)
+
+
+if __name__ == '__main__':
+    main()